@@ -3,17 +3,18 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
-from app.db.session import AsyncSession, get_db_session
-from app.db.models import User
+from app.core.config import settings
+from app.db.session import AsyncSession, get_read_db_session
 from app.services import users as users_service
+from app.services.users import Principal
 from app.utils.security import decode_token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db_session)
-) -> User:
-    """Зависимость: получает токен, декодирует, извлекает пользователя из БД."""
+    db: AsyncSession = Depends(get_read_db_session)
+) -> Principal:
+    """Зависимость: получает токен, декодирует, извлекает пользователя (из кэша или БД)."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -24,15 +25,26 @@ async def get_current_user(
     if token_data is None or token_data.email is None:
         raise credentials_exception
 
-    user = await users_service.get_user_by_email(db, email=token_data.email)
-    if user is None:
+    principal = await users_service.get_principal(db, email=token_data.email)
+    if principal is None:
         raise credentials_exception
-    return user
+    return principal
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     """Зависимость: получает текущего пользователя и проверяет, активен ли он."""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user 
+
+def _admin_emails() -> set[str]:
+    return {email.strip().lower() for email in settings.ADMIN_EMAILS.split(",") if email.strip()}
+
+async def get_current_admin_user(
+    current_user: Principal = Depends(get_current_active_user)
+) -> Principal:
+    """Зависимость: текущий пользователь должен быть в списке ADMIN_EMAILS."""
+    if current_user.email.lower() not in _admin_emails():
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
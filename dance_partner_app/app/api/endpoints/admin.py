@@ -0,0 +1,87 @@
+import datetime
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.session import get_db_session, get_read_db_session, get_read_session_factory
+from app.schemas.bulk_import import ImportFormat, ImportReport
+from app.services import bulk_import as bulk_import_service
+from app.services import export as export_service
+from app.api.dependencies import get_current_admin_user
+
+router = APIRouter()
+
+@router.post(
+    "/import",
+    response_model=ImportReport,
+    summary="Bulk import users and profiles from CSV or JSONL",
+    dependencies=[Depends(get_current_admin_user)],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "text/csv": {"schema": {"type": "string"}},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def bulk_import_endpoint(
+    request: Request,
+    requested_format: ImportFormat | None = Query(
+        default=None, alias="format", description="По умолчанию - по Content-Type"
+    ),
+    db: AsyncSession = Depends(get_db_session),
+    read_db: AsyncSession = Depends(get_read_db_session)
+):
+    """Эндпоинт массового импорта: тело читается потоком, ошибки строк возвращаются в отчете."""
+    fmt = requested_format or bulk_import_service.detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson, or pass ?format=csv|jsonl",
+        )
+    try:
+        return await bulk_import_service.bulk_import(db, read_db, request.stream(), fmt)
+    except bulk_import_service.BulkImportBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "10"},
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get(
+    "/export",
+    summary="Stream all profiles with dance styles as NDJSON or CSV",
+    dependencies=[Depends(get_current_admin_user)],
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}},
+)
+async def export_profiles_endpoint(
+    fmt: export_service.ExportFormat = Query(default="ndjson", alias="format"),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_read_session_factory)
+):
+    """Эндпоинт выгрузки: профили отдаются пачками по мере чтения из БД."""
+    async def body() -> AsyncIterator[bytes]:
+        # Тело отдается уже после выхода зависимостей: сессию открывает и закрывает генератор
+        db = session_factory()
+        try:
+            async for chunk in export_service.export_profiles(db, fmt):
+                yield chunk
+        finally:
+            await db.close()
+
+    filename = f"profiles-{datetime.date.today().isoformat()}.{fmt}"
+    return StreamingResponse(
+        body(),
+        media_type=export_service.EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
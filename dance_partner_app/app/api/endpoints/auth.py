@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db_session
+from app.db.session import get_read_db_session
 from app.schemas.token import Token
 from app.services import auth as auth_service
 from app.utils.security import create_access_token
@@ -12,7 +12,7 @@ router = APIRouter()
 @router.post("/token", response_model=Token, summary="Login for access token")
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_db_session)
 ):
     """Эндпоинт для получения JWT токена по email и паролю."""
     user = await auth_service.authenticate_user(
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.db.session import get_db_session
+from app.api.formats import (
+    BULK_FORMAT_RESPONSES, JSON, conditional_response, negotiate_format, styles_response
+)
+from app.db.session import get_db_session, get_read_db_session
 from app.schemas.dance_style import DanceStyleCreate, DanceStyleRead
 from app.services import dance_styles as styles_service
+from app.services.style_catalog import style_catalog
 # Пока не добавляем зависимость от аутентификации для создания стилей
 # from app.utils.security import get_current_active_user
 # from app.db.models import User
@@ -33,25 +38,43 @@ async def create_new_dance_style(
         )
     return style
 
-@router.get("/", response_model=List[DanceStyleRead], summary="Get all dance styles")
+@router.get(
+    "/",
+    response_model=List[DanceStyleRead],
+    summary="Get all dance styles",
+    responses={**BULK_FORMAT_RESPONSES, 304: {"description": "Not modified since the ETag in If-None-Match"}},
+)
 async def get_all_dance_styles(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_db_session),
+    media_type: str = Depends(negotiate_format)
 ):
-    """Получает список всех танцевальных стилей с пагинацией."""
-    styles = await styles_service.get_dance_styles(db, skip=skip, limit=limit)
-    return styles
+    """Получает список всех танцевальных стилей с пагинацией из справочника в памяти, с ETag."""
+    styles = await styles_service.get_dance_style_dicts(db, skip=skip, limit=limit)
+    return conditional_response(
+        request, style_catalog.etag, media_type, lambda: styles_response(styles, media_type)
+    )
 
-@router.get("/{style_id}", response_model=DanceStyleRead, summary="Get dance style by ID")
+@router.get(
+    "/{style_id}",
+    response_model=DanceStyleRead,
+    summary="Get dance style by ID",
+    responses={304: {"description": "Not modified since the ETag in If-None-Match"}},
+)
 async def get_dance_style_by_id(
+    request: Request,
     style_id: int,
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_db_session)
 ):
-    """Получает информацию о танцевальном стиле по его ID."""
-    style = await styles_service.get_dance_style(db, style_id=style_id)
+    """Получает информацию о танцевальном стиле по его ID из справочника в памяти, с ETag."""
+    style = await styles_service.get_dance_style_dict(db, style_id=style_id)
     if not style:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Dance style not found"
         )
-    return style 
+    return conditional_response(
+        request, style_catalog.etag, JSON, lambda: ORJSONResponse(content=style)
+    )
+
@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from typing import List
 
-from app.db.session import get_db_session
-from app.schemas.matching import PartnerSearchCriteria
+from app.api.formats import BULK_FORMAT_RESPONSES, NDJSON, ndjson_stream, negotiate_format, profiles_response
+from app.db.session import get_db_session, get_read_db_session, get_read_session_factory
+from app.schemas.matching import (
+    CitySuggestion, LikeResult, PartnerSearchCriteria, PartnerSearchPage, PartnerSearchPageRequest,
+    RankedPartner, RankedSearchRequest
+)
+from app.schemas.pairing import PairingJobRead, PairingRequest
 from app.schemas.profile import ProfileRead # Используем схему для ответа
+from app.services import likes as likes_service
 from app.services import matching as matching_service
+from app.services import profiles as profiles_service
+from app.services import pairing as pairing_service
 from app.api.dependencies import get_current_active_user
-from app.db.models import User
+from app.services.users import Principal
 
 router = APIRouter()
 
@@ -15,17 +23,181 @@ router = APIRouter()
     "/find-partners",
     response_model=List[ProfileRead],
     summary="Find potential dance partners based on criteria",
-    dependencies=[Depends(get_current_active_user)] # Защищаем эндпоинт
+    dependencies=[Depends(get_current_active_user)], # Защищаем эндпоинт
+    responses=BULK_FORMAT_RESPONSES,
 )
 async def find_partners_endpoint(
     criteria: PartnerSearchCriteria,
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user),
+    media_type: str = Depends(negotiate_format),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_read_session_factory)
+):
+    """Эндпоинт для поиска танцевальных партнеров (JSON, колоночный JSON, MessagePack или потоковый NDJSON)."""
+    # Словари строятся из строк БД в формате ProfileRead, повторная валидация не нужна
+    try:
+        if media_type == NDJSON:
+            # Профили читаются и отправляются пачками по мере отдачи ответа
+            chunks = await matching_service.stream_dance_partner_dicts(
+                db=db, criteria=criteria, current_user=current_user, session_factory=session_factory
+            )
+            return ndjson_stream(chunks)
+        profiles = await matching_service.find_dance_partner_dicts(
+            db=db, criteria=criteria, current_user=current_user
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return profiles_response(profiles, media_type)
+
+
+@router.post(
+    "/find-partners/page",
+    response_model=PartnerSearchPage,
+    summary="Find potential dance partners page by page (cursor pagination)",
+)
+async def find_partners_page_endpoint(
+    criteria: PartnerSearchPageRequest,
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Эндпоинт постраничного поиска партнеров: передайте next_cursor в cursor для продолжения."""
+    try:
+        profiles, next_cursor = await matching_service.find_dance_partners_page(
+            db=db, criteria=criteria, current_user=current_user
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {"items": profiles, "next_cursor": next_cursor}
+
+
+@router.post(
+    "/ranked",
+    response_model=List[RankedPartner],
+    summary="Find the most compatible dance partners ranked by score",
+)
+async def ranked_partners_endpoint(
+    criteria: RankedSearchRequest,
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Эндпоинт ранжированного поиска: стили, близость уровней и город."""
+    try:
+        ranked = await matching_service.rank_dance_partners(
+            db=db, criteria=criteria, current_user=current_user
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return [{"profile": profile, "score": score} for profile, score in ranked]
+
+
+@router.get(
+    "/cities",
+    response_model=List[CitySuggestion],
+    summary="Autocomplete city names by prefix",
+)
+async def suggest_cities_endpoint(
+    prefix: str = Query(default="", max_length=100),
+    limit: int = Query(default=10, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db_session)
+):
+    """Эндпоинт автодополнения городов: самые популярные города с указанным началом названия."""
+    cities = await matching_service.suggest_cities(db, prefix=prefix, limit=limit)
+    return [{"city": city, "profiles": count} for city, count in cities]
+
+
+@router.post(
+    "/pairings",
+    response_model=PairingJobRead,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Start optimal one-to-one pairing of event participants",
+    dependencies=[Depends(get_current_active_user)],
+)
+async def start_pairing_endpoint(
+    pairing_in: PairingRequest,
+    db: AsyncSession = Depends(get_read_db_session)
+):
+    """Запускает подбор пар в фоне; результат - по GET /matching/pairings/{job_id}."""
+    try:
+        return await pairing_service.start_pairing(db, pairing_in)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except pairing_service.PairingBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many pairing jobs in progress, please retry later",
+            headers={"Retry-After": "5"},
+        )
+
+
+@router.get(
+    "/pairings/{job_id}",
+    response_model=PairingJobRead,
+    summary="Get pairing job status and result",
+    dependencies=[Depends(get_current_active_user)],
+)
+async def get_pairing_endpoint(job_id: str):
+    """Возвращает состояние задачи подбора пар и пары после ее завершения."""
+    job = pairing_service.pairing_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Pairing job not found"
+        )
+    return job
+
+
+@router.post(
+    "/like/{profile_id}",
+    response_model=LikeResult,
+    summary="Like a profile and check for a mutual match",
+)
+async def like_profile_endpoint(
+    profile_id: int,
     db: AsyncSession = Depends(get_db_session),
-    current_user: User = Depends(get_current_active_user)
+    read_db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Ставит лайк профилю; mutual=true, если профиль уже лайкнул текущего пользователя."""
+    own_profile = await profiles_service.get_profile_by_user_id(read_db, user_id=current_user.id)
+    if not own_profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found for the current user. Please create one."
+        )
+    try:
+        created, mutual = await likes_service.like_profile(db, own_profile, profile_id)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"profile_id": profile_id, "created": created, "mutual": mutual}
+
+
+@router.get(
+    "/matches",
+    response_model=List[ProfileRead],
+    summary="Get profiles with a mutual like",
+    responses=BULK_FORMAT_RESPONSES,
+)
+async def mutual_matches_endpoint(
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user),
+    media_type: str = Depends(negotiate_format)
 ):
-    """Эндпоинт для поиска танцевальных партнеров."""
-    profiles = await matching_service.find_dance_partners(
-        db=db, criteria=criteria, current_user=current_user
-    )
-    if not profiles:
-        return []
-    return profiles 
+    """Возвращает профили взаимных совпадений, новые первыми."""
+    own_profile = await profiles_service.get_profile_by_user_id(db, user_id=current_user.id)
+    if not own_profile:
+        return profiles_response([], media_type)
+    profiles = await likes_service.get_mutual_match_dicts(db, own_profile.id)
+    return profiles_response(profiles, media_type)
@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api.dependencies import get_current_admin_user
+from app.db.write_queue import write_batchers_stats
+from app.services.match_cache import match_cache
+from app.services.notifications import notification_hub
+from app.services.pairing import pairing_jobs
+from app.services.percolator import percolator
+from app.services.style_catalog import style_catalog
+from app.utils.instrumentation import sql_summary
+from app.utils.metrics import registry, render_gauges
+from app.utils.security import password_hashing_pool
+
+# Без аутентификации открыт только текстовый эндпоинт для Prometheus; JSON-сводки
+# (текст SQL, времена маршрутов, состояние пулов) доступны администраторам
+router = APIRouter()
+
+# Версия текстового формата экспозиции Prometheus
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("", response_class=PlainTextResponse, summary="Prometheus metrics")
+async def get_prometheus_metrics():
+    """Возвращает метрики приложения в текстовом формате Prometheus."""
+    body = (
+        registry.render()
+        + render_gauges("password_hashing", password_hashing_pool.stats())
+        + render_gauges("write_queue", write_batchers_stats())
+        + render_gauges("match_cache", match_cache.stats())
+        + render_gauges("pairing", pairing_jobs.stats())
+        + render_gauges("percolator", percolator.stats())
+        + render_gauges("notifications", notification_hub.stats())
+        + render_gauges("style_catalog", style_catalog.stats())
+    )
+    return PlainTextResponse(body, media_type=PROMETHEUS_CONTENT_TYPE)
+
+@router.get(
+    "/sql",
+    summary="Per-route SQL statistics",
+    dependencies=[Depends(get_current_admin_user)],
+)
+async def get_sql_metrics():
+    """Возвращает SQL-статистику по маршрутам: число запросов, время, N+1."""
+    return sql_summary()
+
+@router.get(
+    "/password-hashing",
+    summary="Password hashing pool utilization",
+    dependencies=[Depends(get_current_admin_user)],
+)
+async def get_password_hashing_metrics():
+    """Возвращает загрузку пула хеширования паролей."""
+    return password_hashing_pool.stats()
+
+@router.get(
+    "/write-queue",
+    summary="Group commit write queue counters",
+    dependencies=[Depends(get_current_admin_user)],
+)
+async def get_write_queue_metrics():
+    """Возвращает счетчики очереди записей с групповым коммитом."""
+    return write_batchers_stats()
+
+@router.get(
+    "/match-cache",
+    summary="Partner search result cache counters",
+    dependencies=[Depends(get_current_admin_user)],
+)
+async def get_match_cache_metrics():
+    """Возвращает счетчики кэша результатов поиска партнеров."""
+    return match_cache.stats()
+
+@router.get(
+    "/pairing",
+    summary="Pairing process pool counters",
+    dependencies=[Depends(get_current_admin_user)],
+)
+async def get_pairing_metrics():
+    """Возвращает загрузку пула процессов подбора пар."""
+    return pairing_jobs.stats()
+
+@router.get(
+    "/notifications",
+    summary="Saved search percolator and notification counters",
+    dependencies=[Depends(get_current_admin_user)],
+)
+async def get_notification_metrics():
+    """Возвращает счетчики перколятора сохраненных поисков и доставки уведомлений."""
+    return {"percolator": percolator.stats(), "hub": notification_hub.stats()}
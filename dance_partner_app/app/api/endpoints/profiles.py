@@ -1,19 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List # Импортируем List для response_model в будущем
 
-from app.db.session import get_db_session
+from app.api.formats import (
+    BULK_FORMAT_RESPONSES, negotiate_format, profile_response, profiles_response
+)
+
+from app.db.session import get_db_session, get_read_db_session
+from app.schemas.availability import WeeklyAvailability, WeeklyAvailabilityUpdate
 from app.schemas.profile import ProfileCreate, ProfileRead, ProfileUpdate
 from app.services import profiles as profiles_service
 from app.api.dependencies import get_current_active_user
-from app.db.models import User, Profile
+from app.services.availability import weekly_availability
+from app.services.users import Principal
+from app.utils.serialization import profile_to_dict
+
+# Сколько профилей можно запросить одним вызовом GET /profiles/
+MAX_PROFILES_PER_LOOKUP = 500
 
 router = APIRouter()
 
-@router.get("/me", response_model=ProfileRead, summary="Get current user's profile")
+@router.get(
+    "/",
+    response_model=List[ProfileRead],
+    summary="Get several profiles by ID",
+    responses=BULK_FORMAT_RESPONSES,
+)
+async def get_profiles_by_ids(
+    ids: List[int] = Query(..., max_length=MAX_PROFILES_PER_LOOKUP),
+    db: AsyncSession = Depends(get_read_db_session),
+    media_type: str = Depends(negotiate_format)
+):
+    """Получает профили по списку ID (?ids=1&ids=2) в порядке запроса; несуществующие пропускаются."""
+    profiles = await profiles_service.get_profile_dicts(db, list(dict.fromkeys(ids)))
+    return profiles_response(profiles, media_type)
+
+@router.get(
+    "/me",
+    response_model=ProfileRead,
+    summary="Get current user's profile",
+    responses=BULK_FORMAT_RESPONSES,
+)
 async def get_my_profile(
-    db: AsyncSession = Depends(get_db_session),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user),
+    media_type: str = Depends(negotiate_format)
 ):
     """Получает профиль текущего авторизованного пользователя."""
     profile = await profiles_service.get_profile_by_user_id(db, user_id=current_user.id)
@@ -22,20 +53,28 @@ async def get_my_profile(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found for the current user. Please create one."
         )
-    return profile
+    return profile_response(profile_to_dict(profile), media_type)
 
 @router.put("/me", response_model=ProfileRead, summary="Create or update current user's profile")
 async def create_or_update_my_profile(
     profile_in: ProfileUpdate,
     db: AsyncSession = Depends(get_db_session),
-    current_user: User = Depends(get_current_active_user)
+    read_db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """Создает или обновляет профиль текущего пользователя."""
-    profile = await profiles_service.get_profile_by_user_id(db, user_id=current_user.id)
+    # Поиск идет через читающую сессию: соединение-писатель занимает только очередь записей
+    profile = await profiles_service.get_profile_by_user_id(read_db, user_id=current_user.id)
     if profile:
-        updated_profile = await profiles_service.update_profile(
-            db=db, profile=profile, profile_in=profile_in
-        )
+        try:
+            updated_profile = await profiles_service.update_profile(
+                db=db, profile=profile, profile_in=profile_in
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=str(e)
+            )
         return updated_profile
     else:
         profile_create_data = ProfileCreate(**profile_in.model_dump())
@@ -50,15 +89,60 @@ async def create_or_update_my_profile(
                 detail=str(e)
             )
 
-@router.get("/{profile_id}", response_model=ProfileRead, summary="Get profile by ID")
+@router.get(
+    "/me/availability",
+    response_model=WeeklyAvailability,
+    summary="Get current user's weekly availability",
+)
+async def get_my_availability(
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Получает недельное расписание текущего пользователя."""
+    profile = await profiles_service.get_profile_by_user_id(db, user_id=current_user.id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found for the current user. Please create one."
+        )
+    return weekly_availability(await profiles_service.get_availability_mask(db, profile.id))
+
+@router.put(
+    "/me/availability",
+    response_model=WeeklyAvailability,
+    summary="Replace current user's weekly availability",
+)
+async def set_my_availability(
+    availability_in: WeeklyAvailabilityUpdate,
+    db: AsyncSession = Depends(get_db_session),
+    read_db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Полностью заменяет недельное расписание текущего пользователя."""
+    profile = await profiles_service.get_profile_by_user_id(read_db, user_id=current_user.id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found for the current user. Please create one."
+        )
+    mask = await profiles_service.set_availability(db, profile, availability_in.intervals)
+    return weekly_availability(mask)
+
+@router.get(
+    "/{profile_id}",
+    response_model=ProfileRead,
+    summary="Get profile by ID",
+    responses=BULK_FORMAT_RESPONSES,
+)
 async def get_profile_by_id(
     profile_id: int,
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_db_session),
+    media_type: str = Depends(negotiate_format)
 ):
     """Получает публичную информацию о профиле по его ID."""
-    profile = await profiles_service.get_profile_by_id(db, profile_id=profile_id)
-    if not profile:
+    profiles = await profiles_service.get_profile_dicts(db, [profile_id])
+    if not profiles:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
         )
-    return profile
+    return profile_response(profiles[0], media_type)
@@ -0,0 +1,133 @@
+import asyncio
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from app.db.session import get_db_session, get_read_db_session
+from app.schemas.saved_search import SavedSearchCreate, SavedSearchDelta, SavedSearchRead
+from app.services import saved_searches as saved_searches_service
+from app.services import users as users_service
+from app.api.dependencies import get_current_active_user
+from app.services.notifications import notification_hub
+from app.services.percolator import percolator
+from app.services.users import Principal
+from app.utils.security import decode_token
+
+router = APIRouter()
+
+@router.post(
+    "/",
+    response_model=SavedSearchRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="Save partner search criteria",
+)
+async def create_saved_search(
+    search_in: SavedSearchCreate,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Сохраняет критерии поиска; проверки будут возвращать только новые изменения."""
+    try:
+        return await saved_searches_service.create_saved_search(db, search_in, current_user)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.get("/", response_model=List[SavedSearchRead], summary="Get current user's saved searches")
+async def get_saved_searches(
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Получает сохраненные поиски текущего пользователя."""
+    return await saved_searches_service.get_saved_searches(db, current_user)
+
+@router.post(
+    "/{search_id}/check",
+    response_model=SavedSearchDelta,
+    summary="Get profiles created or updated since the last check",
+)
+async def check_saved_search(
+    search_id: int,
+    limit: int = Query(default=100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db_session),
+    read_db: AsyncSession = Depends(get_read_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Возвращает подходящие профили, измененные после прошлой проверки, и запоминает позицию."""
+    saved = await saved_searches_service.get_saved_search(read_db, search_id, current_user)
+    if saved is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Saved search not found"
+        )
+    try:
+        items, has_more = await saved_searches_service.check_saved_search(
+            db, read_db, saved, current_user, limit
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {"items": items, "has_more": has_more}
+
+@router.delete(
+    "/{search_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Delete a saved search",
+)
+async def delete_saved_search(
+    search_id: int,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Удаляет сохраненный поиск текущего пользователя."""
+    if not await saved_searches_service.delete_saved_search(db, search_id, current_user):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Saved search not found"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.websocket("/notifications")
+async def saved_search_notifications(
+    websocket: WebSocket,
+    token: str = Query(...),
+    db: AsyncSession = Depends(get_read_db_session)
+):
+    """Поток уведомлений: профили, подошедшие под сохраненные поиски, сразу после записи.
+
+    Браузер не передает заголовки в WebSocket, поэтому токен - в параметре ?token=.
+    """
+    token_data = decode_token(token)
+    principal = None
+    if token_data is not None and token_data.email is not None:
+        principal = await users_service.get_principal(db, email=token_data.email)
+    if principal is None or not principal.is_active:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await percolator.ensure_loaded(db)
+    # Соединение с БД не удерживается на все время подписки
+    await db.close()
+
+    await websocket.accept()
+    queue = notification_hub.subscribe(principal.id)
+    receiver = asyncio.ensure_future(websocket.receive())
+    getter = asyncio.ensure_future(queue.get())
+    try:
+        while True:
+            await asyncio.wait({receiver, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                await websocket.send_text(orjson.dumps(getter.result()).decode())
+                getter = asyncio.ensure_future(queue.get())
+            if receiver.done():
+                # Входящие сообщения не нужны; ждем только отключения клиента
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                receiver = asyncio.ensure_future(websocket.receive())
+    finally:
+        receiver.cancel()
+        getter.cancel()
+        notification_hub.unsubscribe(principal.id, queue)
@@ -2,11 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
-from app.db.session import get_db_session
+from app.db.session import get_db_session, get_read_db_session
 from app.schemas.user import UserCreate, UserRead
 from app.services import users as users_service
 from app.api.dependencies import get_current_active_user
-from app.db.models import User
+from app.services.users import Principal
 
 router = APIRouter()
 
@@ -18,10 +18,12 @@ router = APIRouter()
 )
 async def register_user(
     user_in: UserCreate,
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_db_session),
+    read_db: AsyncSession = Depends(get_read_db_session)
 ):
     """Эндпоинт для регистрации нового пользователя."""
-    existing_user = await users_service.get_user_by_email(db, email=user_in.email)
+    # Проверку делаем через читателя, чтобы не держать соединение-писатель во время bcrypt
+    existing_user = await users_service.get_user_by_email(read_db, email=user_in.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -39,7 +41,18 @@ async def register_user(
 
 @router.get("/me", response_model=UserRead, summary="Get current user")
 async def read_users_me(
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """Эндпоинт для получения информации о текущем авторизованном пользователе."""
-    return current_user 
+    return current_user
+
+@router.delete("/me", response_model=UserRead, summary="Deactivate current user")
+async def deactivate_users_me(
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Эндпоинт для деактивации учетной записи текущего пользователя."""
+    user = await users_service.deactivate_user(db, user_id=current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
@@ -0,0 +1,185 @@
+"""Выбор формата ответа по заголовку Accept для объемных списков.
+
+Кроме обычного JSON (список ProfileRead) поддерживаются компактные форматы:
+
+* колоночный JSON (COLUMNAR_JSON): каждое поле - один массив значений,
+  стили перечислены один раз, а профили ссылаются на них по id;
+* MessagePack (MSGPACK): тот же колоночный документ в бинарном виде;
+* NDJSON: по объекту на строку; поиск партнеров отдает его потоком,
+  пачка за пачкой, не собирая весь список в памяти.
+
+Ответы из справочников в памяти помечаются ETag (conditional_response):
+у каждого формата свой тег, а на совпавший If-None-Match уходит 304.
+"""
+
+import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Sequence
+
+import msgpack
+import orjson
+from fastapi import Request, status
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+
+from app.utils.serialization import PROFILE_FIELDS, PROFILE_STYLES_FIELD, STYLE_FIELDS
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.dancepartner.columnar+json"
+MSGPACK = "application/msgpack"
+NDJSON = "application/x-ndjson"
+
+# Поддерживаемые типы из Accept и их синонимы; при равном q побеждает более ранний в заголовке
+_MEDIA_TYPES = {
+    JSON: JSON,
+    COLUMNAR_JSON: COLUMNAR_JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    NDJSON: NDJSON,
+    "application/*": JSON,
+    "*/*": JSON,
+}
+
+# Суффикс ETag у каждого формата: представления одного ресурса различаются
+_ETAG_SUFFIXES = {JSON: "json", COLUMNAR_JSON: "columnar", MSGPACK: "msgpack", NDJSON: "ndjson"}
+
+# Описание альтернативных форматов для OpenAPI
+BULK_FORMAT_RESPONSES: Dict[int | str, Dict[str, Any]] = {
+    200: {"content": {COLUMNAR_JSON: {}, MSGPACK: {}, NDJSON: {}}},
+}
+
+
+def negotiate_format(request: Request) -> str:
+    """Зависимость: выбирает формат ответа по Accept.
+
+    JSON - и без Accept, и когда ни один тип из него не поддерживается:
+    клиенты с Accept вроде text/plain получают прежний JSON, а не 406.
+    """
+    accept = request.headers.get("accept", "").strip()
+    if not accept:
+        return JSON
+
+    best, best_quality = None, 0.0
+    for media_range in accept.split(","):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        chosen = _MEDIA_TYPES.get(media_type.lower())
+        if chosen is None:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = chosen, quality
+
+    return best or JSON
+
+
+def _columns(rows: Sequence[Dict[str, Any]], fields: Iterable[str]) -> Dict[str, List[Any]]:
+    return {field: [row[field] for row in rows] for field in fields}
+
+
+def columnar_styles(styles: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Колоночный документ по словарям DanceStyleRead."""
+    return {"count": len(styles), "styles": _columns(styles, STYLE_FIELDS)}
+
+
+def columnar_profiles(profiles: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Колоночный документ по словарям ProfileRead: стили вынесены в общий справочник."""
+    styles: Dict[int, Dict[str, Any]] = {}
+    style_ids = []
+    for profile in profiles:
+        ids = []
+        for style in profile[PROFILE_STYLES_FIELD]:
+            styles.setdefault(style["id"], style)
+            ids.append(style["id"])
+        style_ids.append(ids)
+
+    columns = _columns(profiles, PROFILE_FIELDS)
+    columns["dance_style_ids"] = style_ids
+    return {
+        "count": len(profiles),
+        "profiles": columns,
+        "styles": _columns(list(styles.values()), STYLE_FIELDS),
+    }
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+
+def ndjson_lines(items: Iterable[Dict[str, Any]]) -> bytes:
+    """Объекты в NDJSON: по строке orjson на объект."""
+    return b"".join(orjson.dumps(item) + b"\n" for item in items)
+
+
+def ndjson_stream(chunks: AsyncIterator[List[Dict[str, Any]]]) -> StreamingResponse:
+    """Потоковый NDJSON: каждая пачка уходит клиенту, как только прочитана."""
+    async def body() -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            yield ndjson_lines(chunk)
+
+    return StreamingResponse(body(), media_type=NDJSON, headers={"Vary": "Accept"})
+
+
+def _compact_response(document: Dict[str, Any], media_type: str) -> Response:
+    headers = {"Vary": "Accept"}
+    if media_type == MSGPACK:
+        body = msgpack.packb(document, default=_msgpack_default)
+        return Response(content=body, media_type=MSGPACK, headers=headers)
+    return ORJSONResponse(content=document, media_type=COLUMNAR_JSON, headers=headers)
+
+
+def profiles_response(profiles: List[Dict[str, Any]], media_type: str) -> Response:
+    """Ответ со списком профилей (словари ProfileRead) в выбранном формате."""
+    if media_type == JSON:
+        return ORJSONResponse(content=profiles, headers={"Vary": "Accept"})
+    if media_type == NDJSON:
+        return Response(content=ndjson_lines(profiles), media_type=NDJSON, headers={"Vary": "Accept"})
+    return _compact_response(columnar_profiles(profiles), media_type)
+
+
+def profile_response(profile: Dict[str, Any], media_type: str) -> Response:
+    """Ответ с одним профилем; компактные форматы - колоночный документ из одной строки."""
+    if media_type == JSON:
+        return ORJSONResponse(content=profile, headers={"Vary": "Accept"})
+    if media_type == NDJSON:
+        return Response(content=ndjson_lines([profile]), media_type=NDJSON, headers={"Vary": "Accept"})
+    return _compact_response(columnar_profiles([profile]), media_type)
+
+
+def styles_response(styles: List[Dict[str, Any]], media_type: str) -> Response:
+    """Ответ со списком стилей (словари DanceStyleRead) в выбранном формате."""
+    if media_type == JSON:
+        return ORJSONResponse(content=styles, headers={"Vary": "Accept"})
+    if media_type == NDJSON:
+        return Response(content=ndjson_lines(styles), media_type=NDJSON, headers={"Vary": "Accept"})
+    return _compact_response(columnar_styles(styles), media_type)
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    # If-None-Match сравнивается слабо: префикс W/ не учитывается
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def conditional_response(
+    request: Request, etag: str, media_type: str, build: Callable[[], Response]
+) -> Response:
+    """Ответ с ETag формата; 304 без тела, если у клиента уже актуальная копия."""
+    tag = f'{etag[:-1]}-{_ETAG_SUFFIXES[media_type]}"'
+    # no-cache: клиент хранит ответ, но перед использованием перепроверяет его по ETag
+    headers = {"ETag": tag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if _etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response = build()
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,71 @@
+"""Массовый импорт из файла CSV или JSONL в БД из DATABASE_URL.
+
+Запуск из папки dance_partner_app:
+
+    python -m app.commands.bulk_import dancers.csv
+    python -m app.commands.bulk_import dancers.jsonl --batch-size 5000 --report report.json
+
+Формат определяется по расширению файла (или --format). Итог и ошибки
+строк печатаются в JSON (ImportReport); код выхода 1 - были ошибки строк.
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from typing import AsyncIterator
+
+import orjson
+
+from app.core.config import settings
+from app.db.session import async_session_factory, dispose_engines, init_db, read_session_factory
+from app.services.bulk_import import bulk_import, import_hash_pool
+
+# Размер блока чтения файла
+READ_CHUNK_SIZE = 1024 * 1024
+
+EXTENSION_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+async def read_chunks(path: Path) -> AsyncIterator[bytes]:
+    """Файл блоками; чтение уступает event loop между блоками."""
+    with path.open("rb") as source:
+        while chunk := source.read(READ_CHUNK_SIZE):
+            yield chunk
+            await asyncio.sleep(0)
+
+
+async def main(args: argparse.Namespace) -> int:
+    path = Path(args.path)
+    fmt = args.format or EXTENSION_FORMATS.get(path.suffix.lower())
+    if fmt is None:
+        raise SystemExit(f"Cannot detect format of {path}, pass --format csv|jsonl")
+
+    await init_db()
+    try:
+        async with async_session_factory() as db, read_session_factory() as read_db:
+            report = await bulk_import(db, read_db, read_chunks(path), fmt, batch_size=args.batch_size)
+    finally:
+        import_hash_pool.shutdown()
+        await dispose_engines()
+
+    output = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+    if args.report:
+        Path(args.report).write_bytes(output)
+    else:
+        sys.stdout.buffer.write(output + b"\n")
+    print(
+        f"imported {report['imported']} of {report['total']} rows in {report['seconds']} s "
+        f"({report['rows_per_second']} rows/s), failed {report['failed']}",
+        file=sys.stderr,
+    )
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="Файл .csv или .jsonl")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    parser.add_argument("--report", help="Записать отчет в файл вместо stdout")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,39 @@
+"""Потоковая выгрузка всех профилей со стилями из БД в NDJSON или CSV.
+
+Запуск из папки dance_partner_app:
+
+    python -m app.commands.export_profiles --format csv --output profiles.csv
+    python -m app.commands.export_profiles | gzip > profiles.ndjson.gz
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from app.db.session import dispose_engines, read_session_factory
+from app.services.export import EXPORT_CHUNK_SIZE, export_profiles
+
+
+async def main(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    written = 0
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        async with read_session_factory() as db:
+            async for chunk in export_profiles(db, args.format, chunk_size=args.chunk_size):
+                output.write(chunk)
+                written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+        await dispose_engines()
+    print(f"exported {written / 1e6:.1f} MB in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--output", help="Файл выгрузки (по умолчанию - stdout)")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    asyncio.run(main(parser.parse_args()))
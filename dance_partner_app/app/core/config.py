@@ -17,6 +17,20 @@ class Settings(BaseSettings):
     # Используем асинхронный драйвер aiosqlite
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./dance_app.db")
 
+    # Настройки производительности SQLite (пустое значение - не менять PRAGMA)
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-64000")) # <0 - размер в КиБ
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    # Раздельные движки: пул читателей и одно соединение-писатель
+    SQLITE_SPLIT_READ_WRITE: bool = os.getenv("SQLITE_SPLIT_READ_WRITE", "True").lower() == "true"
+    SQLITE_READ_POOL_SIZE: int = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+    # Групповой коммит: записи конкурентных запросов фиксируются одной транзакцией
+    WRITE_BATCHING_ENABLED: bool = os.getenv("WRITE_BATCHING_ENABLED", "True").lower() == "true"
+    WRITE_BATCH_MAX_DELAY_MS: float = float(os.getenv("WRITE_BATCH_MAX_DELAY_MS", "2"))
+    WRITE_BATCH_MAX_SIZE: int = int(os.getenv("WRITE_BATCH_MAX_SIZE", "100"))
+
     # Настройки JWT токенов
     SECRET_KEY: str = os.getenv(
         "SECRET_KEY", "a_very_secret_key_that_should_be_changed"
@@ -24,6 +38,40 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30 # Токен живет 30 минут
 
+    # Пул потоков для bcrypt: хеширование не блокирует event loop
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    # Сколько задач может ждать свободный поток; сверх этого - 503
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+
+    # Кэш аутентификации: декодированные токены и пользователи по subject токена
+    TOKEN_CACHE_MAX_SIZE: int = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+    # Предельный срок жизни токена в кэше, в т.ч. для токенов без exp
+    TOKEN_CACHE_MAX_TTL_SECONDS: float = float(os.getenv("TOKEN_CACHE_MAX_TTL_SECONDS", "300"))
+    PRINCIPAL_CACHE_MAX_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+    PRINCIPAL_CACHE_TTL_SECONDS: float = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+    # Подбор пар для мероприятий: пул процессов, очередь задач и лимит участников
+    PAIRING_WORKERS: int = int(os.getenv("PAIRING_WORKERS", "2"))
+    PAIRING_MAX_PENDING_JOBS: int = int(os.getenv("PAIRING_MAX_PENDING_JOBS", "8"))
+    PAIRING_MAX_PARTICIPANTS: int = int(os.getenv("PAIRING_MAX_PARTICIPANTS", "4000"))
+    # Сколько завершенных задач хранить для опроса результата
+    PAIRING_JOB_RETENTION: int = int(os.getenv("PAIRING_JOB_RETENTION", "256"))
+
+    # Администраторы (email через запятую): доступ к /admin, например массовому импорту
+    ADMIN_EMAILS: str = os.getenv("ADMIN_EMAILS", "")
+    # Массовый импорт: процессы для bcrypt и строк на одну транзакцию вставки
+    IMPORT_HASH_WORKERS: int = int(os.getenv("IMPORT_HASH_WORKERS", str(os.cpu_count() or 2)))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "2000"))
+
+    # Кэш результатов поиска партнеров: лимиты по числу записей и по памяти id
+    MATCH_CACHE_MAX_ENTRIES: int = int(os.getenv("MATCH_CACHE_MAX_ENTRIES", "1024"))
+    MATCH_CACHE_MAX_BYTES: int = int(os.getenv("MATCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+    # Инструментирование запросов: порог N+1 (повторов одного SQL за запрос)
+    # и порог журнала медленных запросов в мс (0 - журнал выключен)
+    SQL_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+    SLOW_REQUEST_THRESHOLD_MS: float = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "0"))
+
     class Config:
         """Конфигурация Pydantic Settings."""
         case_sensitive = True
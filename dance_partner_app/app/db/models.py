@@ -1,15 +1,30 @@
 """Модели данных SQLAlchemy для базы данных приложения."""
 
 import datetime
-from typing import List
+import enum
+from typing import Callable, List, Tuple
 
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, Text,
-    ForeignKey, Table
+    Column, Connection, Integer, SmallInteger, String, Boolean, DateTime, Text, Float, LargeBinary,
+    ForeignKey, Table, Index, event, text
 )
-from sqlalchemy.orm import relationship, Mapped
+from sqlalchemy.orm import relationship, Mapped, validates
+from sqlalchemy.sql import column, table
 
 from .session import Base
+from app.utils.normalization import normalize_city
+
+class SkillLevel(enum.IntEnum):
+    """Уровень владения стилем; хранится в БД как небольшое целое по возрастанию."""
+    BEGINNER = 1
+    INTERMEDIATE = 2
+    ADVANCED = 3
+    PROFESSIONAL = 4
+
+class DanceRole(str, enum.Enum):
+    """Роль в паре; у профиля без роли (None) подходят обе."""
+    LEADER = "leader"
+    FOLLOWER = "follower"
 
 # Ассоциативная таблица для связи многие-ко-многим
 # между профилями (Profile) и танцевальными стилями (DanceStyle)
@@ -18,7 +33,105 @@ profile_dance_style_association = Table(
     Base.metadata,
     Column('profile_id', Integer, ForeignKey('profiles.id'), primary_key=True),
     Column('dance_style_id', Integer, ForeignKey('dance_styles.id'), primary_key=True),
-    Column('skill_level', String, default='Beginner')
+    Column(
+        'skill_level', SmallInteger, nullable=False,
+        default=SkillLevel.BEGINNER, server_default=str(int(SkillLevel.BEGINNER))
+    ),
+    # Покрывающий индекс для фильтра "стиль X с уровнем не ниже Y":
+    # поиск выполняется диапазонным сканированием индекса без чтения таблицы
+    Index('ix_profile_style_level', 'dance_style_id', 'skill_level', 'profile_id'),
+)
+
+@event.listens_for(Base.metadata, "after_create")
+def _migrate_skill_levels(target, connection, **kw):
+    """Переводит уровни из строк ('Beginner', ...) в SkillLevel в БД, созданной до их появления.
+
+    В старой схеме skill_level - String с текстовой аффинностью, а индекса
+    ix_profile_style_level нет, поэтому таблица пересоздается по текущей
+    схеме, а строки копируются с заменой названий уровней на их номера.
+    Неизвестные значения становятся Beginner - прежним значением по умолчанию.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    name = profile_dance_style_association.name
+    columns = {row[1]: row[2] for row in connection.exec_driver_sql(f"PRAGMA table_info({name})")}
+    if columns.get("skill_level", "").upper() == "SMALLINT":
+        return
+    legacy = f"{name}_legacy"
+    levels = " ".join(
+        f"WHEN '{level.name.lower()}' THEN {int(level)} WHEN '{int(level)}' THEN {int(level)}"
+        for level in SkillLevel
+    )
+    connection.exec_driver_sql(f"ALTER TABLE {name} RENAME TO {legacy}")
+    profile_dance_style_association.create(connection)
+    connection.exec_driver_sql(
+        f"INSERT INTO {name} (profile_id, dance_style_id, skill_level) "
+        f"SELECT profile_id, dance_style_id, "
+        f"CASE lower(trim(skill_level)) {levels} ELSE {int(SkillLevel.BEGINNER)} END "
+        f"FROM {legacy}"
+    )
+    connection.exec_driver_sql(f"DROP TABLE {legacy}")
+
+def _fill_city_keys(connection: Connection) -> None:
+    rows = connection.execute(text("SELECT id, city FROM profiles WHERE city IS NOT NULL")).all()
+    if rows:
+        connection.execute(
+            text("UPDATE profiles SET city_key = :city_key WHERE id = :id"),
+            [{"id": profile_id, "city_key": normalize_city(city)} for profile_id, city in rows],
+        )
+
+def _fill_updated_at(connection: Connection) -> None:
+    # Водяные знаки сохраненных поисков начинаются с последнего известного изменения
+    connection.execute(text(
+        "UPDATE profiles SET updated_at = coalesce(created_at, CURRENT_TIMESTAMP)"
+    ))
+
+# Столбцы profiles, появившиеся после первой версии схемы, и заполнение их
+# в уже существующих строках (None - остается NULL); тип берется из модели
+_PROFILE_COLUMN_MIGRATIONS: List[Tuple[str, Callable[[Connection], None] | None]] = [
+    ("city_key", _fill_city_keys),
+    ("updated_at", _fill_updated_at),
+    ("dance_role", None), # NULL - танцует в обеих ролях
+    ("latitude", None),
+    ("longitude", None),
+]
+
+@event.listens_for(Base.metadata, "after_create")
+def _migrate_profile_columns(target, connection, **kw):
+    """Добавляет в profiles из БД, созданной до появления новых столбцов, эти столбцы и их индексы.
+
+    create_all не меняет существующие таблицы: ни столбцы, ни индексы
+    уже созданной таблицы он не добавляет.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    profiles = Profile.__table__
+    columns = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({profiles.name})")}
+    for name, fill in _PROFILE_COLUMN_MIGRATIONS:
+        if name in columns:
+            continue
+        column_type = profiles.c[name].type.compile(dialect=connection.dialect)
+        connection.exec_driver_sql(f"ALTER TABLE {profiles.name} ADD COLUMN {name} {column_type}")
+        if fill is not None:
+            fill(connection)
+        columns.add(name)
+    # Индексы добавленных столбцов и индексы старых столбцов, появившиеся позже
+    # (ix_profiles_created_at для keyset-пагинации)
+    for index in profiles.indexes:
+        if all(column.name in columns for column in index.columns):
+            index.create(connection, checkfirst=True)
+
+# Лайки между профилями: кто (from) проявил интерес к кому (to)
+profile_likes = Table(
+    'profile_likes',
+    Base.metadata,
+    Column('from_profile_id', Integer, ForeignKey('profiles.id'), primary_key=True),
+    Column('to_profile_id', Integer, ForeignKey('profiles.id'), primary_key=True),
+    Column('created_at', DateTime, nullable=False, default=datetime.datetime.utcnow),
+    # Обратный покрывающий индекс: "кто лайкнул меня" и проверка взаимности без чтения таблицы
+    Index('ix_profile_likes_reverse', 'to_profile_id', 'from_profile_id'),
+    # Таблица кластеризована по первичному ключу (from, to), отдельного rowid нет
+    sqlite_with_rowid=False,
 )
 
 class User(Base):
@@ -44,13 +157,34 @@ class Profile(Base):
     first_name: Mapped[str | None] = Column(String, index=True, nullable=True)
     last_name: Mapped[str | None] = Column(String, index=True, nullable=True)
     city: Mapped[str | None] = Column(String, index=True, nullable=True)
+    # Нормализованный город (см. normalize_city) для поиска по равенству и префиксу по индексу
+    city_key: Mapped[str | None] = Column(String, index=True, nullable=True)
     bio: Mapped[str | None] = Column(Text, nullable=True)
     preferred_contact: Mapped[str | None] = Column(String, nullable=True)
-    created_at: Mapped[datetime.datetime] = Column(DateTime, default=datetime.datetime.utcnow)
+    # Роль в паре (DanceRole); None - танцует в обеих ролях
+    dance_role: Mapped[str | None] = Column(String(16), nullable=True)
+    # Координаты для поиска по радиусу; пространственный индекс живет в памяти (matching_index)
+    latitude: Mapped[float | None] = Column(Float, nullable=True)
+    longitude: Mapped[float | None] = Column(Float, nullable=True)
+    # Индекс нужен для keyset-пагинации по (created_at, id) в поиске партнеров
+    created_at: Mapped[datetime.datetime] = Column(
+        DateTime, default=datetime.datetime.utcnow, index=True
+    )
+    # Время последнего изменения (включая стили и расписание) - водяной знак
+    # сохраненных поисков; индекс в SQLite неявно содержит id, т.е. это (updated_at, id)
+    updated_at: Mapped[datetime.datetime] = Column(
+        DateTime, default=datetime.datetime.utcnow, nullable=False, index=True
+    )
 
     # Связь с пользователем
     user: Mapped["User"] = relationship(back_populates="profile")
 
+    @validates("city")
+    def _set_city_key(self, key, city):
+        """Поддерживает city_key при каждом изменении города через ORM."""
+        self.city_key = normalize_city(city)
+        return city
+
     # Связь многие-ко-многим со стилями танцев
     dance_styles: Mapped[List["DanceStyle"]] = relationship(
         secondary=profile_dance_style_association,
@@ -58,6 +192,85 @@ class Profile(Base):
         lazy="selectin"
     )
 
+class ProfileAvailability(Base):
+    """Недельное расписание профиля: битовая маска 7 x 48 слотов по 30 минут."""
+    __tablename__ = "profile_availability"
+
+    profile_id: Mapped[int] = Column(Integer, ForeignKey('profiles.id'), primary_key=True)
+    # 42 байта little-endian: бит day * 48 + slot - свободен в этот слот
+    slots: Mapped[bytes] = Column(LargeBinary, nullable=False)
+
+class SavedSearch(Base):
+    """Сохраненный поиск партнеров с водяным знаком последней проверки."""
+    __tablename__ = "saved_searches"
+
+    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    name: Mapped[str] = Column(String, nullable=False)
+    # Критерии PartnerSearchCriteria в JSON
+    criteria: Mapped[str] = Column(Text, nullable=False)
+    # Позиция (updated_at, id) последнего просмотренного изменения профилей
+    watermark_updated_at: Mapped[datetime.datetime | None] = Column(DateTime, nullable=True)
+    watermark_profile_id: Mapped[int] = Column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime.datetime] = Column(DateTime, default=datetime.datetime.utcnow)
+    last_checked_at: Mapped[datetime.datetime | None] = Column(DateTime, nullable=True)
+
+# Полнотекстовый индекс FTS5 по именам и описанию профиля (external content:
+# текст хранится только в profiles, индекс синхронизируют триггеры)
+PROFILE_FTS_TABLE = "profiles_fts"
+PROFILE_FTS_COLUMNS = ("first_name", "last_name", "bio")
+
+# Легковесное описание виртуальной таблицы для запросов; в metadata ее нет,
+# создается она DDL-обработчиками ниже
+profiles_fts = table(
+    PROFILE_FTS_TABLE,
+    column("rowid", Integer),
+    column(PROFILE_FTS_TABLE), # Скрытый столбец с именем таблицы - цель MATCH и bm25()
+    *(column(name) for name in PROFILE_FTS_COLUMNS),
+)
+
+def _profile_fts_ddl() -> List[str]:
+    columns = ", ".join(PROFILE_FTS_COLUMNS)
+    new_values = ", ".join(f"new.{name}" for name in PROFILE_FTS_COLUMNS)
+    old_values = ", ".join(f"old.{name}" for name in PROFILE_FTS_COLUMNS)
+    insert_new = f"INSERT INTO {PROFILE_FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    delete_old = (
+        f"INSERT INTO {PROFILE_FTS_TABLE}({PROFILE_FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE {PROFILE_FTS_TABLE} USING fts5({columns}, "
+        f"content='profiles', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {PROFILE_FTS_TABLE}_ai AFTER INSERT ON profiles BEGIN {insert_new} END",
+        f"CREATE TRIGGER {PROFILE_FTS_TABLE}_ad AFTER DELETE ON profiles BEGIN {delete_old} END",
+        f"CREATE TRIGGER {PROFILE_FTS_TABLE}_au AFTER UPDATE OF {columns} ON profiles "
+        f"BEGIN {delete_old} {insert_new} END",
+        # Индексируем профили, которые уже были в таблице до создания индекса
+        f"INSERT INTO {PROFILE_FTS_TABLE}({PROFILE_FTS_TABLE}) VALUES ('rebuild')",
+    ]
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_profile_fts(target, connection, **kw):
+    """Создает FTS5-индекс профилей, если его еще нет (в т.ч. для существующей БД)."""
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": PROFILE_FTS_TABLE},
+    ).first()
+    if exists is None:
+        for statement in _profile_fts_ddl():
+            connection.exec_driver_sql(statement)
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_profile_fts(target, connection, **kw):
+    """Удаляет FTS5-индекс и триггеры до удаления таблицы profiles."""
+    if connection.dialect.name != "sqlite":
+        return
+    for suffix in ("ai", "ad", "au"):
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {PROFILE_FTS_TABLE}_{suffix}")
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {PROFILE_FTS_TABLE}")
+
 class DanceStyle(Base):
     """Модель танцевального стиля."""
     __tablename__ = "dance_styles"
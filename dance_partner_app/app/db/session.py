@@ -1,16 +1,80 @@
-"""Настройки и утилиты для работы с сессией базы данных SQLAlchemy."""
+"""Настройки и утилиты для работы с сессией базы данных SQLAlchemy.
+
+Для SQLite создаются два движка: писатель с единственным соединением
+(записи сериализуются в приложении, а не через "database is locked")
+и пул читателей в режиме query_only. В режиме WAL читатели не блокируются
+писателем, поэтому GET-запросы и поиск масштабируются по соединениям.
+"""
 
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy.orm import declarative_base
 
 from app.core.config import settings
 
-# Создаем асинхронный движок SQLAlchemy
-async_engine = create_async_engine(
-    settings.DATABASE_URL,
-)
+def _is_file_sqlite(url: str) -> bool:
+    """Файловая БД SQLite (in-memory БД нельзя разделить между соединениями)."""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+def _sqlite_pragmas(read_only: bool) -> list[str]:
+    """Список PRAGMA, выполняемых на каждом новом соединении."""
+    pragmas = []
+    if settings.SQLITE_JOURNAL_MODE and not read_only:
+        # Режим журнала хранится в файле БД, достаточно выставить его писателем
+        pragmas.append(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    if settings.SQLITE_SYNCHRONOUS:
+        pragmas.append(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    pragmas.append(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    pragmas.append(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+    pragmas.append(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+def create_sqlite_engine(url: str, read_only: bool = False, **engine_kwargs) -> AsyncEngine:
+    """Создает движок SQLite, настраивающий PRAGMA при открытии соединения."""
+    engine = create_async_engine(url, **engine_kwargs)
+    pragmas = _sqlite_pragmas(read_only)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        # Отключаем неявные транзакции драйвера: BEGIN выдается явно ниже,
+        # иначе SAVEPOINT (группового коммита) фиксировал бы каждую операцию
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _begin(conn):
+        # Писатель сразу берет блокировку записи, а не повышает ее посреди транзакции
+        conn.exec_driver_sql("BEGIN" if read_only else "BEGIN IMMEDIATE")
+
+    return engine
+
+if _is_file_sqlite(settings.DATABASE_URL):
+    # Единственное соединение-писатель: остальные записи ждут его в пуле
+    async_engine = create_sqlite_engine(
+        settings.DATABASE_URL, pool_size=1, max_overflow=0
+    )
+    if settings.SQLITE_SPLIT_READ_WRITE:
+        read_engine = create_sqlite_engine(
+            settings.DATABASE_URL, read_only=True,
+            pool_size=settings.SQLITE_READ_POOL_SIZE, max_overflow=0,
+        )
+    else:
+        read_engine = async_engine
+else:
+    # Создаем асинхронный движок SQLAlchemy
+    async_engine = create_async_engine(
+        settings.DATABASE_URL,
+    )
+    read_engine = async_engine
 
 # Создаем фабрику асинхронных сессий
 async_session_factory = async_sessionmaker(
@@ -19,6 +83,13 @@ async_session_factory = async_sessionmaker(
     expire_on_commit=False,
 )
 
+# Фабрика сессий только для чтения (GET-запросы и поиск партнеров)
+read_session_factory = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
 # Базовый класс для декларативных моделей SQLAlchemy
 Base = declarative_base()
 
@@ -33,7 +104,29 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
+async def get_read_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """Зависимость FastAPI для сессии только для чтения."""
+    async with read_session_factory() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+def get_read_session_factory() -> async_sessionmaker[AsyncSession]:
+    """Зависимость FastAPI: фабрика сессий чтения для потоковых ответов.
+
+    Сессия из get_read_db_session закрывается до отправки тела ответа,
+    поэтому генератор тела открывает собственную сессию из этой фабрики.
+    """
+    return read_session_factory
+
 async def init_db():
     """Инициализирует базу данных, создавая все таблицы."""
     async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all) 
+        await conn.run_sync(Base.metadata.create_all)
+
+async def dispose_engines():
+    """Закрывает соединения движков при остановке приложения."""
+    await async_engine.dispose()
+    if read_engine is not async_engine:
+        await read_engine.dispose()
@@ -0,0 +1,164 @@
+"""Очередь записей с групповым коммитом (group commit) для SQLite.
+
+Каждая запись сервиса - это корутина op(session). Операции конкурентных
+запросов, пришедшие в течение нескольких миллисекунд, выполняются в одной
+транзакции: каждая внутри своего SAVEPOINT, затем один COMMIT (и один
+fsync) на всю пачку. Ошибка одной операции (например, нарушение
+уникальности) откатывает только ее SAVEPOINT и возвращается ее вызывающему,
+остальные операции пачки фиксируются.
+
+Каждая операция выполняется в контексте (contextvars) поставившего ее
+запроса: например, ее SQL попадает в статистику этого запроса.
+"""
+
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Dict, List, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.config import settings
+
+T = TypeVar("T")
+WriteOperation = Callable[[AsyncSession], Awaitable[T]]
+
+
+class WriteBatcher:
+    """Собирает операции записи в пачки и фиксирует каждую пачку одним коммитом."""
+
+    def __init__(self, engine: AsyncEngine, max_delay: float, max_batch: int):
+        self.engine = engine
+        self.max_delay = max_delay # Сколько секунд ждать попутные операции
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.batches = 0
+        self.operations = 0
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Новый event loop (например, в тестах) - заводим новую очередь
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            # Обработчик живет, пока есть работа, и не висит в loop без дела.
+            # Чистый контекст: SQL пачки не приписывается запросу, запустившему обработчик
+            self._worker = loop.create_task(self._run(self._queue), context=contextvars.Context())
+        return self._queue
+
+    async def submit(self, op: WriteOperation) -> T:
+        """Ставит операцию в очередь и ждет ее результата после коммита пачки."""
+        queue = self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((op, future, contextvars.copy_context()))
+        return await future
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while not queue.empty():
+            batch = [queue.get_nowait()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._commit_batch(batch)
+
+    @staticmethod
+    async def _run_nested(session: AsyncSession, op: WriteOperation) -> T:
+        async with session.begin_nested():
+            return await op(session)
+
+    async def _commit_batch(
+        self, batch: List[Tuple[WriteOperation, asyncio.Future, contextvars.Context]]
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        outcomes = []
+        try:
+            async with AsyncSession(self.engine, expire_on_commit=False) as session:
+                for op, future, context in batch:
+                    if future.cancelled():
+                        continue
+                    try:
+                        # Задача в контексте вызывающего; операции пачки по-прежнему идут по очереди
+                        result = await loop.create_task(self._run_nested(session, op), context=context)
+                    except Exception as exc:  # pylint: disable=broad-except
+                        # Ошибка отдается только вызывающему этой операции
+                        outcomes.append((future, None, exc))
+                    else:
+                        outcomes.append((future, result, None))
+                await session.commit()
+        except Exception as exc:  # pylint: disable=broad-except
+            # Коммит пачки не удался - ошибка у всех операций пачки
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        self.batches += 1
+        self.operations += len(outcomes)
+        for future, result, exc in outcomes:
+            if future.done():
+                continue
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        """Счетчики для метрик: сколько пачек и операций зафиксировано."""
+        return {
+            "batches_total": self.batches,
+            "operations_total": self.operations,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+# Один обработчик на движок: в тестах движок подменяется вместе с сессией
+_batchers: Dict[AsyncEngine, WriteBatcher] = {}
+
+
+def get_write_batcher(engine: AsyncEngine) -> WriteBatcher:
+    """Возвращает (создавая при необходимости) очередь записей для движка."""
+    batcher = _batchers.get(engine)
+    if batcher is None:
+        batcher = _batchers[engine] = WriteBatcher(
+            engine,
+            max_delay=settings.WRITE_BATCH_MAX_DELAY_MS / 1000,
+            max_batch=settings.WRITE_BATCH_MAX_SIZE,
+        )
+    return batcher
+
+
+def write_batchers_stats() -> Dict[str, float]:
+    """Суммарные счетчики всех очередей записи."""
+    totals = {"batches_total": 0, "operations_total": 0, "queued": 0}
+    for batcher in _batchers.values():
+        for key, value in batcher.stats().items():
+            totals[key] += value
+    return totals
+
+
+async def run_write(db: AsyncSession, op: WriteOperation) -> T:
+    """Выполняет операцию записи в БД сессии db.
+
+    При включенном WRITE_BATCHING_ENABLED операция уходит в общую очередь
+    движка и фиксируется групповым коммитом; сама сессия db при этом не
+    используется и не занимает соединение-писатель. Иначе операция
+    выполняется и фиксируется прямо в db.
+    """
+    if not settings.WRITE_BATCHING_ENABLED:
+        result = await op(db)
+        await db.commit()
+        return result
+    return await get_write_batcher(db.bind).submit(op)
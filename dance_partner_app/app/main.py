@@ -1,22 +1,39 @@
 """Основной файл приложения FastAPI."""
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, ORJSONResponse
 
-from app.db.session import init_db
+from app.db.session import init_db, dispose_engines, read_session_factory
 from app.db import models
+from app.services.bulk_import import import_hash_pool
+from app.services.matching_index import matching_index
+from app.services.pairing import pairing_jobs
+from app.services.percolator import percolator
+from app.services.style_catalog import style_catalog
+from app.utils.instrumentation import RequestMetricsMiddleware, install_sql_instrumentation
+from app.utils.security import PasswordHashingBusyError, password_hashing_pool
 
 from app.api.endpoints import users as users_router
 from app.api.endpoints import auth as auth_router
 from app.api.endpoints import profiles as profiles_router
 from app.api.endpoints import dance_styles as dance_styles_router
 from app.api.endpoints import matching as matching_router
+from app.api.endpoints import saved_searches as saved_searches_router
+from app.api.endpoints import metrics as metrics_router
+from app.api.endpoints import admin as admin_router
 
 app = FastAPI(
     title="Dance Partner Finder API",
     description="API for finding dance partners.",
     version="0.1.0",
+    # orjson сериализует ответы заметно быстрее стандартного json
+    default_response_class=ORJSONResponse,
 )
 
+# Метрики латентности и SQL по каждому запросу, см. /metrics
+install_sql_instrumentation()
+app.add_middleware(RequestMetricsMiddleware)
+
 @app.get("/")
 async def read_root():
     """Корневой эндпоинт."""
@@ -28,9 +45,36 @@ async def on_startup():
     print("Initializing database...")
     await init_db()
     print("Database initialized.")
+    async with read_session_factory() as session:
+        await matching_index.load(session)
+        await percolator.ensure_loaded(session)
+        await style_catalog.load(session)
+    print(f"Matching index built: {len(matching_index)} profiles.")
+    print(f"Dance style catalog loaded: {len(style_catalog)} styles.")
+    print(f"Saved search percolator loaded: {len(percolator)} searches.")
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Освобождает ресурсы при остановке приложения."""
+    password_hashing_pool.shutdown()
+    pairing_jobs.shutdown()
+    import_hash_pool.shutdown()
+    await dispose_engines()
+
+@app.exception_handler(PasswordHashingBusyError)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusyError):
+    """Отвечает 503, когда очередь хеширования паролей переполнена."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
 
 app.include_router(users_router.router, prefix="/users", tags=["Users"])
 app.include_router(auth_router.router, prefix="/auth", tags=["Authentication"])
 app.include_router(profiles_router.router, prefix="/profiles", tags=["Profiles"])
 app.include_router(dance_styles_router.router, prefix="/styles", tags=["Dance Styles"])
-app.include_router(matching_router.router, prefix="/matching", tags=["Matching"]) 
\ No newline at end of file
+app.include_router(matching_router.router, prefix="/matching", tags=["Matching"])
+app.include_router(saved_searches_router.router, prefix="/saved-searches", tags=["Saved Searches"])
+app.include_router(metrics_router.router, prefix="/metrics", tags=["Metrics"])
+app.include_router(admin_router.router, prefix="/admin", tags=["Admin"]) 
\ No newline at end of file
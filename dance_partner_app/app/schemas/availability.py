@@ -0,0 +1,38 @@
+"""Pydantic схемы недельного расписания (доступности) профиля."""
+
+from typing import List
+
+from pydantic import BaseModel, Field, model_validator
+
+# Время в формате HH:MM с шагом 30 минут; 24:00 - конец суток
+SLOT_TIME_PATTERN = r"^(([01]\d|2[0-3]):(00|30)|24:00)$"
+
+def time_to_minutes(value: str) -> int:
+    """Переводит 'HH:MM' в минуты от начала суток."""
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+# Интервал доступности внутри одного дня недели
+class AvailabilityInterval(BaseModel):
+    """Интервал времени в один день недели (0 - понедельник, 6 - воскресенье)."""
+    day: int = Field(ge=0, le=6)
+    start: str = Field(pattern=SLOT_TIME_PATTERN, examples=["18:00"])
+    end: str = Field(pattern=SLOT_TIME_PATTERN, examples=["21:30"])
+
+    @model_validator(mode="after")
+    def _check_order(self):
+        """Конец интервала должен быть позже начала."""
+        if time_to_minutes(self.end) <= time_to_minutes(self.start):
+            raise ValueError("end must be later than start")
+        return self
+
+# Схема для установки расписания (полностью заменяет предыдущее)
+class WeeklyAvailabilityUpdate(BaseModel):
+    """Недельное расписание: список интервалов, пересечения допускаются."""
+    intervals: List[AvailabilityInterval] = Field(default_factory=list, max_length=7 * 48)
+
+# Схема для чтения расписания
+class WeeklyAvailability(BaseModel):
+    """Расписание, приведенное к непересекающимся интервалам по 30 минут."""
+    intervals: List[AvailabilityInterval]
+    hours_per_week: float
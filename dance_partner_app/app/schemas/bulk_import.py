@@ -0,0 +1,61 @@
+"""Pydantic схемы массового импорта пользователей и профилей."""
+
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, EmailStr, Field, field_validator
+
+from .profile import ProfileBase, SkillLevelValue
+
+# Поддерживаемые форматы входных данных
+ImportFormat = Literal["csv", "jsonl"]
+
+# Строка импорта: пользователь и его профиль
+class ImportRecord(ProfileBase):
+    """Пользователь, профиль и стили по названиям с уровнями.
+
+    dance_styles принимает {"Salsa": "Advanced"}, список названий или
+    объектов {"name": ..., "skill_level": ...}, а в CSV - строку
+    "Salsa:Advanced;Bachata" (уровень по умолчанию - Beginner).
+    """
+    email: EmailStr
+    password: str = Field(min_length=1)
+    dance_styles: Dict[str, SkillLevelValue] = Field(default_factory=dict)
+
+    @field_validator("dance_styles", mode="before")
+    @classmethod
+    def _parse_dance_styles(cls, value: Any) -> Any:
+        """Приводит все поддерживаемые записи стилей к словарю название -> уровень."""
+        if value is None or value == "":
+            return {}
+        if isinstance(value, str):
+            value = [item for item in value.split(";") if item.strip()]
+        if isinstance(value, list):
+            styles = {}
+            for item in value:
+                if isinstance(item, dict):
+                    styles[item.get("name")] = item.get("skill_level", "Beginner")
+                else:
+                    name, _, level = str(item).partition(":")
+                    styles[name] = level.strip() or "Beginner"
+            value = styles
+        if isinstance(value, dict):
+            return {str(name).strip(): level for name, level in value.items()}
+        return value
+
+# Ошибка в строке импорта
+class ImportRowError(BaseModel):
+    """Номер строки входных данных (с 1, для CSV - с учетом заголовка) и причина."""
+    line: int
+    email: Optional[str] = None
+    error: str
+
+# Итог импорта
+class ImportReport(BaseModel):
+    """Сколько строк прочитано, импортировано и отклонено, и скорость импорта."""
+    total: int
+    imported: int
+    failed: int
+    seconds: float
+    rows_per_second: float
+    errors: List[ImportRowError]
+    errors_truncated: bool # True - ошибок больше, чем перечислено в errors
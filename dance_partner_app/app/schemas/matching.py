@@ -2,12 +2,57 @@
 
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from .profile import ProfileRead, SkillLevelValue
+
+# Максимальный радиус поиска вокруг своего местоположения, км
+MAX_RADIUS_KM = 500
 
 # Схема для критериев поиска партнеров
 class PartnerSearchCriteria(BaseModel):
     """Схема, описывающая критерии поиска партнеров."""
     city: Optional[str] = None # Город (необязательно)
     dance_style_ids: Optional[List[int]] = None # Список ID желаемых стилей (необязательно)
-    min_skill_level: Optional[str] = None # Минимальный уровень (пока строка, можно сделать Enum)
-    # Можно добавить другие критерии: пол, возраст и т.д.
\ No newline at end of file
+    min_skill_level: Optional[SkillLevelValue] = None # Минимальный уровень по любому из стилей
+    text: Optional[str] = Field(default=None, max_length=200) # Слова из имени или описания (полнотекстовый поиск)
+    radius_km: Optional[float] = Field(default=None, gt=0, le=MAX_RADIUS_KM) # Радиус вокруг координат своего профиля
+    min_overlap_hours: Optional[float] = Field(default=None, gt=0, le=168) # Минимум общих часов в недельном расписании
+    include_liked: bool = False # Показывать ли профили, которым уже поставлен лайк
+    # Можно добавить другие критерии: пол, возраст и т.д.
+
+# Схема запроса постраничного (keyset) поиска партнеров
+class PartnerSearchPageRequest(PartnerSearchCriteria):
+    """Критерии поиска с размером страницы и курсором продолжения."""
+    limit: int = Field(default=20, ge=1, le=100) # Размер страницы
+    cursor: Optional[str] = None # Непрозрачный курсор из next_cursor предыдущей страницы
+
+# Схема ответа постраничного поиска
+class PartnerSearchPage(BaseModel):
+    """Страница найденных профилей и курсор следующей страницы."""
+    items: List[ProfileRead]
+    next_cursor: Optional[str] = None # None - страниц больше нет
+
+# Схема запроса ранжированного поиска
+class RankedSearchRequest(PartnerSearchCriteria):
+    """Критерии ранжированного поиска: город влияет на оценку, а не фильтрует."""
+    top_k: int = Field(default=20, ge=1, le=100) # Сколько лучших кандидатов вернуть
+
+# Схема найденного партнера с оценкой совместимости
+class RankedPartner(BaseModel):
+    """Профиль кандидата и его оценка совместимости (0..1)."""
+    profile: ProfileRead
+    score: float
+
+# Подсказка города для автодополнения
+class CitySuggestion(BaseModel):
+    """Название города и число профилей в нем."""
+    city: str
+    profiles: int
+
+# Результат лайка
+class LikeResult(BaseModel):
+    """Итог лайка: новый ли он и стало ли совпадение взаимным."""
+    profile_id: int
+    created: bool # False - лайк уже был поставлен раньше
+    mutual: bool # Профиль тоже поставил лайк текущему пользователю
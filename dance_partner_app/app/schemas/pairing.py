@@ -0,0 +1,41 @@
+"""Pydantic схемы подбора пар для мероприятий."""
+
+import datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.core.config import settings
+from app.schemas.profile import SkillLevelValue
+
+# Схема запроса подбора пар
+class PairingRequest(BaseModel):
+    """Участники мероприятия: явный список профилей или критерии отбора."""
+    profile_ids: Optional[List[int]] = Field(
+        default=None, min_length=2, max_length=settings.PAIRING_MAX_PARTICIPANTS
+    ) # Если задан, критерии ниже не используются
+    city: Optional[str] = None
+    dance_style_ids: Optional[List[int]] = None
+    min_skill_level: Optional[SkillLevelValue] = None
+
+# Пара в результате подбора
+class DancePair(BaseModel):
+    """Партнер, партнерша и совместимость пары (0..1)."""
+    leader_id: int
+    follower_id: int
+    score: float
+
+# Схема состояния задачи подбора пар
+class PairingJobRead(BaseModel):
+    """Состояние задачи; пары заполнены после завершения."""
+    job_id: str
+    status: Literal["running", "done", "failed"]
+    created_at: datetime.datetime
+    finished_at: Optional[datetime.datetime] = None
+    participants: int
+    pairs: Optional[List[DancePair]] = None # По убыванию совместимости
+    unpaired_ids: Optional[List[int]] = None # Кому не нашлось пары
+    total_score: Optional[float] = None
+    error: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,17 +1,35 @@
 """Pydantic схемы для сущности Profile."""
 
 import datetime
-from typing import List # standard library first
-from pydantic import BaseModel, ConfigDict
+from typing import Annotated, Any, List # standard library first
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, PlainSerializer, model_validator
 
+from app.db.models import DanceRole, SkillLevel
 # Импортируем схему для чтения DanceStyle, чтобы использовать ее здесь
 from .dance_style import DanceStyleRead
 
+def _parse_skill_level(value: Any) -> Any:
+    """Принимает уровень по имени (без учета регистра) или по номеру."""
+    if isinstance(value, str) and not value.strip().isdigit():
+        try:
+            return SkillLevel[value.strip().upper()]
+        except KeyError as e:
+            expected = ", ".join(level.name.capitalize() for level in SkillLevel)
+            raise ValueError(f"Unknown skill level '{value}'. Expected one of: {expected}") from e
+    return value
+
+# Уровень владения стилем: в JSON - имя ("Intermediate"), внутри - SkillLevel
+SkillLevelValue = Annotated[
+    SkillLevel,
+    BeforeValidator(_parse_skill_level),
+    PlainSerializer(lambda level: level.name.capitalize(), return_type=str, when_used="json"),
+]
+
 # Схема для связи Профиля и Стиля Танца (включая уровень)
 class ProfileDanceStyleLink(BaseModel):
     """Схема для представления связи Профиль-Стиль с уровнем."""
     dance_style: DanceStyleRead
-    skill_level: str
+    skill_level: SkillLevelValue
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -24,17 +42,33 @@ class ProfileBase(BaseModel):
     city: str | None = None
     bio: str | None = None
     preferred_contact: str | None = None
+    dance_role: DanceRole | None = None # Роль в паре; None - обе роли
+    latitude: float | None = Field(default=None, ge=-90, le=90) # Широта, градусы
+    longitude: float | None = Field(default=None, ge=-180, le=180) # Долгота, градусы
+
+    @model_validator(mode="after")
+    def _check_location_pair(self):
+        """Координаты задаются (или сбрасываются) только парой."""
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude and longitude must be set together")
+        return self
 
 # Схема для создания Profile (связь с user_id будет установлена в логике)
 class ProfileCreate(ProfileBase):
     """Схема для создания профиля."""
     pass
 
+# Схема для установки стиля с уровнем владения
+class ProfileDanceStyleLevel(BaseModel):
+    """Схема для указания стиля и уровня владения им при обновлении профиля."""
+    dance_style_id: int
+    skill_level: SkillLevelValue = SkillLevel.BEGINNER
+
 # Схема для обновления Profile (все поля опциональны)
 class ProfileUpdate(ProfileBase):
     """Схема для обновления профиля."""
-    dance_style_ids: list[int] | None = None
-    pass
+    dance_style_ids: list[int] | None = None # Новые стили получают уровень Beginner
+    dance_styles: list[ProfileDanceStyleLevel] | None = None # Стили с уровнями (приоритетнее dance_style_ids)
 
 # Схема для чтения Profile (из БД)
 class ProfileRead(ProfileBase):
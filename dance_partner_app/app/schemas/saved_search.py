@@ -0,0 +1,40 @@
+"""Pydantic схемы для сохраненных поисков партнеров."""
+
+import datetime
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+from .matching import PartnerSearchCriteria
+from .profile import ProfileRead
+
+# Схема для создания сохраненного поиска
+class SavedSearchCreate(BaseModel):
+    """Название и критерии поиска; проверка находит профили, измененные после сохранения."""
+    name: str = Field(min_length=1, max_length=100)
+    criteria: PartnerSearchCriteria = Field(default_factory=PartnerSearchCriteria)
+
+# Схема для чтения сохраненного поиска
+class SavedSearchRead(BaseModel):
+    """Сохраненный поиск с временем последней проверки."""
+    id: int
+    name: str
+    criteria: PartnerSearchCriteria
+    created_at: datetime.datetime
+    last_checked_at: Optional[datetime.datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("criteria", mode="before")
+    @classmethod
+    def _parse_criteria(cls, value: Any) -> Any:
+        """В БД критерии хранятся строкой JSON."""
+        if isinstance(value, (str, bytes)):
+            return PartnerSearchCriteria.model_validate_json(value)
+        return value
+
+# Схема результата проверки сохраненного поиска
+class SavedSearchDelta(BaseModel):
+    """Профили, созданные или измененные после прошлой проверки, в порядке изменения."""
+    items: List[ProfileRead]
+    has_more: bool # True - изменений больше лимита, следующая проверка вернет остальные
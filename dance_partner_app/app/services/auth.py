@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import User
 from app.services import users as users_service # Импортируем сервис пользователей
-from app.utils.security import verify_password
+from app.utils.security import verify_password_async
 
 async def authenticate_user(
     db: AsyncSession, email: str, password: str
@@ -13,6 +13,6 @@ async def authenticate_user(
     user = await users_service.get_user_by_email(db, email=email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user 
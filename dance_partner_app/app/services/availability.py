@@ -0,0 +1,88 @@
+"""Недельное расписание профиля как битовая маска слотов по 30 минут.
+
+Неделя - 7 дней x 48 слотов = 336 бит; бит day * 48 + slot означает, что
+танцор свободен в этот слот. В БД маска хранится 42 байтами, в in-memory
+индексе - строкой из AVAILABILITY_WORDS слов uint64, поэтому пересечение
+расписаний по всем кандидатам считается одним AND и popcount в NumPy.
+Чтение и запись расписания в БД - в сервисе профилей.
+"""
+
+import math
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from app.schemas.availability import AvailabilityInterval, WeeklyAvailability, time_to_minutes
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+TOTAL_SLOTS = 7 * SLOTS_PER_DAY
+MASK_BYTES = TOTAL_SLOTS // 8
+AVAILABILITY_WORDS = -(-TOTAL_SLOTS // 64) # 6 слов по 64 бита
+
+
+def min_overlap_slots(hours: float) -> int:
+    """Сколько общих слотов нужно, чтобы набралось не меньше hours часов."""
+    return math.ceil(hours * 60 / SLOT_MINUTES)
+
+
+def intervals_to_mask(intervals: Iterable[AvailabilityInterval]) -> int:
+    """Собирает маску из интервалов (пересечения просто объединяются)."""
+    mask = 0
+    for interval in intervals:
+        first = interval.day * SLOTS_PER_DAY + time_to_minutes(interval.start) // SLOT_MINUTES
+        last = interval.day * SLOTS_PER_DAY + time_to_minutes(interval.end) // SLOT_MINUTES
+        mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+
+def mask_to_intervals(mask: int) -> List[Dict[str, object]]:
+    """Раскладывает маску на непрерывные интервалы внутри каждого дня."""
+    intervals = []
+    for day in range(7):
+        day_bits = mask >> (day * SLOTS_PER_DAY) & ((1 << SLOTS_PER_DAY) - 1)
+        slot = 0
+        while day_bits >> slot:
+            if not day_bits >> slot & 1:
+                slot += 1
+                continue
+            start = slot
+            while slot < SLOTS_PER_DAY and day_bits >> slot & 1:
+                slot += 1
+            intervals.append({
+                "day": day,
+                "start": _slot_to_time(start),
+                "end": _slot_to_time(slot),
+            })
+    return intervals
+
+
+def weekly_availability(mask: int) -> WeeklyAvailability:
+    """Схема ответа по маске: интервалы и суммарное число часов в неделю."""
+    return WeeklyAvailability(
+        intervals=mask_to_intervals(mask),
+        hours_per_week=mask.bit_count() * SLOT_MINUTES / 60,
+    )
+
+
+def _slot_to_time(slot: int) -> str:
+    minutes = slot * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def mask_to_bytes(mask: int) -> bytes:
+    return mask.to_bytes(MASK_BYTES, "little")
+
+
+def bytes_to_mask(data: bytes | None) -> int:
+    return int.from_bytes(data, "little") if data else 0
+
+
+def mask_to_words(mask: int) -> np.ndarray:
+    """Маска как массив слов uint64 (младшие биты - в первом слове)."""
+    return np.frombuffer(mask.to_bytes(AVAILABILITY_WORDS * 8, "little"), dtype="<u8").copy()
+
+
+def overlap_slots(candidate_words: np.ndarray, words: np.ndarray) -> np.ndarray:
+    """Число общих слотов каждой строки candidate_words с words (AND + popcount)."""
+    return np.bitwise_count(candidate_words & words).sum(axis=1, dtype=np.int64)
@@ -0,0 +1,386 @@
+"""Массовый импорт пользователей, профилей и стилей из CSV или JSONL.
+
+Вход читается потоком и обрабатывается пачками по IMPORT_BATCH_SIZE строк:
+проверка схемы и стилей (названия сопоставляются с id по одной загрузке
+справочника), отсев email, которые уже есть в БД или встречались во
+входе, bcrypt в пуле процессов и вставка многострочными INSERT одной
+транзакцией на пачку. Пока вставляется одна пачка, уже хешируется
+следующая. Ошибочные строки попадают в отчет и не прерывают импорт.
+
+Импортированные профили попадают в индекс поиска перестройкой индекса в
+конце импорта; уведомления сохраненных поисков для них не рассылаются.
+"""
+
+import asyncio
+import csv
+import datetime
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Sequence, Tuple
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.models import Profile, User, profile_dance_style_association
+from app.db.write_queue import run_write
+from app.schemas.bulk_import import ImportFormat, ImportRecord
+from app.services.matching_index import matching_index
+from app.services.style_catalog import style_catalog
+from app.utils.normalization import normalize_city
+from app.utils.security import get_password_hashes
+
+# Сколько ошибочных строк перечислять в отчете
+MAX_REPORTED_ERRORS = 1000
+# Столбцы CSV без которых импорт невозможен
+REQUIRED_CSV_COLUMNS = ("email", "password")
+# Поля ImportRecord, которые пишутся в таблицу profiles как есть
+PROFILE_COLUMNS = (
+    "first_name", "last_name", "city", "bio", "preferred_contact", "latitude", "longitude"
+)
+# Синонимы Content-Type для форматов импорта
+CONTENT_TYPE_FORMATS: Dict[str, ImportFormat] = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/jsonlines": "jsonl",
+}
+
+
+class BulkImportBusyError(RuntimeError):
+    """Другой импорт еще выполняется."""
+
+
+class PasswordHashProcessPool:
+    """Пул процессов для bcrypt при массовом импорте.
+
+    Пул потоков логинов (password_hashing_pool) рассчитан на одиночные
+    хеши и ограничен очередью; пачка импорта делится поровну между
+    процессами и занимает все ядра, не отнимая потоки у логинов.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor: ProcessPoolExecutor | None = None
+        self.hashed = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: дочерние процессы не наследуют потоки и соединения event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def hash_passwords(self, passwords: Sequence[str]) -> List[str]:
+        """Хеши паролей в исходном порядке."""
+        if not passwords:
+            return []
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        size = -(-len(passwords) // self.workers)
+        try:
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(executor, get_password_hashes, list(passwords[start:start + size]))
+                for start in range(0, len(passwords), size)
+            ))
+        except BrokenProcessPool:
+            self._executor = None # Следующая пачка поднимет новый пул
+            raise
+        self.hashed += len(passwords)
+        return [hashed for part in parts for hashed in part]
+
+    def shutdown(self) -> None:
+        """Останавливает процессы пула (при завершении приложения)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+import_hash_pool = PasswordHashProcessPool(workers=settings.IMPORT_HASH_WORKERS)
+
+# Импорты выполняются по одному: каждый и так занимает все процессы пула
+_import_running = False
+
+
+class _ImportRow:
+    """Проверенная строка импорта с уровнями по id стилей."""
+
+    __slots__ = ("line", "record", "levels")
+
+    def __init__(self, line: int, record: ImportRecord, levels: Dict[int, int]):
+        self.line = line
+        self.record = record
+        self.levels = levels
+
+
+class ImportStats:
+    """Счетчики и ошибки импорта; as_dict() - словарь ImportReport."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def fail(self, line: int, error: str, email: str | None = None) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "email": email, "error": error})
+
+    def as_dict(self) -> Dict[str, Any]:
+        seconds = time.perf_counter() - self.started
+        return {
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.failed,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.imported / seconds, 1) if seconds > 0 else 0.0,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def detect_format(content_type: str | None) -> ImportFormat | None:
+    """Формат по заголовку Content-Type (None - не распознан)."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPE_FORMATS.get(media_type)
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Строки потока байтов с номерами (с 1), без перевода строки."""
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line.rstrip(b"\r")
+    if buffer:
+        yield number + 1, buffer.rstrip(b"\r")
+
+
+async def iter_records(
+    chunks: AsyncIterable[bytes], fmt: ImportFormat
+) -> AsyncIterator[Tuple[int, Dict[str, Any] | str]]:
+    """Записи входа: (номер строки, словарь полей) или (номер строки, текст ошибки).
+
+    Ошибка в заголовке CSV прерывает импорт ValueError: без него
+    ни одну строку не разобрать.
+    """
+    header: List[str] | None = None
+    pending: List[str] = [] # Физические строки записи CSV с переводом строки в кавычках
+    first_line = 0
+    async for number, raw in iter_lines(chunks):
+        try:
+            line = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            yield number, "Line is not valid UTF-8"
+            continue
+        if number == 1:
+            line = line.lstrip("\ufeff") # BOM, который добавляют табличные редакторы
+
+        if fmt == "jsonl":
+            if not line.strip():
+                continue
+            try:
+                value = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                yield number, f"Invalid JSON: {e}"
+                continue
+            yield number, value if isinstance(value, dict) else "Each line must be a JSON object"
+            continue
+
+        if not pending:
+            if not line.strip():
+                continue
+            first_line = number
+        pending.append(line)
+        text = "\n".join(pending)
+        # Нечетное число кавычек - поле в кавычках продолжается на следующей строке
+        if text.count('"') % 2:
+            continue
+        pending = []
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            missing = [name for name in REQUIRED_CSV_COLUMNS if name not in header]
+            if missing:
+                raise ValueError(f"CSV header must contain columns: {', '.join(missing)}")
+            continue
+        if len(values) != len(header):
+            yield first_line, f"Expected {len(header)} fields, got {len(values)}"
+            continue
+        # Пустые ячейки - отсутствующие значения
+        yield first_line, {name: value for name, value in zip(header, values) if value != ""}
+    if pending:
+        yield first_line, "Unterminated quoted field"
+
+
+async def load_style_lookup(db: AsyncSession) -> Dict[str, int]:
+    """Справочник стилей: название без учета регистра -> id (из справочника в памяти)."""
+    # Стили, созданные другими процессами, должны находиться по названию
+    await style_catalog.catch_up(db)
+    return style_catalog.name_lookup()
+
+
+def _validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+async def _existing_emails(read_db: AsyncSession, emails: List[str]) -> set:
+    result = await read_db.execute(select(User.email).filter(User.email.in_(emails)))
+    existing = set(result.scalars().all())
+    # Завершаем читающую транзакцию: следующая проверка увидит уже вставленные пачки
+    await read_db.rollback()
+    return existing
+
+
+async def _insert_batch(
+    db: AsyncSession, rows: List[_ImportRow], hashes: List[str]
+) -> Dict[str, int]:
+    """Вставляет пачку одной транзакцией; возвращает email -> id созданных пользователей."""
+    async def _insert(session: AsyncSession) -> Dict[str, int]:
+        now = datetime.datetime.utcnow()
+        users = User.__table__
+        # OR IGNORE: email, зарегистрированный после проверки, не валит всю пачку
+        result = await session.execute(
+            insert(users).prefix_with("OR IGNORE").returning(users.c.id, users.c.email),
+            [
+                {"email": row.record.email, "hashed_password": hashed, "is_active": True}
+                for row, hashed in zip(rows, hashes)
+            ],
+        )
+        user_ids = {email: user_id for user_id, email in result.all()}
+        created = [row for row in rows if row.record.email in user_ids]
+        if not created:
+            return user_ids
+
+        profiles = Profile.__table__
+        result = await session.execute(
+            insert(profiles).returning(profiles.c.id, profiles.c.user_id),
+            [
+                {
+                    **row.record.model_dump(include=set(PROFILE_COLUMNS)),
+                    "user_id": user_ids[row.record.email],
+                    "city_key": normalize_city(row.record.city),
+                    "dance_role": row.record.dance_role.value if row.record.dance_role else None,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for row in created
+            ],
+        )
+        profile_ids = {user_id: profile_id for profile_id, user_id in result.all()}
+        links = [
+            {
+                "profile_id": profile_ids[user_ids[row.record.email]],
+                "dance_style_id": style_id,
+                "skill_level": level,
+            }
+            for row in created
+            for style_id, level in row.levels.items()
+        ]
+        if links:
+            await session.execute(insert(profile_dance_style_association), links)
+        return user_ids
+
+    return await run_write(db, _insert)
+
+
+async def bulk_import(
+    db: AsyncSession,
+    read_db: AsyncSession,
+    chunks: AsyncIterable[bytes],
+    fmt: ImportFormat,
+    batch_size: int = settings.IMPORT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """Импортирует поток CSV/JSONL и возвращает словарь ImportReport."""
+    global _import_running
+    if _import_running:
+        raise BulkImportBusyError("Another import is in progress")
+    _import_running = True
+    try:
+        stats = ImportStats()
+        styles = await load_style_lookup(read_db)
+        seen_emails: set = set()
+        batch: List[_ImportRow] = []
+        # Вставляемая в фоне пачка и ее задача
+        inserting: Tuple[List[_ImportRow], asyncio.Future] | None = None
+
+        async def finish_insert() -> None:
+            nonlocal inserting
+            if inserting is None:
+                return
+            (rows, task), inserting = inserting, None
+            user_ids = await task
+            for row in rows:
+                if row.record.email in user_ids:
+                    stats.imported += 1
+                else:
+                    stats.fail(row.line, "Email already registered", row.record.email)
+
+        async def flush() -> None:
+            nonlocal inserting
+            existing = await _existing_emails(read_db, [row.record.email for row in batch])
+            rows = []
+            for row in batch:
+                if row.record.email in existing:
+                    stats.fail(row.line, "Email already registered", row.record.email)
+                else:
+                    rows.append(row)
+            # Хешируем эту пачку, пока вставляется предыдущая
+            hashes = await import_hash_pool.hash_passwords([row.record.password for row in rows])
+            await finish_insert()
+            if rows:
+                inserting = (rows, asyncio.ensure_future(_insert_batch(db, rows, hashes)))
+
+        try:
+            async for line, value in iter_records(chunks, fmt):
+                stats.total += 1
+                if isinstance(value, str):
+                    stats.fail(line, value)
+                    continue
+                try:
+                    record = ImportRecord.model_validate(value)
+                except ValidationError as e:
+                    email = value.get("email")
+                    stats.fail(line, _validation_message(e), email if isinstance(email, str) else None)
+                    continue
+                unknown = [name for name in record.dance_styles if name.casefold() not in styles]
+                if unknown:
+                    stats.fail(line, f"Unknown dance style: {', '.join(unknown)}", record.email)
+                    continue
+                if record.email in seen_emails:
+                    stats.fail(line, "Duplicate email in input", record.email)
+                    continue
+                seen_emails.add(record.email)
+                levels = {styles[name.casefold()]: int(level) for name, level in record.dance_styles.items()}
+                batch.append(_ImportRow(line, record, levels))
+                if len(batch) >= batch_size:
+                    await flush()
+                    batch = []
+            if batch:
+                await flush()
+            await finish_insert()
+        finally:
+            if inserting is not None:
+                # Прерванный импорт: дожидаемся начатой вставки, чтобы не оставить ее без хозяина
+                await asyncio.gather(inserting[1], return_exceptions=True)
+
+        if stats.imported and matching_index.loaded:
+            # Перестройка дешевле десятков тысяч точечных обновлений и сбрасывает кэш поиска
+            await matching_index.load(read_db)
+        return stats.as_dict()
+    finally:
+        _import_running = False
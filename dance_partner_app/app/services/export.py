@@ -0,0 +1,92 @@
+"""Потоковая выгрузка всех профилей со стилями в NDJSON или CSV.
+
+Профили читаются курсором (stream + yield_per) в порядке id пачками по
+EXPORT_CHUNK_SIZE строк; стили с уровнями для пачки загружаются одним
+диапазонным запросом по первичному ключу связей (profile_id между первым
+и последним id пачки), справочник названий стилей - один раз на выгрузку.
+Каждая пачка сразу сериализуется и отдается, поэтому память не зависит
+от размера таблицы. Вся выгрузка идет в одной читающей транзакции и
+видит согласованный снимок БД.
+
+Строка выгрузки - поля ProfileRead, а в dance_styles у каждого стиля
+есть еще skill_level. В CSV стили записаны как в импорте:
+"Salsa:Advanced;Bachata:Beginner".
+"""
+
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List, Literal
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import DanceStyle, Profile, SkillLevel, profile_dance_style_association
+from app.utils.serialization import PROFILE_COLUMNS, PROFILE_FIELDS, PROFILE_STYLES_FIELD
+
+# Сколько профилей читать и сериализовать за раз
+EXPORT_CHUNK_SIZE = 1000
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_MEDIA_TYPES: Dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+async def iter_profile_chunks(
+    db: AsyncSession, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Пачки словарей профилей со стилями и уровнями в порядке id."""
+    assoc = profile_dance_style_association
+    style_names = dict((await db.execute(select(DanceStyle.id, DanceStyle.name))).all())
+
+    result = await db.stream(
+        select(*PROFILE_COLUMNS).order_by(Profile.id).execution_options(yield_per=chunk_size)
+    )
+    async for rows in result.partitions(chunk_size):
+        profiles = [dict(zip(PROFILE_FIELDS, row)) for row in rows]
+        styles_by_profile: Dict[int, List[Dict[str, Any]]] = {}
+        # Пачка упорядочена по id - связи читаются диапазоном первичного ключа
+        link_rows = await db.execute(
+            select(assoc.c.profile_id, assoc.c.dance_style_id, assoc.c.skill_level)
+            .filter(assoc.c.profile_id.between(profiles[0]["id"], profiles[-1]["id"]))
+            .order_by(assoc.c.profile_id, assoc.c.dance_style_id)
+        )
+        for profile_id, style_id, level in link_rows:
+            styles_by_profile.setdefault(profile_id, []).append({
+                "id": style_id,
+                "name": style_names.get(style_id),
+                "skill_level": SkillLevel(level).name.capitalize(),
+            })
+        for profile in profiles:
+            profile[PROFILE_STYLES_FIELD] = styles_by_profile.get(profile["id"], [])
+        yield profiles
+
+def _csv_value(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+async def export_profiles(
+    db: AsyncSession, fmt: ExportFormat, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Выгрузка по кускам байтов: один кусок на пачку профилей (CSV - с заголовком в начале)."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow((*PROFILE_FIELDS, PROFILE_STYLES_FIELD))
+        yield buffer.getvalue().encode("utf-8")
+
+    async for profiles in iter_profile_chunks(db, chunk_size):
+        if fmt == "ndjson":
+            yield b"".join(orjson.dumps(profile) + b"\n" for profile in profiles)
+            continue
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            (
+                *(_csv_value(profile[name]) for name in PROFILE_FIELDS),
+                ";".join(f"{style['name']}:{style['skill_level']}" for style in profile[PROFILE_STYLES_FIELD]),
+            )
+            for profile in profiles
+        )
+        yield buffer.getvalue().encode("utf-8")
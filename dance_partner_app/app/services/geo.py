@@ -0,0 +1,93 @@
+"""Геометрия для поиска по радиусу: ячейки сетки и векторный haversine.
+
+Поверхность делится на ячейки GEO_CELL_DEGREES x GEO_CELL_DEGREES
+градусов. Запрос по радиусу сначала отбирает ячейки, пересекающие
+описанный вокруг круга прямоугольник, и только для профилей из этих
+ячеек считает точное расстояние.
+"""
+
+import math
+from typing import Callable, Iterator, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Размер ячейки сетки: 0.25 градуса - около 28 км по широте
+GEO_CELL_DEGREES = 0.25
+# Километров в одном градусе широты
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+_LAT_CELLS = int(180 / GEO_CELL_DEGREES)
+_LON_CELLS = int(360 / GEO_CELL_DEGREES)
+
+GeoCell = Tuple[int, int]
+
+
+def cell_of(latitude: float, longitude: float) -> GeoCell:
+    """Ячейка сетки, в которую попадает точка."""
+    row = min(int((latitude + 90) // GEO_CELL_DEGREES), _LAT_CELLS - 1)
+    column = int((longitude + 180) // GEO_CELL_DEGREES) % _LON_CELLS
+    return row, column
+
+
+def cell_count_within(latitude: float, radius_km: float) -> int:
+    """Сколько ячеек перебрал бы cells_within (для выбора стратегии перебора)."""
+    rows, columns = _cell_ranges(latitude, radius_km)
+    return len(rows) * len(columns)
+
+
+def cells_within(latitude: float, longitude: float, radius_km: float) -> Iterator[GeoCell]:
+    """Ячейки, пересекающие прямоугольник вокруг круга радиуса radius_km."""
+    rows, column_offsets = _cell_ranges(latitude, radius_km)
+    center_column = cell_of(latitude, longitude)[1]
+    if len(column_offsets) >= _LON_CELLS:
+        columns = range(_LON_CELLS)
+    else:
+        columns = [(center_column + offset) % _LON_CELLS for offset in column_offsets]
+    for row in rows:
+        for column in columns:
+            yield row, column
+
+
+def cell_filter(latitude: float, longitude: float, radius_km: float) -> Callable[[GeoCell], bool]:
+    """Проверка ячейки на попадание в cells_within без перебора всех ячеек круга."""
+    rows, column_offsets = _cell_ranges(latitude, radius_km)
+    if len(column_offsets) >= _LON_CELLS:
+        return lambda cell: cell[0] in rows
+    center_column = cell_of(latitude, longitude)[1]
+    span = column_offsets.stop - 1
+
+    def contains(cell: GeoCell) -> bool:
+        offset = (cell[1] - center_column) % _LON_CELLS
+        return cell[0] in rows and (offset <= span or offset >= _LON_CELLS - span)
+
+    return contains
+
+
+def _cell_ranges(latitude: float, radius_km: float) -> Tuple[range, range]:
+    delta_lat = radius_km / _KM_PER_DEGREE
+    south = max(-90.0, latitude - delta_lat)
+    north = min(90.0, latitude + delta_lat)
+    rows = range(cell_of(south, 0)[0], cell_of(north, 0)[0] + 1)
+
+    # Шире всего прямоугольник на самой удаленной от экватора широте
+    widest = math.cos(math.radians(max(abs(south), abs(north))))
+    if widest <= 1e-9:
+        return rows, range(_LON_CELLS)
+    delta_lon = radius_km / (_KM_PER_DEGREE * widest)
+    if delta_lon >= 180:
+        return rows, range(_LON_CELLS)
+    span = math.ceil(delta_lon / GEO_CELL_DEGREES)
+    return rows, range(-span, span + 1)
+
+
+def haversine_km(
+    latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    """Расстояния по дуге большого круга от точки до массива точек, в км."""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
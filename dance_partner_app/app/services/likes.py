@@ -0,0 +1,57 @@
+"""Сервисный слой для лайков и взаимных совпадений."""
+
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import exists, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import Profile, profile_likes
+from app.db.write_queue import run_write
+from app.services import profiles as profiles_service
+from app.services.matching_index import matching_index
+
+async def like_profile(db: AsyncSession, own_profile: Profile, profile_id: int) -> Tuple[bool, bool]:
+    """Ставит лайк профилю; возвращает (лайк новый, совпадение взаимное)."""
+    if profile_id == own_profile.id:
+        raise ValueError("You cannot like your own profile")
+
+    async def _insert(session: AsyncSession) -> Tuple[bool, bool]:
+        target_exists = await session.scalar(select(exists().where(Profile.id == profile_id)))
+        if not target_exists:
+            raise LookupError("Profile not found")
+        # Повторный лайк не ошибка: OR IGNORE по первичному ключу (from, to)
+        result = await session.execute(
+            insert(profile_likes).prefix_with("OR IGNORE").values(
+                from_profile_id=own_profile.id, to_profile_id=profile_id
+            )
+        )
+        # Взаимность - точечный поиск обратной пары по первичному ключу
+        mutual = await session.scalar(select(exists().where(
+            profile_likes.c.from_profile_id == profile_id,
+            profile_likes.c.to_profile_id == own_profile.id,
+        )))
+        return result.rowcount > 0, bool(mutual)
+
+    created, mutual = await run_write(db, _insert)
+    matching_index.add_like(own_profile.id, profile_id)
+    return created, mutual
+
+async def get_mutual_match_ids(db: AsyncSession, profile_id: int) -> List[int]:
+    """Id профилей со взаимным лайком, новые совпадения первыми."""
+    sent = profile_likes.alias("sent")
+    received = profile_likes.alias("received")
+    result = await db.execute(
+        select(sent.c.to_profile_id)
+        # Свои лайки - диапазон первичного ключа, обратная пара - точечный поиск по нему же
+        .join(received, (received.c.from_profile_id == sent.c.to_profile_id)
+              & (received.c.to_profile_id == sent.c.from_profile_id))
+        .filter(sent.c.from_profile_id == profile_id)
+        # Совпадение случилось при втором из двух лайков
+        .order_by(func.max(sent.c.created_at, received.c.created_at).desc(), sent.c.to_profile_id.desc())
+    )
+    return list(result.scalars())
+
+async def get_mutual_match_dicts(db: AsyncSession, profile_id: int) -> List[Dict[str, Any]]:
+    """Профили взаимных совпадений готовыми словарями ProfileRead."""
+    return await profiles_service.get_profile_dicts(db, await get_mutual_match_ids(db, profile_id))
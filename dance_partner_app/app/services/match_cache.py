@@ -0,0 +1,180 @@
+"""Кэш результатов поиска партнеров с точной инвалидацией по версиям.
+
+Ключ - нормализованные критерии поиска (город, набор стилей, уровень),
+значение - упорядоченный массив id профилей, без ORM-объектов. Кэш общий
+для всех пользователей: собственный профиль исключается при чтении.
+
+Каждая запись профиля получает порядковый номер и проставляет его городам
+и стилям профиля до и после изменения. Запись кэша устарела, только если
+после ее заполнения менялись и подходящий под запрос город (по префиксу),
+и один из стилей запроса: профиль, не совпадающий с запросом хотя бы по
+одному измерению, ни до, ни после изменения не мог попасть в результат.
+
+Запись города отмечается под всеми его префиксами, поэтому проверка записи
+кэша читает ровно по одному счетчику на город и стиль запроса. Счетчики не
+новее самой старой живой записи ни на что не влияют и удаляются, когда их
+становится больше MAX_VERSION_KEYS.
+"""
+
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.normalization import normalize_city
+
+# Ключ: (город, стили, минимальный уровень); None - измерение не задано
+CacheKey = Tuple[str | None, FrozenSet[int] | None, int | None]
+
+# Предел числа счетчиков версий (префиксов городов и стилей) на один кэш
+MAX_VERSION_KEYS = 65536
+
+
+class CachedResult:
+    """Результат поиска, его город и стили и порядковый номер записи, на котором он был получен."""
+
+    __slots__ = ("profile_ids", "city", "styles", "sequence", "generation")
+
+    def __init__(
+        self,
+        profile_ids: np.ndarray,
+        city: str | None,
+        styles: FrozenSet[int] | None,
+        sequence: int,
+        generation: int,
+    ):
+        self.profile_ids = profile_ids
+        self.city = city
+        self.styles = styles
+        self.sequence = sequence
+        self.generation = generation
+
+
+class MatchResultCache:
+    """LRU-кэш результатов поиска с ограничением по числу записей и памяти."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, CachedResult]" = OrderedDict()
+        self._bytes = 0
+        # Номер последней записи профиля и номера последних изменений
+        # по префиксам городов и по стилям
+        self._sequence = 0
+        self._city_versions: Dict[str, int] = {}
+        self._style_versions: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(
+        city: str | None, style_ids: Iterable[int] | None, min_level: int | None
+    ) -> CacheKey:
+        """Нормализует критерии: регистр и пробелы города, порядок и повторы стилей."""
+        styles = frozenset(style_ids) if style_ids else None
+        return normalize_city(city), styles, int(min_level) if min_level else None
+
+    def get(self, key: CacheKey, generation: int) -> np.ndarray | None:
+        """Возвращает id профилей, если запись есть и не устарела."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.generation != generation or self._is_stale(entry):
+            self._drop(key)
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.profile_ids
+
+    def set(self, key: CacheKey, profile_ids: np.ndarray, generation: int) -> None:
+        """Сохраняет результат, вытесняя давно не читавшиеся записи сверх лимитов."""
+        if profile_ids.nbytes > self.max_bytes:
+            return # Слишком большой результат не вытесняет весь кэш
+        self._drop(key)
+        city, styles, _ = key
+        self._entries[key] = CachedResult(profile_ids, city, styles, self._sequence, generation)
+        self._bytes += profile_ids.nbytes
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._drop(oldest_key)
+            self.evictions += 1
+
+    def record_write(self, cities: Iterable[str | None], style_ids: Iterable[int]) -> None:
+        """Отмечает изменение профиля: города и стили до и после записи."""
+        self._sequence += 1
+        for city_key in cities:
+            if city_key is not None:
+                # Запрос по городу - префикс city_key, любой из них может быть затронут
+                for end in range(len(city_key) + 1):
+                    self._city_versions[city_key[:end]] = self._sequence
+        for style_id in style_ids:
+            self._style_versions[style_id] = self._sequence
+        if len(self._city_versions) + len(self._style_versions) > MAX_VERSION_KEYS:
+            self._prune_versions()
+
+    def clear(self) -> None:
+        """Удаляет все записи; без записей счетчики версий больше не нужны."""
+        self._entries.clear()
+        self._bytes = 0
+        self._city_versions.clear()
+        self._style_versions.clear()
+
+    def _is_stale(self, entry: CachedResult) -> bool:
+        sequence = entry.sequence
+        if self._sequence == sequence:
+            return False
+        # Незаданное измерение совпадает с любым профилем: хватает любой записи
+        if entry.city is not None and self._city_versions.get(entry.city, 0) <= sequence:
+            return False
+        if entry.styles is None:
+            return True
+        return any(self._style_versions.get(style_id, 0) > sequence for style_id in entry.styles)
+
+    def _prune_versions(self) -> None:
+        """Удаляет счетчики не новее самой старой записи, при нехватке места - весь кэш."""
+        oldest = min((entry.sequence for entry in self._entries.values()), default=self._sequence)
+        # Отсутствующий счетчик читается как 0 и, как и удаленный, никого не делает устаревшим
+        self._city_versions = {
+            city: version for city, version in self._city_versions.items() if version > oldest
+        }
+        self._style_versions = {
+            style_id: version
+            for style_id, version in self._style_versions.items() if version > oldest
+        }
+        # Старая запись удерживает все счетчики после себя: проще начать кэш заново
+        if len(self._city_versions) + len(self._style_versions) > MAX_VERSION_KEYS // 2:
+            self.invalidations += len(self._entries)
+            self.clear()
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.profile_ids.nbytes
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики кэша для метрик."""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+match_cache = MatchResultCache(
+    max_entries=settings.MATCH_CACHE_MAX_ENTRIES,
+    max_bytes=settings.MATCH_CACHE_MAX_BYTES,
+)
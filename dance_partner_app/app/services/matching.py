@@ -1,45 +1,437 @@
 """Сервисный слой для поиска партнеров."""
 
-from typing import List # standard library first
+import base64
+import binascii
+import datetime
+import json
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Sequence, Tuple # standard library first
 
-from sqlalchemy.ext.asyncio import AsyncSession
+import numpy as np
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from app.db.models import Profile, profile_dance_style_association, User
-from app.schemas.matching import PartnerSearchCriteria
+from app.db.models import Profile, SkillLevel, profile_dance_style_association, profile_likes
+from app.schemas.matching import (
+    PartnerSearchCriteria, PartnerSearchPageRequest, RankedSearchRequest
+)
+from app.services import profiles as profiles_service
+from app.services import text_search
+from app.services.availability import min_overlap_slots
+from app.services.match_cache import match_cache
+from app.services.matching_index import bitmap_membership, matching_index
+from app.services.scoring import compatibility_scores, top_k
+from app.services.users import Principal
+from app.utils.normalization import PREFIX_UPPER_BOUND, normalize_city
 
-async def find_dance_partners(
-    db: AsyncSession, criteria: PartnerSearchCriteria, current_user: User
-) -> List[Profile]:
-    """Ищет профили танцоров по заданным критериям."""
+# Сколько профилей загружать из БД одним запросом при гидрации
+HYDRATE_CHUNK_SIZE = 500
+# Первая пачка потоковой выдачи поиска: первые партнеры уходят клиенту без ожидания остальных
+STREAM_FIRST_CHUNK_SIZE = 50
 
+async def hydrate_profiles(db: AsyncSession, profile_ids: Sequence[int]) -> List[Profile]:
+    """Загружает профили по id, сохраняя порядок переданного списка."""
+    loaded = {}
+    for start in range(0, len(profile_ids), HYDRATE_CHUNK_SIZE):
+        chunk = profile_ids[start:start + HYDRATE_CHUNK_SIZE]
+        result = await db.execute(
+            select(Profile)
+            # Сразу загружаем связанные стили, чтобы не делать доп. запросы
+            .options(selectinload(Profile.dance_styles))
+            .filter(Profile.id.in_(chunk))
+        )
+        loaded.update((profile.id, profile) for profile in result.scalars())
+    # Профиль мог быть удален после построения индекса - просто пропускаем его
+    return [loaded[profile_id] for profile_id in profile_ids if profile_id in loaded]
+
+def _search_center(
+    criteria: PartnerSearchCriteria, current_user: Principal
+) -> Tuple[float, float, float] | None:
+    """Центр и радиус поиска: координаты собственного профиля и radius_km."""
+    if criteria.radius_km is None:
+        return None
+    own = matching_index.user_record(current_user.id)
+    if own is None or own.location is None:
+        raise ValueError("Set latitude and longitude in your profile to search by radius_km")
+    return (*own.location, criteria.radius_km)
+
+def _overlap_filter(
+    criteria: PartnerSearchCriteria, current_user: Principal
+) -> Tuple[int, int] | None:
+    """Маска своего расписания и минимум общих слотов для min_overlap_hours."""
+    if criteria.min_overlap_hours is None:
+        return None
+    own = matching_index.user_record(current_user.id)
+    mask = matching_index.availability_mask(own.id) if own is not None else 0
+    if not mask:
+        raise ValueError("Set your weekly availability to search by min_overlap_hours")
+    return mask, min_overlap_slots(criteria.min_overlap_hours)
+
+def _apply_overlap(
+    profile_ids: np.ndarray, overlap: Tuple[int, int] | None
+) -> np.ndarray:
+    """Оставляет профили с достаточным пересечением, большее пересечение - первым.
+
+    Сортировка устойчивая: при равном пересечении сохраняется исходный порядок.
+    """
+    if overlap is None or not len(profile_ids):
+        return profile_ids
+    mask, min_slots = overlap
+    slots = matching_index.availability_overlap(profile_ids, mask)
+    keep = slots >= min_slots
+    profile_ids, slots = profile_ids[keep], slots[keep]
+    return profile_ids[np.argsort(-slots, kind="stable")]
+
+async def index_only_filter(
+    db: AsyncSession, criteria: PartnerSearchCriteria, current_user: Principal
+) -> Callable[[np.ndarray], np.ndarray] | None:
+    """Фильтр по критериям, которые знает только in-memory индекс (радиус, расписание).
+
+    Возвращает функцию: массив id -> булев массив подходящих; None - таких
+    критериев нет. SQL-запрос таких фильтров не содержит, их применяют к
+    окнам id из индекса, поэтому в IN попадает не больше страницы id.
+    """
+    if criteria.radius_km is None and criteria.min_overlap_hours is None:
+        return None
+    await matching_index.ensure_loaded(db)
+    near = _search_center(criteria, current_user)
+    overlap = _overlap_filter(criteria, current_user)
+
+    def accept(profile_ids: np.ndarray) -> np.ndarray:
+        keep = np.ones(len(profile_ids), dtype=bool)
+        if near is not None:
+            latitude, longitude, radius_km = near
+            # Без координат расстояние - NaN, и сравнение дает False
+            keep &= matching_index.distances(profile_ids, latitude, longitude) <= radius_km
+        if overlap is not None:
+            mask, min_slots = overlap
+            keep &= matching_index.availability_overlap(profile_ids, mask) >= min_slots
+        return keep
+
+    return accept
+
+def _exclude_liked(
+    profile_ids: np.ndarray, criteria: PartnerSearchCriteria, current_user: Principal
+) -> np.ndarray:
+    """Убирает профили, которым пользователь уже поставил лайк (если не include_liked)."""
+    own = matching_index.user_record(current_user.id)
+    if criteria.include_liked or own is None:
+        return profile_ids
+    liked = matching_index.liked_ids(own.id)
+    if not liked or not len(profile_ids):
+        return profile_ids
+    return profile_ids[~np.isin(profile_ids, np.fromiter(liked, dtype=np.int64, count=len(liked)))]
+
+async def find_dance_partner_ids(
+    db: AsyncSession, criteria: PartnerSearchCriteria, current_user: Principal
+) -> List[int]:
+    """Id подходящих профилей по in-memory индексу (индекс должен быть загружен).
+
+    С текстовым критерием результат упорядочен по релевантности BM25,
+    с radius_km - по расстоянию, иначе - новые профили первыми;
+    min_overlap_hours поверх этого ставит вперед большее пересечение расписаний.
+    """
+    overlap = _overlap_filter(criteria, current_user)
+    profile_ids = await _matching_ids(db, criteria, current_user)
+    profile_ids = _exclude_liked(np.asarray(profile_ids, dtype=np.int64), criteria, current_user)
+    return _apply_overlap(profile_ids, overlap).tolist()
+
+async def _matching_ids(
+    db: AsyncSession, criteria: PartnerSearchCriteria, current_user: Principal
+) -> List[int] | np.ndarray:
+    near = _search_center(criteria, current_user)
+    if text_search.build_match_query(criteria.text) is not None:
+        bitmap = matching_index.filter_bitmap(
+            city=criteria.city,
+            style_ids=criteria.dance_style_ids,
+            min_level=criteria.min_skill_level,
+            exclude_user_id=current_user.id,
+            near=near,
+        )
+        return await _text_matching_ids(
+            db, criteria.text, bitmap, near, limit=text_search.MAX_TEXT_MATCHES
+        )
+    if near is not None:
+        # Поиск вокруг своего местоположения персональный - мимо кэша
+        return matching_index.search(
+            city=criteria.city,
+            style_ids=criteria.dance_style_ids,
+            min_level=criteria.min_skill_level,
+            exclude_user_id=current_user.id,
+            near=near,
+        )
+
+    key = match_cache.make_key(
+        criteria.city, criteria.dance_style_ids, criteria.min_skill_level
+    )
+    profile_ids = match_cache.get(key, matching_index.generation)
+    if profile_ids is None:
+        # В кэш кладется общий для всех результат, без исключения своего профиля
+        profile_ids = np.array(matching_index.search(
+            city=criteria.city,
+            style_ids=criteria.dance_style_ids,
+            min_level=criteria.min_skill_level,
+        ), dtype=np.int64)
+        match_cache.set(key, profile_ids, matching_index.generation)
+
+    own = matching_index.user_record(current_user.id)
+    if own is not None:
+        profile_ids = profile_ids[profile_ids != own.id]
+    return profile_ids
+
+async def _text_matching_ids(
+    db: AsyncSession,
+    text: str | None,
+    bitmap: int,
+    near: Tuple[float, float, float] | None,
+    limit: int | None,
+) -> List[int]:
+    """Совпадения FTS5 по релевантности, входящие в bitmap и в круг near; не больше limit.
+
+    Текст индексирует FTS5, остальные критерии - битовая карта индекса:
+    пачки совпадений проверяются по ней, без списка всех совпадений FTS5.
+    limit=None - все совпадения (их не больше, чем профилей в bitmap).
+    """
+    contains = bitmap_membership(bitmap)
+    found: List[int] = []
+    async with aclosing(text_search.iter_profile_id_chunks(db, text)) as chunks:
+        async for text_ids in chunks:
+            profile_ids = np.array(
+                [profile_id for profile_id in text_ids if contains(profile_id)], dtype=np.int64
+            )
+            if near is not None and len(profile_ids):
+                latitude, longitude, radius_km = near
+                distances = matching_index.distances(profile_ids, latitude, longitude)
+                profile_ids = profile_ids[distances <= radius_km]
+            if limit is not None:
+                profile_ids = profile_ids[:limit - len(found)]
+            found.extend(profile_ids.tolist())
+            if limit is not None and len(found) >= limit:
+                break
+    return found
+
+async def find_dance_partner_dicts(
+    db: AsyncSession, criteria: PartnerSearchCriteria, current_user: Principal
+) -> List[Dict[str, Any]]:
+    """Ищет профили танцоров и возвращает их готовыми словарями ProfileRead."""
+    await matching_index.ensure_loaded(db)
+    profile_ids = await find_dance_partner_ids(db, criteria, current_user)
+    return await profiles_service.get_profile_dicts(db, profile_ids)
+
+async def stream_dance_partner_dicts(
+    db: AsyncSession,
+    criteria: PartnerSearchCriteria,
+    current_user: Principal,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Ищет профили и возвращает пачки словарей ProfileRead для потоковой отдачи.
+
+    Id подходящих профилей находятся сразу в сессии db (ошибка критериев -
+    ValueError до начала ответа), а сами профили читаются по мере отправки
+    пачек в собственной сессии из session_factory: db к тому времени закрыта.
+    """
+    await matching_index.ensure_loaded(db)
+    profile_ids = await find_dance_partner_ids(db, criteria, current_user)
+    return _iter_partner_dict_chunks(session_factory, profile_ids)
+
+async def _iter_partner_dict_chunks(
+    session_factory: async_sessionmaker[AsyncSession], profile_ids: Sequence[int]
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    session = session_factory()
+    try:
+        async for chunk in profiles_service.iter_profile_dict_chunks(
+            session, profile_ids, first_chunk_size=STREAM_FIRST_CHUNK_SIZE
+        ):
+            yield chunk
+    finally:
+        await session.close()
+
+def encode_cursor(profile: Profile) -> str:
+    """Кодирует позицию (created_at, id) последнего профиля страницы в курсор."""
+    raw = json.dumps([profile.created_at.isoformat(), profile.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """Декодирует курсор в позицию (created_at, id)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, profile_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.datetime.fromisoformat(created_at), int(profile_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+async def build_partner_query(
+    db: AsyncSession, criteria: PartnerSearchCriteria, current_user: Principal
+) -> Select:
+    """SQL-запрос профилей по критериям поиска, без сортировки и лимита.
+
+    Критерии из index_only_filter в запрос не входят.
+    """
+    assoc = profile_dance_style_association
     query = (
         select(Profile)
-        # Сразу загружаем связанные стили, чтобы не делать доп. запросы
-        .options(selectinload(Profile.dance_styles))
         # Исключаем профиль текущего пользователя
         .filter(Profile.user_id != current_user.id)
     )
 
-    # Применяем фильтры по критериям
-    if criteria.city:
-        query = query.filter(Profile.city.ilike(f"%{criteria.city}%"))
+    city_prefix = normalize_city(criteria.city)
+    if city_prefix:
+        # Префикс как диапазон по индексу city_key вместо ilike('%...%') по всей таблице
+        query = query.filter(
+            Profile.city_key >= city_prefix,
+            Profile.city_key < city_prefix + PREFIX_UPPER_BOUND,
+        )
 
-    if criteria.dance_style_ids:
-        query = (
-            query
-            .join(profile_dance_style_association)
-            .filter(profile_dance_style_association.c.dance_style_id.in_(
-                criteria.dance_style_ids)
+    if criteria.dance_style_ids or criteria.min_skill_level:
+        # Подзапрос по индексу (dance_style_id, skill_level, profile_id):
+        # фильтр по уровню - диапазон внутри индекса, без JOIN + DISTINCT
+        matching_profiles = select(assoc.c.profile_id)
+        if criteria.dance_style_ids:
+            matching_profiles = matching_profiles.filter(
+                assoc.c.dance_style_id.in_(criteria.dance_style_ids)
             )
+        if criteria.min_skill_level:
+            matching_profiles = matching_profiles.filter(
+                assoc.c.skill_level >= criteria.min_skill_level
+            )
+        query = query.filter(Profile.id.in_(matching_profiles))
+
+    match_query = text_search.build_match_query(criteria.text)
+    if match_query is not None:
+        # Порядок страниц остается keyset-порядком (created_at, id), не релевантностью
+        query = query.filter(Profile.id.in_(text_search.matching_ids_query(match_query)))
+
+    if not criteria.include_liked:
+        # Отправленные лайки - диапазон первичного ключа (from, to) в подзапросе
+        own_profile_id = (
+            select(Profile.id).filter(Profile.user_id == current_user.id).scalar_subquery()
         )
+        query = query.filter(Profile.id.not_in(
+            select(profile_likes.c.to_profile_id)
+            .filter(profile_likes.c.from_profile_id == own_profile_id)
+        ))
+    return query
+
+async def find_dance_partners_page(
+    db: AsyncSession, criteria: PartnerSearchPageRequest, current_user: Principal
+) -> Tuple[List[Profile], str | None]:
+    """Ищет одну страницу профилей с keyset-пагинацией.
+
+    Сортировка (created_at, id) по убыванию выполняется в SQL по индексу
+    на created_at, поэтому стоимость запроса зависит от размера страницы,
+    а не от количества подходящих профилей. С критериями, которые знает
+    только in-memory индекс, окна кандидатов в том же порядке отбирает
+    индекс, а SQL проверяет остальные критерии для id одного окна.
+    """
+    query = await build_partner_query(db, criteria, current_user)
+    query = query.options(selectinload(Profile.dance_styles)).order_by(
+        Profile.created_at.desc(), Profile.id.desc()
+    )
+    position = decode_cursor(criteria.cursor) if criteria.cursor else None
+    # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+    wanted = criteria.limit + 1
+
+    accept = await index_only_filter(db, criteria, current_user)
+    if accept is None:
+        if position is not None:
+            query = query.filter(tuple_(Profile.created_at, Profile.id) < tuple_(*position))
+        result = await db.execute(query.limit(wanted))
+        profiles = list(result.scalars().all())
+    else:
+        bitmap = matching_index.filter_bitmap(
+            city=criteria.city,
+            style_ids=criteria.dance_style_ids,
+            min_level=criteria.min_skill_level,
+            exclude_user_id=current_user.id,
+            # Ячейки сетки вокруг круга сужают окна; точное расстояние проверит accept
+            near=_search_center(criteria, current_user),
+        )
+        profiles = []
+        while len(profiles) < wanted:
+            window, position = matching_index.newest_window(
+                bitmap, position, wanted - len(profiles), accept
+            )
+            if window:
+                result = await db.execute(query.filter(Profile.id.in_(window)))
+                profiles.extend(result.scalars().all())
+            if position is None:
+                break
+
+    next_cursor = None
+    if len(profiles) > criteria.limit:
+        profiles = profiles[:criteria.limit]
+        next_cursor = encode_cursor(profiles[-1])
+    return profiles, next_cursor
+
+async def rank_dance_partners(
+    db: AsyncSession, criteria: RankedSearchRequest, current_user: Principal
+) -> List[Tuple[Profile, float]]:
+    """Ранжирует кандидатов по совместимости и возвращает top_k лучших.
+
+    Эталоном служат стили из критериев (или стили собственного профиля)
+    с уровнями пользователя; город из критериев (или из профиля) дает бонус.
+    """
+    await matching_index.ensure_loaded(db)
+    min_level = criteria.min_skill_level
+
+    own = matching_index.user_record(current_user.id)
+    own_levels = dict(zip(own.style_ids, own.skill_levels)) if own else {}
+    if criteria.dance_style_ids:
+        # Для стилей, которыми пользователь не владеет, ориентируемся на минимальный уровень
+        wanted = {
+            style_id: own_levels.get(style_id, min_level or SkillLevel.BEGINNER)
+            for style_id in criteria.dance_style_ids
+        }
+    else:
+        wanted = own_levels
+
+    candidate_ids = matching_index.candidate_array(
+        style_ids=criteria.dance_style_ids, exclude_user_id=current_user.id
+    )
+    candidate_ids = _exclude_liked(candidate_ids, criteria, current_user)
+    if text_search.build_match_query(criteria.text) is not None:
+        # Все совпадения среди кандидатов, а не первые по BM25: ранжирует совместимость
+        text_ids = await _text_matching_ids(
+            db, criteria.text,
+            matching_index.filter_bitmap(
+                style_ids=criteria.dance_style_ids, exclude_user_id=current_user.id
+            ),
+            near=None, limit=None,
+        )
+        candidate_ids = candidate_ids[np.isin(candidate_ids, text_ids)]
+    near = _search_center(criteria, current_user)
+    if near is not None:
+        latitude, longitude, radius_km = near
+        candidate_ids = candidate_ids[
+            matching_index.distances(candidate_ids, latitude, longitude) <= radius_km
+        ]
+    overlap = _overlap_filter(criteria, current_user)
+    if overlap is not None:
+        # Порядок по пересечению не важен: итог упорядочит оценка совместимости
+        candidate_ids = np.sort(_apply_overlap(candidate_ids, overlap))
+    levels = matching_index.level_matrix(candidate_ids)
+    reference = matching_index.style_vector(wanted)
+
+    if min_level is not None:
+        # Кандидат должен владеть хотя бы одним из эталонных стилей на нужном уровне
+        considered = levels[:, reference > 0] if reference.any() else levels
+        keep = (considered >= min_level).any(axis=1)
+        candidate_ids, levels = candidate_ids[keep], levels[keep]
 
-    query = query.distinct()
+    city = criteria.city or (own.city_key if own else None)
+    city_match = matching_index.city_mask(candidate_ids, city) if city else None
 
-    result = await db.execute(query)
-    profiles = list(result.scalars().all())
+    scores = compatibility_scores(levels, reference, city_match)
+    best = top_k(scores, candidate_ids, criteria.top_k)
 
-    profiles.sort(key=lambda p: p.created_at, reverse=True)
+    best_ids = candidate_ids[best].tolist()
+    score_by_id = dict(zip(best_ids, scores[best].tolist()))
+    profiles = await hydrate_profiles(db, best_ids)
+    return [(profile, round(score_by_id[profile.id], 4)) for profile in profiles]
 
-    return profiles 
+async def suggest_cities(db: AsyncSession, prefix: str | None, limit: int) -> List[Tuple[str, int]]:
+    """Подсказки городов по префиксу из отсортированных ключей in-memory индекса."""
+    await matching_index.ensure_loaded(db)
+    return matching_index.cities(prefix, limit)
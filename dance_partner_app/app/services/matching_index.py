@@ -0,0 +1,622 @@
+"""In-memory инвертированный индекс профилей для поиска партнеров.
+
+Индекс хранит битовые карты (Python int, бит N = профиль с id N):
+(style_id, уровень) -> профили и нормализованный город -> профили города.
+Ключи городов дополнительно хранятся отсортированными: фильтр по городу
+и подсказки - это поиск диапазона по префиксу.
+Поиск сводится к OR/AND над битовыми картами, а SQLite нужен только для
+загрузки (гидрации) итоговой страницы профилей.
+
+Кроме битовых карт индекс держит плотную матрицу уровней владения
+стилями (строка - id профиля, столбец - стиль), по которой ранжирование
+считается векторно через NumPy. Недельные расписания лежат там же
+строками слов uint64: пересечение с расписанием ищущего - AND и popcount.
+Профили также упорядочены по (created_at, id): постраничный поиск идет
+по этому порядку от курсора и проверяет кандидатов по битовой карте, так
+что в SQL уходят только id одной страницы.
+Отправленные лайки - множество id на профиль: его размер зависит от числа
+лайков, а не от наибольшего id, как было бы у битовой карты.
+
+Индекс живет в памяти процесса: он строится при старте приложения
+(или лениво при первом поиске) и обновляется сервисом профилей после
+каждой успешной записи.
+"""
+
+import asyncio
+import bisect
+import datetime
+from typing import AbstractSet, Callable, Dict, Iterable, List, Mapping, Set, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import (
+    Profile, ProfileAvailability, SkillLevel, profile_dance_style_association, profile_likes
+)
+from app.services.availability import AVAILABILITY_WORDS, bytes_to_mask, mask_to_words, overlap_slots
+from app.services.geo import (
+    GeoCell, cell_count_within, cell_filter, cell_of, cells_within, haversine_km
+)
+from app.utils.normalization import PREFIX_UPPER_BOUND, display_city, normalize_city
+
+MAX_SKILL_LEVEL = int(max(SkillLevel))
+# Сколько позиций порядка выдачи проверять за раз при отборе страницы
+ORDER_SCAN_BLOCK = 256
+
+# Позиция в порядке выдачи: (created_at, id) - как курсор постраничного поиска
+OrderKey = Tuple[datetime.datetime, int]
+
+# Позиции установленных битов для каждого значения байта (0..255)
+_BYTE_BITS = tuple(
+    tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)
+)
+
+
+def bitmap_to_ids(bitmap: int) -> List[int]:
+    """Разворачивает битовую карту в отсортированный список id."""
+    if bitmap <= 0:
+        return []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    ids: List[int] = []
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset * 8
+            ids.extend(base + bit for bit in _BYTE_BITS[byte])
+    return ids
+
+
+def bitmap_to_array(bitmap: int) -> np.ndarray:
+    """Разворачивает битовую карту в отсортированный массив id без цикла Python."""
+    if bitmap <= 0:
+        return np.empty(0, dtype=np.int64)
+    data = np.frombuffer(
+        bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little"), dtype=np.uint8
+    )
+    return np.flatnonzero(np.unpackbits(data, bitorder="little"))
+
+
+def bitmap_membership(bitmap: int) -> Callable[[int], bool]:
+    """Проверка id на вхождение в битовую карту за O(1).
+
+    То же, что bitmap >> id & 1, но без сдвига всего числа на каждый id.
+    """
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little") if bitmap > 0 else b""
+    size = len(data)
+    return lambda profile_id: profile_id >> 3 < size and bool(data[profile_id >> 3] >> (profile_id & 7) & 1)
+
+
+def ids_to_bitmap(ids: Iterable[int]) -> int:
+    """Собирает битовую карту из набора id за один проход NumPy."""
+    array = np.fromiter(ids, dtype=np.int64)
+    if not len(array):
+        return 0
+    flags = np.zeros(int(array.max()) + 1, dtype=np.uint8)
+    flags[array] = 1
+    return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+
+async def load_style_levels(db: AsyncSession, profile_id: int) -> Dict[int, int]:
+    """Читает уровни стилей профиля из ассоциативной таблицы по первичному ключу."""
+    link_rows = await db.execute(
+        select(
+            profile_dance_style_association.c.dance_style_id,
+            profile_dance_style_association.c.skill_level,
+        ).filter(profile_dance_style_association.c.profile_id == profile_id)
+    )
+    return dict(link_rows.all())
+
+
+class ProfileRecord:
+    """Компактная запись профиля, необходимая для поиска."""
+    __slots__ = (
+        "id", "user_id", "city_key", "created_at", "style_ids", "skill_levels", "location"
+    )
+
+    def __init__(
+        self,
+        profile_id: int,
+        user_id: int,
+        city_key: str | None,
+        created_at: datetime.datetime,
+        style_ids: tuple,
+        skill_levels: tuple,
+        location: Tuple[float, float] | None = None,
+    ):
+        self.id = profile_id
+        self.user_id = user_id
+        self.city_key = city_key
+        self.created_at = created_at
+        self.style_ids = style_ids
+        self.skill_levels = skill_levels # Уровни (SkillLevel) в порядке style_ids
+        self.location = location # (широта, долгота) или None
+
+
+class MatchingIndex:
+    """Инвертированный индекс профилей: стили, города и компактные записи."""
+
+    def __init__(self):
+        self._records: Dict[int, ProfileRecord] = {}
+        self._profile_by_user: Dict[int, int] = {}
+        self._by_style_level: Dict[Tuple[int, int], int] = {}
+        self._by_city: Dict[str, int] = {}
+        # Отсортированные ключи городов (поиск по префиксу - бинарный поиск)
+        # и название для показа по ключу
+        self._city_keys: List[str] = []
+        self._city_names: Dict[str, str] = {}
+        self._all = 0
+        # Ключи (created_at, id) по возрастанию; удаленные профили остаются
+        # в списке до перестройки, но их уже нет в битовых картах
+        self._order: List[OrderKey] = []
+        # Матрица уровней: строка - id профиля, столбец - стиль, 0 - стиля нет
+        self._levels = np.zeros((0, 0), dtype=np.int8)
+        self._style_columns: Dict[int, int] = {}
+        # Координаты по id профиля (NaN - не заданы) и ячейки сетки -> профили
+        self._coords = np.full((0, 2), np.nan)
+        self._by_cell: Dict[GeoCell, int] = {}
+        # Недельные расписания по id профиля (нули - расписание не задано)
+        self._availability = np.zeros((0, AVAILABILITY_WORDS), dtype=np.uint64)
+        # Профиль -> id профилей, которым он поставил лайк
+        self._likes: Dict[int, Set[int]] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        # Номер поколения растет при каждой перестройке; по нему сбрасываются кэши поиска
+        self.generation = 0
+
+    @property
+    def loaded(self) -> bool:
+        """Признак того, что индекс построен."""
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    async def load(self, db: AsyncSession) -> None:
+        """Полностью перестраивает индекс по данным из БД."""
+        async with self._lock:
+            await self._build(db)
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """Строит индекс, если он еще не был построен."""
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self._build(db)
+
+    async def _build(self, db: AsyncSession) -> None:
+        """Читает профили, связи со стилями, расписания и лайки плоскими запросами."""
+        profile_rows = await db.execute(
+            select(
+                Profile.id, Profile.user_id, Profile.city, Profile.created_at,
+                Profile.latitude, Profile.longitude,
+            )
+        )
+        link_rows = await db.execute(
+            select(
+                profile_dance_style_association.c.profile_id,
+                profile_dance_style_association.c.dance_style_id,
+                profile_dance_style_association.c.skill_level,
+            )
+        )
+        availability_rows = await db.execute(
+            select(ProfileAvailability.profile_id, ProfileAvailability.slots)
+        )
+        like_rows = await db.execute(
+            select(profile_likes.c.from_profile_id, profile_likes.c.to_profile_id)
+        )
+        links_by_profile: Dict[int, Dict[int, int]] = {}
+        for profile_id, style_id, skill_level in link_rows:
+            links_by_profile.setdefault(profile_id, {})[style_id] = skill_level
+
+        self.clear()
+        profile_rows = profile_rows.all()
+        for row in profile_rows:
+            self._remember_city_name(row.city)
+        self._bulk_add([
+            self._make_record(
+                profile_id, user_id, city, created_at, links_by_profile.get(profile_id, {}),
+                latitude, longitude,
+            )
+            for profile_id, user_id, city, created_at, latitude, longitude in profile_rows
+        ])
+        for profile_id, slots in availability_rows:
+            if profile_id in self._records:
+                self._availability[profile_id] = mask_to_words(bytes_to_mask(slots))
+        for from_profile_id, to_profile_id in like_rows:
+            self._likes.setdefault(from_profile_id, set()).add(to_profile_id)
+        self._loaded = True
+
+    def _bulk_add(self, records: List[ProfileRecord]) -> None:
+        """Заполняет пустой индекс: каждая битовая карта собирается один раз."""
+        style_members: Dict[Tuple[int, int], List[int]] = {}
+        city_members: Dict[str, List[int]] = {}
+        cell_members: Dict[GeoCell, List[int]] = {}
+        located: List[ProfileRecord] = []
+        rows: List[int] = []
+        columns: List[int] = []
+        values: List[int] = []
+        for record in records:
+            self._records[record.id] = record
+            self._profile_by_user[record.user_id] = record.id
+            for style_id, level in zip(record.style_ids, record.skill_levels):
+                style_members.setdefault((style_id, level), []).append(record.id)
+                rows.append(record.id)
+                columns.append(self._style_column(style_id))
+                values.append(level)
+            if record.city_key is not None:
+                city_members.setdefault(record.city_key, []).append(record.id)
+            if record.location is not None:
+                cell_members.setdefault(cell_of(*record.location), []).append(record.id)
+                located.append(record)
+
+        self._all = ids_to_bitmap(self._records)
+        self._order = sorted((record.created_at, record.id) for record in self._records.values())
+        self._by_style_level = {key: ids_to_bitmap(ids) for key, ids in style_members.items()}
+        self._by_city = {key: ids_to_bitmap(ids) for key, ids in city_members.items()}
+        self._city_keys = sorted(self._by_city)
+        self._by_cell = {cell: ids_to_bitmap(ids) for cell, ids in cell_members.items()}
+        if self._records:
+            self._ensure_rows(max(self._records))
+            self._levels[rows, columns] = values
+        if located:
+            self._coords[[record.id for record in located]] = [record.location for record in located]
+
+    @staticmethod
+    def _make_record(
+        profile_id, user_id, city, created_at, levels: Mapping[int, int],
+        latitude: float | None = None, longitude: float | None = None,
+    ):
+        style_ids = tuple(sorted(levels))
+        location = None
+        if latitude is not None and longitude is not None:
+            location = (float(latitude), float(longitude))
+        return ProfileRecord(
+            profile_id, user_id, normalize_city(city), created_at,
+            style_ids, tuple(levels[style_id] for style_id in style_ids), location,
+        )
+
+    def clear(self) -> None:
+        """Очищает индекс и помечает его как непостроенный."""
+        self._records.clear()
+        self._profile_by_user.clear()
+        self._by_style_level.clear()
+        self._by_city.clear()
+        self._city_keys.clear()
+        self._city_names.clear()
+        self._order.clear()
+        self._by_cell.clear()
+        self._coords = np.full((0, 2), np.nan)
+        self._availability = np.zeros((0, AVAILABILITY_WORDS), dtype=np.uint64)
+        self._all = 0
+        self._levels = np.zeros((0, 0), dtype=np.int8)
+        self._style_columns.clear()
+        self._likes.clear()
+        self._loaded = False
+        self.generation += 1
+
+    def upsert(self, profile: Profile, levels: Mapping[int, int]) -> None:
+        """Добавляет или обновляет профиль после записи в БД; levels - уровни по style_id."""
+        if not self._loaded:
+            # Непостроенный индекс подхватит профиль при загрузке
+            return
+        self.remove(profile.id)
+        self._remember_city_name(profile.city)
+        self._add(self._make_record(
+            profile.id, profile.user_id, profile.city, profile.created_at, levels,
+            profile.latitude, profile.longitude,
+        ))
+
+    def set_availability(self, profile_id: int, mask: int) -> None:
+        """Обновляет расписание профиля после записи в БД."""
+        if not self._loaded:
+            return
+        self._ensure_rows(profile_id)
+        self._availability[profile_id] = mask_to_words(mask)
+
+    def add_like(self, from_profile_id: int, to_profile_id: int) -> None:
+        """Запоминает лайк после записи в БД."""
+        if not self._loaded:
+            return
+        self._likes.setdefault(from_profile_id, set()).add(to_profile_id)
+
+    def liked_ids(self, profile_id: int) -> AbstractSet[int]:
+        """Id профилей, которым профиль уже поставил лайк (только для чтения)."""
+        return self._likes.get(profile_id, frozenset())
+
+    def remove(self, profile_id: int) -> None:
+        """Удаляет профиль из всех списков индекса (расписание хранится отдельно)."""
+        record = self._records.pop(profile_id, None)
+        if record is None:
+            return
+        mask = ~(1 << profile_id)
+        self._profile_by_user.pop(record.user_id, None)
+        self._all &= mask
+        for key in zip(record.style_ids, record.skill_levels):
+            self._discard(self._by_style_level, key, mask)
+        if record.city_key is not None:
+            self._discard(self._by_city, record.city_key, mask)
+            if record.city_key not in self._by_city:
+                # В городе не осталось профилей - убираем его из подсказок
+                del self._city_keys[bisect.bisect_left(self._city_keys, record.city_key)]
+                self._city_names.pop(record.city_key, None)
+        if record.location is not None:
+            self._discard(self._by_cell, cell_of(*record.location), mask)
+        if profile_id < self._levels.shape[0]:
+            self._levels[profile_id] = 0
+            self._coords[profile_id] = np.nan
+
+    def _add(self, record: ProfileRecord) -> None:
+        bit = 1 << record.id
+        self._records[record.id] = record
+        self._profile_by_user[record.user_id] = record.id
+        self._all |= bit
+        order_key = (record.created_at, record.id)
+        position = bisect.bisect_left(self._order, order_key)
+        if position == len(self._order) or self._order[position] != order_key:
+            # created_at не меняется: при обновлении профиль уже на своем месте
+            self._order.insert(position, order_key)
+        for key in zip(record.style_ids, record.skill_levels):
+            self._by_style_level[key] = self._by_style_level.get(key, 0) | bit
+        if record.city_key is not None:
+            if record.city_key not in self._by_city:
+                bisect.insort(self._city_keys, record.city_key)
+            self._by_city[record.city_key] = self._by_city.get(record.city_key, 0) | bit
+        self._ensure_rows(record.id)
+        if record.location is not None:
+            cell = cell_of(*record.location)
+            self._by_cell[cell] = self._by_cell.get(cell, 0) | bit
+            self._coords[record.id] = record.location
+        if record.style_ids:
+            columns = [self._style_column(style_id) for style_id in record.style_ids]
+            self._levels[record.id, columns] = record.skill_levels
+
+    def _style_column(self, style_id: int) -> int:
+        column = self._style_columns.get(style_id)
+        if column is None:
+            column = self._style_columns[style_id] = len(self._style_columns)
+            if column >= self._levels.shape[1]:
+                self._resize(self._levels.shape[0], max(8, column * 2))
+        return column
+
+    def _ensure_rows(self, profile_id: int) -> None:
+        if profile_id >= self._levels.shape[0]:
+            # Удваиваем емкость, чтобы вставки были амортизированно O(1)
+            self._resize(max(1024, profile_id * 2), self._levels.shape[1])
+
+    def _resize(self, rows: int, columns: int) -> None:
+        levels = np.zeros((rows, columns), dtype=np.int8)
+        old_rows, old_columns = self._levels.shape
+        levels[:old_rows, :old_columns] = self._levels
+        self._levels = levels
+        if rows != self._coords.shape[0]:
+            coords = np.full((rows, 2), np.nan)
+            coords[:len(self._coords)] = self._coords
+            self._coords = coords
+            availability = np.zeros((rows, AVAILABILITY_WORDS), dtype=np.uint64)
+            availability[:len(self._availability)] = self._availability
+            self._availability = availability
+
+    @staticmethod
+    def _discard(postings: Dict, key, mask: int) -> None:
+        bitmap = postings.get(key, 0) & mask
+        if bitmap:
+            postings[key] = bitmap
+        else:
+            postings.pop(key, None)
+
+    def style_bitmap(
+        self, style_ids: Iterable[int] | None, min_level: int | None = None
+    ) -> int:
+        """Профили, владеющие хотя бы одним из стилей на уровне не ниже min_level.
+
+        Ключи (стиль, уровень) упорядочены так же, как составной индекс
+        в БД, поэтому фильтр по уровню - это объединение нескольких карт
+        из диапазона уровней, а не проверка каждого профиля.
+        style_ids=None означает любой стиль.
+        """
+        levels = range(min_level or SkillLevel.BEGINNER, MAX_SKILL_LEVEL + 1)
+        bitmap = 0
+        if style_ids is None:
+            for (_, level), level_bits in self._by_style_level.items():
+                if level in levels:
+                    bitmap |= level_bits
+            return bitmap
+        for style_id in style_ids:
+            for level in levels:
+                bitmap |= self._by_style_level.get((style_id, level), 0)
+        return bitmap
+
+    def _remember_city_name(self, city: str | None) -> None:
+        city_key = normalize_city(city)
+        if city_key is not None and city_key not in self._city_names:
+            # Для показа берется первое встретившееся написание
+            self._city_names[city_key] = display_city(city)
+
+    def _city_key_range(self, prefix: str) -> range:
+        """Позиции ключей городов, начинающихся с prefix (нормализованного)."""
+        start = bisect.bisect_left(self._city_keys, prefix)
+        end = bisect.bisect_left(self._city_keys, prefix + PREFIX_UPPER_BOUND, lo=start)
+        return range(start, end)
+
+    def city_bitmap(self, city: str) -> int:
+        """Профили, название города которых начинается с city (без учета регистра)."""
+        prefix = normalize_city(city)
+        if prefix is None:
+            return self._all
+        bitmap = 0
+        for position in self._city_key_range(prefix):
+            bitmap |= self._by_city[self._city_keys[position]]
+        return bitmap
+
+    def cities(self, prefix: str | None, limit: int) -> List[Tuple[str, int]]:
+        """Подсказки городов по префиксу: (название, число профилей), популярные первыми."""
+        prefix = normalize_city(prefix) or ""
+        matches = [
+            (self._by_city[key].bit_count(), key)
+            for key in (self._city_keys[position] for position in self._city_key_range(prefix))
+        ]
+        best = sorted(matches, key=lambda match: (-match[0], match[1]))[:limit]
+        return [(self._city_names.get(key, key), count) for count, key in best]
+
+    def geo_bitmap(self, latitude: float, longitude: float, radius_km: float) -> int:
+        """Профили из ячеек сетки, пересекающих круг (грубый отбор до haversine)."""
+        bitmap = 0
+        if cell_count_within(latitude, radius_km) <= len(self._by_cell):
+            for cell in cells_within(latitude, longitude, radius_km):
+                bitmap |= self._by_cell.get(cell, 0)
+        else:
+            # Занятых ячеек меньше, чем ячеек в круге - перебираем занятые
+            contains = cell_filter(latitude, longitude, radius_km)
+            for cell, cell_bits in self._by_cell.items():
+                if contains(cell):
+                    bitmap |= cell_bits
+        return bitmap
+
+    def distances(
+        self, profile_ids: np.ndarray, latitude: float, longitude: float
+    ) -> np.ndarray:
+        """Расстояния в км от точки до профилей (NaN - координаты не заданы)."""
+        coords = self._coords[profile_ids]
+        return haversine_km(latitude, longitude, coords[:, 0], coords[:, 1])
+
+    def search(
+        self,
+        city: str | None = None,
+        style_ids: Iterable[int] | None = None,
+        min_level: int | None = None,
+        exclude_user_id: int | None = None,
+        near: Tuple[float, float, float] | None = None,
+    ) -> List[int]:
+        """Возвращает id профилей, новые первыми (created_at, id по убыванию).
+
+        near=(широта, долгота, радиус в км) оставляет профили внутри круга
+        и упорядочивает их по расстоянию, ближние первыми.
+        """
+        bitmap = self.filter_bitmap(city, style_ids, min_level, exclude_user_id, near)
+        if near is not None:
+            latitude, longitude, radius_km = near
+            profile_ids = bitmap_to_array(bitmap)
+            distances = self.distances(profile_ids, latitude, longitude)
+            inside = distances <= radius_km
+            profile_ids, distances = profile_ids[inside], distances[inside]
+            return profile_ids[np.lexsort((-profile_ids, distances))].tolist()
+
+        records = self._records
+        return sorted(
+            bitmap_to_ids(bitmap),
+            key=lambda profile_id: (records[profile_id].created_at, profile_id),
+            reverse=True,
+        )
+
+    def filter_bitmap(
+        self,
+        city: str | None = None,
+        style_ids: Iterable[int] | None = None,
+        min_level: int | None = None,
+        exclude_user_id: int | None = None,
+        near: Tuple[float, float, float] | None = None,
+    ) -> int:
+        """Битовая карта профилей по критериям; near отбирает только по ячейкам сетки."""
+        bitmap = self._all
+        if style_ids or min_level:
+            bitmap &= self.style_bitmap(style_ids or None, min_level)
+        if city and bitmap:
+            bitmap &= self.city_bitmap(city)
+        if near is not None and bitmap:
+            bitmap &= self.geo_bitmap(*near)
+        own_profile_id = self._profile_by_user.get(exclude_user_id)
+        if own_profile_id is not None:
+            bitmap &= ~(1 << own_profile_id)
+        return bitmap
+
+    def newest_window(
+        self,
+        bitmap: int,
+        before: OrderKey | None,
+        count: int,
+        accept: Callable[[np.ndarray], np.ndarray] | None = None,
+    ) -> Tuple[List[int], OrderKey | None]:
+        """До count id из bitmap в порядке (created_at, id) по убыванию, строго до before.
+
+        Позиции просматриваются блоками от before; accept получает массив
+        id блока и возвращает булев массив подходящих. Возвращает найденные
+        id и ключ последней просмотренной позиции для продолжения (None -
+        порядок исчерпан). Стоимость зависит от числа просмотренных позиций.
+        """
+        contains = bitmap_membership(bitmap)
+        order = self._order
+        end = len(order) if before is None else bisect.bisect_left(order, before)
+        found: List[int] = []
+        while end > 0 and len(found) < count:
+            start = max(0, end - ORDER_SCAN_BLOCK)
+            positions = [
+                position for position in range(end - 1, start - 1, -1) if contains(order[position][1])
+            ]
+            if positions:
+                ids = np.fromiter(
+                    (order[position][1] for position in positions), dtype=np.int64, count=len(positions)
+                )
+                keep = accept(ids) if accept is not None else np.ones(len(ids), dtype=bool)
+                for position, profile_id, ok in zip(positions, ids.tolist(), keep.tolist()):
+                    if ok:
+                        found.append(profile_id)
+                        if len(found) == count:
+                            return found, order[position]
+            end = start
+        return found, None
+
+    def get(self, profile_id: int) -> ProfileRecord | None:
+        """Возвращает компактную запись профиля."""
+        return self._records.get(profile_id)
+
+    def candidate_array(
+        self,
+        style_ids: Iterable[int] | None = None,
+        exclude_user_id: int | None = None,
+    ) -> np.ndarray:
+        """Массив id профилей со стилями из списка (или всех), кроме своего."""
+        bitmap = self.style_bitmap(style_ids) if style_ids else self._all
+        own_profile_id = self._profile_by_user.get(exclude_user_id)
+        if own_profile_id is not None:
+            bitmap &= ~(1 << own_profile_id)
+        return bitmap_to_array(bitmap)
+
+    def city_mask(self, profile_ids: np.ndarray, city: str) -> np.ndarray:
+        """Булев массив: начинается ли city_key каждого профиля с нормализованного города city."""
+        return np.isin(profile_ids, bitmap_to_array(self.city_bitmap(city)), assume_unique=True)
+
+    def level_matrix(self, profile_ids: np.ndarray) -> np.ndarray:
+        """Уровни по всем столбцам стилей для заданных профилей (n x стили)."""
+        return self._levels[profile_ids]
+
+    def availability_mask(self, profile_id: int) -> int:
+        """Маска расписания профиля из индекса (0 - не задано)."""
+        if profile_id >= self._availability.shape[0]:
+            return 0
+        return int.from_bytes(self._availability[profile_id].astype("<u8").tobytes(), "little")
+
+    def availability_rows(self, profile_ids: np.ndarray) -> np.ndarray:
+        """Расписания профилей словами uint64 (n x AVAILABILITY_WORDS)."""
+        return self._availability[profile_ids]
+
+    def availability_overlap(self, profile_ids: np.ndarray, mask: int) -> np.ndarray:
+        """Число общих 30-минутных слотов каждого профиля с расписанием mask."""
+        return overlap_slots(self._availability[profile_ids], mask_to_words(mask))
+
+    def style_vector(self, levels: Mapping[int, int]) -> np.ndarray:
+        """Плотный вектор уровней по столбцам индекса для словаря style_id -> уровень."""
+        vector = np.zeros(self._levels.shape[1], dtype=np.int8)
+        for style_id, level in levels.items():
+            column = self._style_columns.get(style_id)
+            if column is not None:
+                vector[column] = level
+        return vector
+
+    def user_record(self, user_id: int) -> ProfileRecord | None:
+        """Возвращает запись профиля пользователя (None, если профиля нет)."""
+        return self._records.get(self._profile_by_user.get(user_id))
+
+
+# Единственный экземпляр индекса на процесс
+matching_index = MatchingIndex()
@@ -0,0 +1,62 @@
+"""Доставка уведомлений подключенным пользователям (WebSocket).
+
+У каждого подключения своя ограниченная очередь: медленный клиент не
+задерживает запись профиля, при переполнении теряются самые старые
+уведомления. Публикация для пользователя без подключений - O(1).
+"""
+
+import asyncio
+from typing import Any, Dict, Set
+
+# Сколько недоставленных уведомлений держать на одно подключение
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class NotificationHub:
+    """Подписки пользователей и раздача им уведомлений."""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Регистрирует подключение пользователя и возвращает его очередь."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        """Удаляет подключение пользователя."""
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def is_online(self, user_id: int) -> bool:
+        """Есть ли у пользователя хотя бы одно подключение."""
+        return user_id in self._subscribers
+
+    def publish(self, user_id: int, message: Dict[str, Any]) -> None:
+        """Кладет уведомление во все очереди пользователя, не дожидаясь доставки."""
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+            self.published += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики для метрик."""
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(queues) for queues in self._subscribers.values()),
+            "published_total": self.published,
+            "dropped_total": self.dropped,
+        }
+
+
+notification_hub = NotificationHub()
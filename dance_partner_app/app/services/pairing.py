@@ -0,0 +1,308 @@
+"""Подбор пар для мероприятий: оптимальное назначение партнеров один к одному.
+
+Участники делятся на ведущих и ведомых (профили без роли дополняют
+меньшую сторону), затем для всех пар сразу считается матрица
+совместимости: общие стили, близость уровней и пересечение недельных
+расписаний. Назначение с максимальной суммарной совместимостью ищет
+венгерский алгоритм (scipy linear_sum_assignment).
+
+На тысячах участников расчет занимает секунды, поэтому он выполняется
+в пуле процессов: эндпоинт сразу возвращает id задачи, а результат
+забирается опросом.
+"""
+
+import asyncio
+import datetime
+import logging
+import multiprocessing
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.models import DanceRole, Profile
+from app.schemas.pairing import PairingRequest
+from app.services.availability import AVAILABILITY_WORDS
+from app.services.matching_index import MAX_SKILL_LEVEL, matching_index
+from app.services.scoring import SKILL_CLOSENESS_WEIGHT, STYLE_OVERLAP_WEIGHT
+
+logger = logging.getLogger(__name__)
+
+# Участники уже отобраны по городу, поэтому вместо бонуса за город - общее время
+AVAILABILITY_WEIGHT = 0.2
+# Сколько ролей профилей читать одним запросом
+ROLE_CHUNK_SIZE = 500
+
+
+def pairing_scores(
+    leader_levels: np.ndarray,
+    follower_levels: np.ndarray,
+    leader_availability: np.ndarray,
+    follower_availability: np.ndarray,
+) -> np.ndarray:
+    """Матрица совместимости (ведущие x ведомые, 0..1); 0 - нет общих стилей.
+
+    Составляющие те же, что в compatibility_scores: коэффициент Жаккара по
+    стилям и близость уровней в общих стилях; третья - доля общего времени
+    от расписания менее свободного из двоих.
+    """
+    has_leader = leader_levels > 0
+    has_follower = follower_levels > 0
+    shared = has_leader.astype(np.int32) @ has_follower.T.astype(np.int32)
+    union = has_leader.sum(axis=1)[:, None] + has_follower.sum(axis=1)[None, :] - shared
+    overlap = np.divide(shared, union, out=np.zeros(shared.shape), where=union > 0)
+
+    # Разница уровней по общим стилям: цикл по столбцам, а не по парам
+    distance_sum = np.zeros(shared.shape, dtype=np.int32)
+    for column in np.flatnonzero(has_leader.any(axis=0) & has_follower.any(axis=0)):
+        leader_column = leader_levels[:, column].astype(np.int16)[:, None]
+        follower_column = follower_levels[:, column].astype(np.int16)[None, :]
+        both = (leader_column > 0) & (follower_column > 0)
+        distance_sum += np.where(both, np.abs(leader_column - follower_column), 0)
+    max_distance = shared * (MAX_SKILL_LEVEL - 1)
+    closeness = 1.0 - np.divide(
+        distance_sum, max_distance, out=np.ones(shared.shape), where=max_distance > 0
+    )
+
+    common_slots = np.zeros(shared.shape, dtype=np.int64)
+    for word in range(AVAILABILITY_WORDS):
+        common_slots += np.bitwise_count(
+            leader_availability[:, word, None] & follower_availability[None, :, word]
+        )
+    leader_slots = np.bitwise_count(leader_availability).sum(axis=1, dtype=np.int64)
+    follower_slots = np.bitwise_count(follower_availability).sum(axis=1, dtype=np.int64)
+    smaller = np.minimum(leader_slots[:, None], follower_slots[None, :])
+    availability = np.divide(
+        common_slots, smaller, out=np.zeros(shared.shape), where=smaller > 0
+    )
+
+    scores = (
+        STYLE_OVERLAP_WEIGHT * overlap
+        + SKILL_CLOSENESS_WEIGHT * closeness
+        + AVAILABILITY_WEIGHT * availability
+    )
+    # Без общего стиля пара не танцует: такие назначения отбрасываются
+    return np.where(shared > 0, scores, 0.0)
+
+
+def solve_pairing(
+    leader_levels: np.ndarray,
+    follower_levels: np.ndarray,
+    leader_availability: np.ndarray,
+    follower_availability: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Назначение с максимальной суммой совместимости (выполняется в процессе пула).
+
+    Возвращает индексы ведущих, индексы ведомых и оценки найденных пар.
+    """
+    scores = pairing_scores(
+        leader_levels, follower_levels, leader_availability, follower_availability
+    )
+    rows, columns = linear_sum_assignment(scores, maximize=True)
+    pair_scores = scores[rows, columns]
+    valid = pair_scores > 0
+    return rows[valid], columns[valid], pair_scores[valid]
+
+
+def split_roles(
+    profile_ids: Sequence[int], roles: Mapping[int, str | None]
+) -> Tuple[List[int], List[int]]:
+    """Делит участников на ведущих и ведомых; профили без роли выравнивают стороны."""
+    leaders = [profile_id for profile_id in profile_ids if roles.get(profile_id) == DanceRole.LEADER]
+    followers = [profile_id for profile_id in profile_ids if roles.get(profile_id) == DanceRole.FOLLOWER]
+    for profile_id in profile_ids:
+        if roles.get(profile_id) not in (DanceRole.LEADER, DanceRole.FOLLOWER):
+            (leaders if len(leaders) <= len(followers) else followers).append(profile_id)
+    return leaders, followers
+
+
+class PairingBusyError(RuntimeError):
+    """Очередь задач подбора пар заполнена."""
+
+
+class PairingJob:
+    """Задача подбора пар; поля совпадают со схемой PairingJobRead."""
+
+    __slots__ = (
+        "job_id", "status", "created_at", "finished_at", "participants",
+        "pairs", "unpaired_ids", "total_score", "error",
+    )
+
+    def __init__(self, participants: int):
+        self.job_id = uuid.uuid4().hex
+        self.status = "running"
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.finished_at: datetime.datetime | None = None
+        self.participants = participants
+        self.pairs: List[Dict[str, Any]] | None = None
+        self.unpaired_ids: List[int] | None = None
+        self.total_score: float | None = None
+        self.error: str | None = None
+
+
+class PairingJobRunner:
+    """Пул процессов для подбора пар и реестр задач для опроса результата.
+
+    Одновременно принимается не больше max_pending незавершенных задач,
+    остальные отклоняются с PairingBusyError. Из завершенных хранятся
+    retention последних.
+    """
+
+    def __init__(self, workers: int, max_pending: int, retention: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor: ProcessPoolExecutor | None = None
+        self._jobs: "OrderedDict[str, PairingJob]" = OrderedDict()
+        self._tasks: set = set()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: дочерние процессы не наследуют потоки и соединения event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(
+        self, participants: int, leaders: List[int], followers: List[int], *arrays: np.ndarray
+    ) -> PairingJob:
+        """Ставит расчет solve_pairing(*arrays) в пул и сразу возвращает задачу."""
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise PairingBusyError("Pairing capacity exhausted")
+        job = PairingJob(participants)
+        self._jobs[job.job_id] = job
+        self._pending += 1
+        task = asyncio.get_running_loop().create_task(self._run(job, leaders, followers, arrays))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._prune()
+        return job
+
+    async def _run(
+        self, job: PairingJob, leaders: List[int], followers: List[int], arrays: Tuple
+    ) -> None:
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            rows, columns, scores = await loop.run_in_executor(
+                self._get_executor(), solve_pairing, *arrays
+            )
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._executor = None # Следующая задача поднимет новый пул
+            logger.exception("Pairing job %s failed", job.job_id)
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+            self._failed += 1
+        else:
+            pairs = [
+                {"leader_id": leaders[row], "follower_id": followers[column], "score": round(score, 4)}
+                for row, column, score in zip(rows.tolist(), columns.tolist(), scores.tolist())
+            ]
+            pairs.sort(key=lambda pair: pair["score"], reverse=True)
+            paired = {pair["leader_id"] for pair in pairs} | {pair["follower_id"] for pair in pairs}
+            job.pairs = pairs
+            job.unpaired_ids = [
+                profile_id for profile_id in leaders + followers if profile_id not in paired
+            ]
+            job.total_score = round(float(scores.sum()), 4)
+            job.status = "done"
+            self._completed += 1
+        finally:
+            job.finished_at = datetime.datetime.now(datetime.timezone.utc)
+            self._pending -= 1
+            self._busy_seconds += time.perf_counter() - started
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> PairingJob | None:
+        """Возвращает задачу по id (None - неизвестна или уже вытеснена)."""
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, float]:
+        """Снимок состояния пула для метрик."""
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed_total": self._completed,
+            "failed_total": self._failed,
+            "rejected_total": self._rejected,
+            "busy_seconds_total": round(self._busy_seconds, 6),
+        }
+
+    def shutdown(self) -> None:
+        """Останавливает процессы пула (при завершении приложения)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pairing_jobs = PairingJobRunner(
+    workers=settings.PAIRING_WORKERS,
+    max_pending=settings.PAIRING_MAX_PENDING_JOBS,
+    retention=settings.PAIRING_JOB_RETENTION,
+)
+
+
+async def _load_roles(db: AsyncSession, profile_ids: Sequence[int]) -> Dict[int, str | None]:
+    roles: Dict[int, str | None] = {}
+    for start in range(0, len(profile_ids), ROLE_CHUNK_SIZE):
+        chunk = profile_ids[start:start + ROLE_CHUNK_SIZE]
+        result = await db.execute(
+            select(Profile.id, Profile.dance_role).filter(Profile.id.in_(chunk))
+        )
+        roles.update(result.all())
+    return roles
+
+
+async def start_pairing(db: AsyncSession, request: PairingRequest) -> PairingJob:
+    """Отбирает участников, делит их по ролям и ставит подбор пар в пул процессов."""
+    await matching_index.ensure_loaded(db)
+    if request.profile_ids is not None:
+        profile_ids = [
+            profile_id for profile_id in dict.fromkeys(request.profile_ids)
+            if matching_index.get(profile_id) is not None
+        ]
+    else:
+        profile_ids = matching_index.search(
+            city=request.city,
+            style_ids=request.dance_style_ids,
+            min_level=request.min_skill_level,
+        )
+    if len(profile_ids) > settings.PAIRING_MAX_PARTICIPANTS:
+        raise ValueError(
+            f"Too many participants: {len(profile_ids)} (max {settings.PAIRING_MAX_PARTICIPANTS})"
+        )
+
+    leaders, followers = split_roles(profile_ids, await _load_roles(db, profile_ids))
+    if not leaders or not followers:
+        raise ValueError("Pairing needs at least one leader and one follower")
+
+    leader_ids = np.array(leaders, dtype=np.int64)
+    follower_ids = np.array(followers, dtype=np.int64)
+    return pairing_jobs.submit(
+        len(profile_ids), leaders, followers,
+        matching_index.level_matrix(leader_ids),
+        matching_index.level_matrix(follower_ids),
+        matching_index.availability_rows(leader_ids),
+        matching_index.availability_rows(follower_ids),
+    )
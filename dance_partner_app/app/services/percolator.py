@@ -0,0 +1,223 @@
+"""Обратный индекс сохраненных поисков (перколятор) для уведомлений о совпадениях.
+
+Обычный поиск идет от критериев к профилям; здесь наоборот - новая запись
+профиля сопоставляется с сохраненными поисками. Поиски разложены по
+спискам: style_id -> поиски со стилем, префикс города -> поиски с
+городом без стилей, и отдельно - поиски без обоих критериев. Запись
+профиля проверяется только по кандидатам из списков его стилей и
+префиксов его города, поэтому стоимость раздачи зависит от числа
+подходящих поисков, а не от числа всех подписчиков.
+"""
+
+import asyncio
+from typing import Any, Dict, FrozenSet, List, Set
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import Profile, SavedSearch
+from app.schemas.matching import PartnerSearchCriteria
+from app.services.availability import min_overlap_slots
+from app.services.geo import haversine_km
+from app.services.matching_index import ProfileRecord, matching_index
+from app.services.notifications import notification_hub
+from app.services.text_search import matches_text
+from app.utils.normalization import normalize_city
+from app.utils.serialization import profile_to_dict
+
+
+class RegisteredSearch:
+    """Сохраненный поиск в перколяторе с заранее нормализованными критериями."""
+
+    __slots__ = ("id", "user_id", "name", "criteria", "city", "style_ids", "min_level")
+
+    def __init__(self, search_id: int, user_id: int, name: str, criteria: PartnerSearchCriteria):
+        self.id = search_id
+        self.user_id = user_id
+        self.name = name
+        self.criteria = criteria
+        self.city = normalize_city(criteria.city)
+        self.style_ids: FrozenSet[int] = frozenset(criteria.dance_style_ids or ())
+        self.min_level = int(criteria.min_skill_level or 0)
+
+
+class SearchPercolator:
+    """Сохраненные поиски, разложенные по спискам стилей и префиксов городов."""
+
+    def __init__(self):
+        self._searches: Dict[int, RegisteredSearch] = {}
+        self._by_style: Dict[int, Set[int]] = {}
+        self._by_city: Dict[str, Set[int]] = {}
+        # Поиски без стилей и города подходят под любую запись
+        self._unindexed: Set[int] = set()
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self.percolations = 0
+        self.candidates_checked = 0
+        self.matches = 0
+
+    def __len__(self) -> int:
+        return len(self._searches)
+
+    @property
+    def loaded(self) -> bool:
+        """Признак того, что поиски загружены из БД."""
+        return self._loaded
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """Загружает сохраненные поиски, если это еще не сделано."""
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                result = await db.execute(
+                    select(SavedSearch.id, SavedSearch.user_id, SavedSearch.name, SavedSearch.criteria)
+                )
+                self.clear()
+                for search_id, user_id, name, criteria in result:
+                    self._add(RegisteredSearch(
+                        search_id, user_id, name, PartnerSearchCriteria.model_validate_json(criteria)
+                    ))
+                self._loaded = True
+
+    def clear(self) -> None:
+        """Очищает перколятор и помечает его как незагруженный."""
+        self._searches.clear()
+        self._by_style.clear()
+        self._by_city.clear()
+        self._unindexed.clear()
+        self._loaded = False
+
+    def register(self, saved: SavedSearch) -> None:
+        """Добавляет или заменяет поиск после записи в БД."""
+        if not self._loaded:
+            # Незагруженный перколятор подхватит поиск при загрузке
+            return
+        self.unregister(saved.id)
+        self._add(RegisteredSearch(
+            saved.id, saved.user_id, saved.name,
+            PartnerSearchCriteria.model_validate_json(saved.criteria),
+        ))
+
+    def unregister(self, search_id: int) -> None:
+        """Удаляет поиск из всех списков."""
+        search = self._searches.pop(search_id, None)
+        if search is None:
+            return
+        for postings, key in self._postings(search):
+            postings[key].discard(search_id)
+            if not postings[key]:
+                del postings[key]
+        self._unindexed.discard(search_id)
+
+    def _postings(self, search: RegisteredSearch) -> List[tuple]:
+        # Каждый поиск лежит в списках одного, самого избирательного измерения:
+        # подходящий профиль обязан совпасть с ним, значит попадет в кандидаты
+        if search.style_ids:
+            return [(self._by_style, style_id) for style_id in search.style_ids]
+        if search.city:
+            return [(self._by_city, search.city)]
+        return []
+
+    def _add(self, search: RegisteredSearch) -> None:
+        self._searches[search.id] = search
+        postings = self._postings(search)
+        for index, key in postings:
+            index.setdefault(key, set()).add(search.id)
+        if not postings:
+            self._unindexed.add(search.id)
+
+    def candidates(self, record: ProfileRecord) -> Set[int]:
+        """Поиски, которые могут совпасть с профилем: по его стилям и префиксам города."""
+        candidates = set(self._unindexed)
+        for style_id in record.style_ids:
+            candidates.update(self._by_style.get(style_id, ()))
+        city_key = record.city_key or ""
+        for end in range(1, len(city_key) + 1):
+            candidates.update(self._by_city.get(city_key[:end], ()))
+        return candidates
+
+    def percolate(self, profile: Profile, record: ProfileRecord) -> List[RegisteredSearch]:
+        """Поиски подключенных пользователей, под которые подходит записанный профиль."""
+        self.percolations += 1
+        matched = []
+        for search_id in self.candidates(record):
+            search = self._searches[search_id]
+            # Уведомление некому доставить - полную проверку не делаем
+            if search.user_id == record.user_id or not notification_hub.is_online(search.user_id):
+                continue
+            self.candidates_checked += 1
+            if _matches(search, record, profile):
+                matched.append(search)
+        self.matches += len(matched)
+        return matched
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики перколятора для метрик."""
+        return {
+            "searches": len(self._searches),
+            "style_keys": len(self._by_style),
+            "city_keys": len(self._by_city),
+            "unindexed": len(self._unindexed),
+            "percolations_total": self.percolations,
+            "candidates_checked_total": self.candidates_checked,
+            "matches_total": self.matches,
+        }
+
+
+def _matches(search: RegisteredSearch, record: ProfileRecord, profile: Profile) -> bool:
+    """Полная проверка критериев поиска для одного профиля (как в find_dance_partner_ids)."""
+    criteria = search.criteria
+    if search.city and not (record.city_key or "").startswith(search.city):
+        return False
+    if search.style_ids or search.min_level:
+        levels = dict(zip(record.style_ids, record.skill_levels))
+        wanted = search.style_ids or levels.keys()
+        if not any(levels.get(style_id, 0) >= max(search.min_level, 1) for style_id in wanted):
+            return False
+    if criteria.text and not matches_text(criteria.text, profile.first_name, profile.last_name, profile.bio):
+        return False
+
+    searcher = matching_index.user_record(search.user_id)
+    if not criteria.include_liked and searcher is not None:
+        if record.id in matching_index.liked_ids(searcher.id):
+            return False
+    if criteria.radius_km is not None:
+        if searcher is None or searcher.location is None or record.location is None:
+            return False
+        distance = haversine_km(
+            *searcher.location, np.array([record.location[0]]), np.array([record.location[1]])
+        )
+        if distance[0] > criteria.radius_km:
+            return False
+    if criteria.min_overlap_hours is not None:
+        mask = matching_index.availability_mask(searcher.id) if searcher is not None else 0
+        if not mask:
+            return False
+        slots = matching_index.availability_overlap(np.array([record.id]), mask)[0]
+        if slots < min_overlap_slots(criteria.min_overlap_hours):
+            return False
+    return True
+
+
+def notify_matches(profile: Profile) -> int:
+    """Сопоставляет записанный профиль с сохраненными поисками и уведомляет владельцев."""
+    record = matching_index.get(profile.id)
+    if not percolator.loaded or record is None:
+        return 0
+    matched = percolator.percolate(profile, record)
+    if matched:
+        payload: Dict[str, Any] = profile_to_dict(profile)
+        for search in matched:
+            notification_hub.publish(search.user_id, {
+                "type": "match",
+                "search_id": search.id,
+                "search_name": search.name,
+                "profile": payload,
+            })
+    return len(matched)
+
+
+# Единственный экземпляр перколятора на процесс
+percolator = SearchPercolator()
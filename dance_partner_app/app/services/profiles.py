@@ -1,11 +1,31 @@
 """Сервисный слой для работы с профилями пользователей."""
 
+import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Sequence, Set, Tuple
+
+from sqlalchemy import delete, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from app.db.models import Profile, User, DanceStyle
+from app.db.models import (
+    Profile, ProfileAvailability, DanceStyle, SkillLevel, profile_dance_style_association
+)
+from app.db.write_queue import run_write
+from app.schemas.availability import AvailabilityInterval
 from app.schemas.profile import ProfileCreate, ProfileUpdate
+from app.services.availability import bytes_to_mask, intervals_to_mask, mask_to_bytes
+from app.services.match_cache import match_cache
+from app.services.matching_index import load_style_levels, matching_index
+from app.services.percolator import notify_matches
+from app.services.style_catalog import style_catalog
+from app.services.users import Principal
+from app.utils.serialization import (
+    PROFILE_COLUMNS, STYLE_COLUMNS, STYLE_ID_POSITION, profile_rows_to_dicts, style_row_to_dict
+)
+
+# Сколько профилей читать одним запросом при построении словарей
+PROFILE_DICT_CHUNK_SIZE = 500
 
 async def get_profile_by_user_id(db: AsyncSession, user_id: int) -> Profile | None:
     """Получает профиль пользователя по его ID."""
@@ -26,52 +46,192 @@ async def get_profile_by_id(db: AsyncSession, profile_id: int) -> Profile | None
     return result.scalars().first()
 
 
-async def create_profile(db: AsyncSession, profile_in: ProfileCreate, user: User) -> Profile:
+async def iter_profile_dict_chunks(
+    db: AsyncSession,
+    profile_ids: Sequence[int],
+    first_chunk_size: int = PROFILE_DICT_CHUNK_SIZE,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Словари ProfileRead пачками в порядке id: каждая пачка отдается сразу после чтения.
+
+    Вместо ORM-объектов и валидации Pydantic - два запроса колонок на пачку:
+    профили и их стили. Словарь каждого стиля строится один раз. Меньшая
+    первая пачка сокращает время до первого результата при потоковой отдаче.
+    """
+    assoc = profile_dance_style_association
+    style_dicts: Dict[int, Dict[str, Any]] = {}
+    start, size = 0, first_chunk_size
+    while start < len(profile_ids):
+        chunk = profile_ids[start:start + size]
+        start, size = start + size, PROFILE_DICT_CHUNK_SIZE
+        link_rows = await db.execute(
+            select(assoc.c.profile_id, *STYLE_COLUMNS)
+            .join(DanceStyle, DanceStyle.id == assoc.c.dance_style_id)
+            .filter(assoc.c.profile_id.in_(chunk))
+        )
+        styles_by_profile: Dict[int, List[Dict[str, Any]]] = {}
+        for profile_id, *style_row in link_rows:
+            style_id = style_row[STYLE_ID_POSITION]
+            style = style_dicts.get(style_id)
+            if style is None:
+                style = style_dicts[style_id] = style_row_to_dict(style_row)
+            styles_by_profile.setdefault(profile_id, []).append(style)
+
+        profile_rows = await db.execute(select(*PROFILE_COLUMNS).filter(Profile.id.in_(chunk)))
+        by_id = {
+            profile["id"]: profile
+            for profile in profile_rows_to_dicts(profile_rows, styles_by_profile)
+        }
+        # Профиль мог быть удален после построения индекса - просто пропускаем его
+        yield [by_id[profile_id] for profile_id in chunk if profile_id in by_id]
+
+async def get_profile_dicts(db: AsyncSession, profile_ids: Sequence[int]) -> List[Dict[str, Any]]:
+    """Читает профили как словари ProfileRead из плоских строк, сохраняя порядок id."""
+    return [
+        profile
+        async for chunk in iter_profile_dict_chunks(db, profile_ids)
+        for profile in chunk
+    ]
+
+async def create_profile(db: AsyncSession, profile_in: ProfileCreate, user: Principal) -> Profile:
     """Создает новый профиль для указанного пользователя."""
-    existing_profile = await get_profile_by_user_id(db, user_id=user.id)
-    if existing_profile:
-        raise ValueError("User already has a profile")
+    async def _insert(session: AsyncSession) -> Profile:
+        # Проверка внутри операции записи: между проверкой и вставкой никто не вклинится
+        existing_profile = await get_profile_by_user_id(session, user_id=user.id)
+        if existing_profile:
+            raise ValueError("User already has a profile")
 
-    db_profile = Profile(
-        **profile_in.model_dump(exclude_unset=True),
-        user_id=user.id
-    )
-    db.add(db_profile)
-    await db.commit()
-    await db.refresh(db_profile)
+        db_profile = Profile(
+            **profile_in.model_dump(exclude_unset=True),
+            user_id=user.id,
+            dance_styles=[],
+        )
+        session.add(db_profile)
+        await session.flush() # id и значения по умолчанию заполняются без refresh
+        return db_profile
+
+    db_profile = await run_write(db, _insert)
+    _publish_profile(db_profile, {})
     return db_profile
 
+def _publish_profile(profile: Profile, levels: Dict[int, int]) -> None:
+    """Обновляет in-memory индекс, версии кэша поиска и уведомляет о совпадениях после записи."""
+    # Затронуты города и стили профиля и до изменения, и после
+    cities = {profile.city_key}
+    style_ids = set(levels)
+    previous = matching_index.get(profile.id)
+    if previous is not None:
+        cities.add(previous.city_key)
+        style_ids.update(previous.style_ids)
+    matching_index.upsert(profile, levels)
+    match_cache.record_write(cities, style_ids)
+    # Уведомления владельцам сохраненных поисков, под которые подошел профиль
+    notify_matches(profile)
+
+async def _replace_style_levels(
+    db: AsyncSession, profile: Profile, levels: Dict[int, SkillLevel]
+) -> None:
+    """Заменяет стили профиля строками ассоциативной таблицы с уровнями (id уже проверены)."""
+    assoc = profile_dance_style_association
+    await db.execute(delete(assoc).where(assoc.c.profile_id == profile.id))
+    if levels:
+        await db.execute(insert(assoc), [
+            {"profile_id": profile.id, "dance_style_id": style_id, "skill_level": int(level)}
+            for style_id, level in levels.items()
+        ])
+
+async def _replace_style_ids(db: AsyncSession, profile: Profile, style_ids: Set[int]) -> None:
+    """Оставляет профилю только стили style_ids (id уже проверены).
+
+    Уровни оставшихся стилей сохраняются, новые получают Beginner.
+    """
+    assoc = profile_dance_style_association
+    await db.execute(
+        delete(assoc).where(assoc.c.profile_id == profile.id, assoc.c.dance_style_id.not_in(style_ids))
+    )
+    if style_ids:
+        await db.execute(insert(assoc).prefix_with("OR IGNORE"), [
+            {"profile_id": profile.id, "dance_style_id": style_id, "skill_level": int(SkillLevel.BEGINNER)}
+            for style_id in sorted(style_ids)
+        ])
+
 async def update_profile(db: AsyncSession, profile: Profile, profile_in: ProfileUpdate) -> Profile:
     """Обновляет существующий профиль, включая танцевальные стили."""
     update_data = profile_in.model_dump(exclude_unset=True)
 
-    # Извлекаем dance_style_ids, если они есть
+    # Извлекаем dance_style_ids и стили с уровнями, если они есть
     dance_style_ids = update_data.pop('dance_style_ids', None)
+    dance_style_levels = update_data.pop('dance_styles', None)
+    if dance_style_levels is not None:
+        dance_style_ids = [item['dance_style_id'] for item in dance_style_levels]
+    # ID стилей проверяются по справочнику в памяти; неизвестные ID пропускаем
+    known_ids = (
+        await style_catalog.resolve_ids(db, dance_style_ids) if dance_style_ids is not None else set()
+    )
+
+    async def _update(session: AsyncSession) -> Tuple[Profile, Dict[int, int]]:
+        # Профиль перечитывается в сессии операции записи
+        db_profile = await get_profile_by_id(session, profile_id=profile.id)
+        if db_profile is None:
+            raise ValueError("Profile not found")
+
+        # Обновляем остальные поля профиля
+        for key, value in update_data.items():
+            setattr(db_profile, key, value)
+
+        # Обновляем стили: с уровнями, если они переданы, иначе просто по IDs
+        if dance_style_levels is not None:
+            await _replace_style_levels(session, db_profile, {
+                item['dance_style_id']: item['skill_level']
+                for item in dance_style_levels if item['dance_style_id'] in known_ids
+            })
+        elif dance_style_ids is not None:
+            await _replace_style_ids(session, db_profile, known_ids)
+
+        # Стили меняют только ассоциативную таблицу, поэтому отметка ставится явно
+        db_profile.updated_at = datetime.datetime.utcnow()
+        await session.flush()
+        # Явно загружаем стили после обновления, чтобы они были в возвращаемом объекте
+        await session.refresh(db_profile, attribute_names=['dance_styles'])
+        levels = await load_style_levels(session, db_profile.id)
+        return db_profile, levels
 
-    # Обновляем остальные поля профиля
-    for key, value in update_data.items():
-        setattr(profile, key, value)
+    updated_profile, levels = await run_write(db, _update)
+    _publish_profile(updated_profile, levels)
+    return updated_profile
 
-    # Обновляем стили, если IDs были переданы
-    if dance_style_ids is not None:
-        if dance_style_ids: # Если список не пустой
-            # Загружаем объекты DanceStyle по ID
-            result = await db.execute(
-                select(DanceStyle).filter(DanceStyle.id.in_(dance_style_ids))
+async def get_availability_mask(db: AsyncSession, profile_id: int) -> int:
+    """Читает маску недельного расписания профиля (0 - расписание не задано)."""
+    result = await db.execute(
+        select(ProfileAvailability.slots).filter(ProfileAvailability.profile_id == profile_id)
+    )
+    return bytes_to_mask(result.scalar())
+
+
+async def set_availability(
+    db: AsyncSession, profile: Profile, intervals: Iterable[AvailabilityInterval]
+) -> int:
+    """Заменяет недельное расписание профиля и возвращает новую маску."""
+    mask = intervals_to_mask(intervals)
+
+    async def _replace(session: AsyncSession) -> None:
+        await session.execute(
+            delete(ProfileAvailability).where(ProfileAvailability.profile_id == profile.id)
+        )
+        # Расписание влияет на поиск по min_overlap_hours - профиль считается измененным
+        await session.execute(
+            update(Profile).where(Profile.id == profile.id).values(updated_at=datetime.datetime.utcnow())
+        )
+        if mask:
+            await session.execute(
+                insert(ProfileAvailability).values(profile_id=profile.id, slots=mask_to_bytes(mask))
             )
-            styles = result.scalars().all()
-            # Проверяем, все ли ID найдены (опционально, но хорошо для надежности)
-            if len(styles) != len(dance_style_ids):
-                # Можно выбросить ошибку или просто использовать найденные
-                pass # Пока просто используем найденные
-            profile.dance_styles = styles # SQLAlchemy обработает связи
-        else: # Если передан пустой список
-            profile.dance_styles = [] # Удаляем все стили
-
-    db.add(profile)
-    await db.commit()
-    await db.refresh(profile)
-    # Явно загружаем стили после обновления, чтобы они были в возвращаемом объекте
-    await db.refresh(profile, attribute_names=['dance_styles'])
-    return profile
- 
\ No newline at end of file
+
+    await run_write(db, _replace)
+    matching_index.set_availability(profile.id, mask)
+    # Город и стили не меняются, но поиски по min_overlap_hours должны увидеть
+    # изменение так же, как любую другую запись профиля
+    record = matching_index.get(profile.id)
+    if record is not None:
+        match_cache.record_write({record.city_key}, record.style_ids)
+    notify_matches(profile)
+    return mask
@@ -0,0 +1,149 @@
+"""Сервисный слой для сохраненных поисков с инкрементальной проверкой.
+
+Поиск хранит водяной знак - позицию (updated_at, id) последнего
+просмотренного изменения профилей. Проверка выбирает только профили
+после водяного знака диапазоном по индексу updated_at и применяет к ним
+те же фильтры, что и постраничный поиск, поэтому ее стоимость зависит от
+числа изменений с прошлой проверки, а не от размера базы. Фильтры, которые
+знает только in-memory индекс, проверяются для каждой выбранной пачки.
+"""
+
+import datetime
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import Profile, SavedSearch
+from app.db.write_queue import run_write
+from app.schemas.matching import PartnerSearchCriteria
+from app.schemas.saved_search import SavedSearchCreate
+from app.services import matching as matching_service
+from app.services import profiles as profiles_service
+from app.services.percolator import percolator
+from app.services.users import Principal
+
+# Сколько сохраненных поисков может быть у одного пользователя
+MAX_SAVED_SEARCHES_PER_USER = 20
+
+async def _latest_change(db: AsyncSession) -> Tuple[datetime.datetime | None, int]:
+    """Позиция (updated_at, id) самого свежего изменения профилей - один шаг по индексу."""
+    row = (await db.execute(
+        select(Profile.updated_at, Profile.id)
+        .order_by(Profile.updated_at.desc(), Profile.id.desc())
+        .limit(1)
+    )).first()
+    return (row.updated_at, row.id) if row else (None, 0)
+
+async def create_saved_search(
+    db: AsyncSession, search_in: SavedSearchCreate, user: Principal
+) -> SavedSearch:
+    """Сохраняет поиск; первая проверка вернет профили, измененные после сохранения."""
+    async def _insert(session: AsyncSession) -> SavedSearch:
+        count = await session.scalar(
+            select(func.count()).select_from(SavedSearch).filter(SavedSearch.user_id == user.id)
+        )
+        if count >= MAX_SAVED_SEARCHES_PER_USER:
+            raise ValueError(f"At most {MAX_SAVED_SEARCHES_PER_USER} saved searches are allowed")
+        watermark_updated_at, watermark_profile_id = await _latest_change(session)
+        saved = SavedSearch(
+            user_id=user.id,
+            name=search_in.name,
+            criteria=search_in.criteria.model_dump_json(exclude_defaults=True),
+            watermark_updated_at=watermark_updated_at,
+            watermark_profile_id=watermark_profile_id,
+        )
+        session.add(saved)
+        await session.flush()
+        return saved
+
+    saved = await run_write(db, _insert)
+    percolator.register(saved)
+    return saved
+
+async def get_saved_searches(db: AsyncSession, user: Principal) -> List[SavedSearch]:
+    """Получает сохраненные поиски пользователя в порядке создания."""
+    result = await db.execute(
+        select(SavedSearch).filter(SavedSearch.user_id == user.id).order_by(SavedSearch.id)
+    )
+    return list(result.scalars().all())
+
+async def get_saved_search(db: AsyncSession, search_id: int, user: Principal) -> SavedSearch | None:
+    """Получает сохраненный поиск пользователя по ID."""
+    result = await db.execute(
+        select(SavedSearch).filter(SavedSearch.id == search_id, SavedSearch.user_id == user.id)
+    )
+    return result.scalars().first()
+
+async def delete_saved_search(db: AsyncSession, search_id: int, user: Principal) -> bool:
+    """Удаляет сохраненный поиск; False - поиска нет."""
+    async def _delete(session: AsyncSession) -> bool:
+        result = await session.execute(
+            delete(SavedSearch).where(SavedSearch.id == search_id, SavedSearch.user_id == user.id)
+        )
+        return result.rowcount > 0
+
+    deleted = await run_write(db, _delete)
+    if deleted:
+        percolator.unregister(search_id)
+    return deleted
+
+async def check_saved_search(
+    db: AsyncSession, read_db: AsyncSession, saved: SavedSearch, user: Principal, limit: int
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Находит подходящие профили, измененные после водяного знака, и сдвигает его.
+
+    Возвращает словари ProfileRead в порядке изменения и признак того, что
+    изменений больше limit.
+    """
+    # Верхняя граница фиксируется до выборки: изменения после нее попадут в следующую проверку
+    upper_updated_at, upper_profile_id = await _latest_change(read_db)
+    if upper_updated_at is None:
+        return [], False
+
+    criteria = PartnerSearchCriteria.model_validate_json(saved.criteria)
+    query = await matching_service.build_partner_query(read_db, criteria, user)
+    query = query.with_only_columns(Profile.id, Profile.updated_at).filter(
+        tuple_(Profile.updated_at, Profile.id) <= tuple_(upper_updated_at, upper_profile_id)
+    ).order_by(Profile.updated_at, Profile.id).limit(limit + 1)
+    accept = await matching_service.index_only_filter(read_db, criteria, user)
+
+    position = (saved.watermark_updated_at, saved.watermark_profile_id)
+    rows = []
+    while len(rows) <= limit:
+        batch = query
+        if position[0] is not None:
+            batch = batch.filter(
+                # Отдельное условие на ведущий столбец дает диапазонный поиск по индексу
+                Profile.updated_at >= position[0],
+                tuple_(Profile.updated_at, Profile.id) > tuple_(*position),
+            )
+        batch_rows = (await read_db.execute(batch)).all()
+        if not batch_rows:
+            break
+        position = (batch_rows[-1].updated_at, batch_rows[-1].id)
+        if accept is not None:
+            keep = accept(np.array([row.id for row in batch_rows], dtype=np.int64))
+            rows.extend(row for row, ok in zip(batch_rows, keep.tolist()) if ok)
+        else:
+            rows.extend(batch_rows)
+        if len(batch_rows) <= limit:
+            break
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    # Все подходящие изменения до верхней границы просмотрены - знак встает на нее
+    watermark = (rows[-1].updated_at, rows[-1].id) if has_more else (upper_updated_at, upper_profile_id)
+
+    async def _advance(session: AsyncSession) -> None:
+        db_saved = await session.get(SavedSearch, saved.id)
+        if db_saved is None:
+            return
+        db_saved.watermark_updated_at, db_saved.watermark_profile_id = watermark
+        db_saved.last_checked_at = datetime.datetime.utcnow()
+
+    await run_write(db, _advance)
+    profiles = await profiles_service.get_profile_dicts(read_db, [row.id for row in rows])
+    return profiles, has_more
@@ -0,0 +1,69 @@
+"""Векторный расчет совместимости танцоров и выбор лучших кандидатов.
+
+Все функции работают с массивами NumPy сразу по всему набору кандидатов:
+матрица уровней имеет форму (кандидаты x стили), 0 означает отсутствие стиля.
+"""
+
+import numpy as np
+
+from app.services.matching_index import MAX_SKILL_LEVEL
+
+# Веса составляющих итоговой оценки (в сумме 1.0)
+STYLE_OVERLAP_WEIGHT = 0.5
+SKILL_CLOSENESS_WEIGHT = 0.3
+CITY_MATCH_WEIGHT = 0.2
+
+
+def compatibility_scores(
+    candidate_levels: np.ndarray,
+    reference_levels: np.ndarray,
+    city_match: np.ndarray | None = None,
+) -> np.ndarray:
+    """Считает оценку совместимости (0..1) для каждого кандидата.
+
+    Оценка складывается из коэффициента Жаккара по стилям, близости уровней
+    в общих стилях и бонуса за совпадение города.
+    """
+    has_style = candidate_levels > 0
+    wanted = reference_levels > 0
+    shared = has_style & wanted
+
+    shared_count = shared.sum(axis=1)
+    union_count = int(wanted.sum()) + has_style.sum(axis=1) - shared_count
+    overlap = np.divide(
+        shared_count, union_count,
+        out=np.zeros(len(candidate_levels)), where=union_count > 0,
+    )
+
+    # Разница уровней учитывается только по общим стилям
+    distance = np.abs(candidate_levels.astype(np.int16) - reference_levels.astype(np.int16))
+    distance_sum = np.where(shared, distance, 0).sum(axis=1)
+    max_distance = shared_count * (MAX_SKILL_LEVEL - 1)
+    # Без общих стилей близость равна нулю
+    closeness = 1.0 - np.divide(
+        distance_sum, max_distance,
+        out=np.ones(len(candidate_levels)), where=max_distance > 0,
+    )
+
+    scores = STYLE_OVERLAP_WEIGHT * overlap + SKILL_CLOSENESS_WEIGHT * closeness
+    if city_match is not None:
+        scores = scores + CITY_MATCH_WEIGHT * city_match
+    return scores
+
+
+def top_k(scores: np.ndarray, tie_breaker: np.ndarray, k: int) -> np.ndarray:
+    """Возвращает индексы k лучших оценок по убыванию без полной сортировки.
+
+    При равных оценках выше оказывается больший tie_breaker (например, id).
+    """
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        # partition - O(n), сортируем только оценки не ниже k-й; все равные ей
+        # попадают в отбор, чтобы на границе решал tie_breaker, а не partition
+        kth_score = -np.partition(-scores, k - 1)[k - 1]
+        selected = np.flatnonzero(scores >= kth_score)
+    else:
+        selected = np.arange(len(scores))
+    order = np.lexsort((-tie_breaker[selected], -scores[selected]))
+    return selected[order[:k]]
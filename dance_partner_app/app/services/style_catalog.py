@@ -0,0 +1,131 @@
+"""Справочник танцевальных стилей в памяти процесса.
+
+Стилей десятки, меняются они редко (только создаются), а читаются на
+каждом запросе /styles/ и при каждом изменении стилей профиля. Справочник
+загружается из БД один раз при старте и дальше обновляется сервисом
+создания стиля, поэтому чтения и проверка dance_style_ids идут без SQL.
+
+Справочник у каждого процесса свой: стиль, созданный другим процессом,
+он узнает при промахе - resolve_ids и catch_up проверяют, нет ли в БД
+стилей с id больше последнего известного (id стилей только растут), и
+тогда перечитывают справочник.
+
+Каждое изменение увеличивает version и пересчитывает etag - хеш
+содержимого. Хеш, а не номер версии, нужен, чтобы ETag совпадал у разных
+процессов и после перезапуска, пока набор стилей тот же.
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Dict, Iterable, List, Set
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import DanceStyle
+from app.utils.serialization import STYLE_COLUMNS, style_row_to_dict
+
+
+class StyleCatalog:
+    """Стили словарями DanceStyleRead в порядке id и поиск по id и названию."""
+
+    def __init__(self):
+        self._styles: List[Dict[str, Any]] = []
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._by_name: Dict[str, int] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self.version = 0
+        self.etag = ""
+
+    def __len__(self) -> int:
+        return len(self._styles)
+
+    @property
+    def loaded(self) -> bool:
+        """Признак того, что справочник загружен из БД."""
+        return self._loaded
+
+    async def load(self, db: AsyncSession) -> None:
+        """Перечитывает все стили из БД."""
+        result = await db.execute(select(*STYLE_COLUMNS))
+        styles = [style_row_to_dict(row) for row in result]
+        self._replace(styles)
+        self._loaded = True
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """Загружает справочник, если это еще не сделано."""
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self.load(db)
+
+    async def catch_up(self, db: AsyncSession) -> bool:
+        """Перечитывает справочник, если в БД есть стили новее известных; True - перечитан."""
+        await self.ensure_loaded(db)
+        newest = self._styles[-1]["id"] if self._styles else 0
+        # Один шаг по первичному ключу, без списка id в запросе
+        created_elsewhere = (await db.execute(
+            select(DanceStyle.id).filter(DanceStyle.id > newest).limit(1)
+        )).first()
+        if created_elsewhere is None:
+            return False
+        async with self._lock:
+            await self.load(db)
+        return True
+
+    async def resolve_ids(self, db: AsyncSession, style_ids: Iterable[int]) -> Set[int]:
+        """Те из style_ids, что есть в БД: по справочнику, а при промахе - после catch_up."""
+        await self.ensure_loaded(db)
+        style_ids = set(style_ids)
+        known = self.known_ids(style_ids)
+        if len(known) < len(style_ids) and await self.catch_up(db):
+            known = self.known_ids(style_ids)
+        return known
+
+    def clear(self) -> None:
+        """Сбрасывает справочник; следующее обращение загрузит его заново."""
+        self._replace([])
+        self._loaded = False
+
+    def add(self, style: Dict[str, Any]) -> None:
+        """Добавляет созданный стиль (словарь DanceStyleRead)."""
+        if not self._loaded:
+            # Незагруженный справочник прочитает стиль из БД вместе с остальными
+            return
+        self._replace([*(item for item in self._styles if item["id"] != style["id"]), style])
+
+    def _replace(self, styles: List[Dict[str, Any]]) -> None:
+        styles.sort(key=lambda item: item["id"])
+        # Списки и словари заменяются целиком: читатели не видят частичных изменений
+        self._styles = styles
+        self._by_id = {item["id"]: item for item in styles}
+        self._by_name = {item["name"].casefold(): item["id"] for item in styles}
+        self.version += 1
+        digest = hashlib.blake2b(orjson.dumps(styles), digest_size=8).hexdigest()
+        self.etag = f'W/"styles-{digest}"'
+
+    def page(self, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Страница стилей в порядке id."""
+        return self._styles[max(skip, 0):max(skip, 0) + max(limit, 0)]
+
+    def get(self, style_id: int) -> Dict[str, Any] | None:
+        """Стиль по id или None."""
+        return self._by_id.get(style_id)
+
+    def known_ids(self, style_ids: Iterable[int]) -> Set[int]:
+        """Те из style_ids, что есть в справочнике."""
+        return {style_id for style_id in style_ids if style_id in self._by_id}
+
+    def name_lookup(self) -> Dict[str, int]:
+        """Название без учета регистра -> id."""
+        return dict(self._by_name)
+
+    def stats(self) -> Dict[str, int]:
+        """Размер и версия справочника для метрик."""
+        return {"styles": len(self._styles), "version": self.version, "loaded": int(self._loaded)}
+
+
+style_catalog = StyleCatalog()
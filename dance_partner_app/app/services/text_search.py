@@ -0,0 +1,76 @@
+"""Полнотекстовый поиск профилей по FTS5-индексу имен и описания."""
+
+import re
+import unicodedata
+from typing import AsyncIterator, List
+
+from sqlalchemy import Select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import PROFILE_FTS_TABLE, profiles_fts
+
+# Не больше стольких слов из запроса пользователя
+MAX_QUERY_TERMS = 16
+# Веса BM25 по столбцам (first_name, last_name, bio): совпадение в имени важнее
+BM25_WEIGHTS = (5.0, 5.0, 1.0)
+# Не больше стольких самых релевантных совпадений отдает текстовый поиск партнеров
+MAX_TEXT_MATCHES = 1000
+# По сколько id читать совпадения, когда их дополнительно фильтруют другие критерии
+TEXT_MATCH_CHUNK_SIZE = 500
+
+_TERM_RE = re.compile(r"\w+")
+
+def build_match_query(text: str | None) -> str | None:
+    """Превращает текст пользователя в безопасный запрос FTS5: все слова, по префиксу.
+
+    Операторы и кавычки FTS5 из текста не попадают в запрос, поэтому
+    синтаксической ошибки MATCH быть не может. None - слов в тексте нет.
+    """
+    terms = _TERM_RE.findall(text or "")[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def matching_ids_query(match_query: str) -> Select:
+    """Подзапрос id профилей, совпадающих с запросом FTS5 (для фильтра IN)."""
+    fts_column = getattr(profiles_fts.c, PROFILE_FTS_TABLE)
+    return select(profiles_fts.c.rowid).where(fts_column.match(match_query))
+
+def _ranked_ids_query(match_query: str) -> Select:
+    fts_column = getattr(profiles_fts.c, PROFILE_FTS_TABLE)
+    # bm25() тем меньше, чем релевантнее документ
+    rank = func.bm25(fts_column, *BM25_WEIGHTS)
+    return matching_ids_query(match_query).order_by(rank, profiles_fts.c.rowid.desc())
+
+async def iter_profile_id_chunks(
+    db: AsyncSession, text: str, chunk_size: int = TEXT_MATCH_CHUNK_SIZE
+) -> AsyncIterator[List[int]]:
+    """Id совпадений пачками по убыванию релевантности.
+
+    Результат читается курсором: прерванный перебор не загружает остальные совпадения.
+    """
+    match_query = build_match_query(text)
+    if match_query is None:
+        return
+    result = await db.stream(_ranked_ids_query(match_query))
+    try:
+        async for rows in result.partitions(chunk_size):
+            yield [profile_id for profile_id, in rows]
+    finally:
+        await result.close()
+
+def _fold(value: str) -> str:
+    """Регистр и диакритика сворачиваются так же, как в токенизаторе unicode61."""
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def matches_text(text: str | None, *values: str | None) -> bool:
+    """Проверка без БД: каждое слово запроса - начало какого-то слова из values.
+
+    Повторяет семантику build_match_query для одного профиля в памяти
+    (например, при сопоставлении новой записи с сохраненными поисками).
+    """
+    terms = [_fold(term) for term in _TERM_RE.findall(text or "")[:MAX_QUERY_TERMS]]
+    words = [_fold(word) for value in values if value for word in _TERM_RE.findall(value)]
+    return all(any(word.startswith(term) for word in words) for term in terms)
@@ -1,25 +1,77 @@
 """Сервисный слой для работы с пользователями."""
 
+from dataclasses import dataclass
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.core.config import settings
 from app.db.models import User
+from app.db.write_queue import run_write
 from app.schemas.user import UserCreate
-from app.utils.security import get_password_hash
+from app.utils.cache import TTLCache
+from app.utils.security import get_password_hash_async
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Аутентифицированный пользователь: минимум данных, нужный эндпоинтам."""
+    id: int
+    email: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        """Создает Principal из ORM-модели пользователя."""
+        return cls(id=user.id, email=user.email, is_active=user.is_active)
+
+# Кэш пользователей по subject токена (email); сбрасывается при изменении пользователя
+principal_cache: TTLCache[str, Principal] = TTLCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
 
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
     """Получает пользователя из БД по email."""
     result = await db.execute(select(User).filter(User.email == email))
     return result.scalars().first()
 
+async def get_principal(db: AsyncSession, email: str) -> Principal | None:
+    """Возвращает пользователя из кэша, а при промахе - из БД."""
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+    user = await get_user_by_email(db, email=email)
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.set(email, principal)
+    return principal
+
 async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
     """Создает нового пользователя в БД."""
-    hashed_password = get_password_hash(user_in.password)
-    db_user = User(
-        email=user_in.email,
-        hashed_password=hashed_password,
-    )
-    db.add(db_user)
-    await db.commit()
-    await db.refresh(db_user)
-    return db_user 
+    hashed_password = await get_password_hash_async(user_in.password)
+
+    async def _insert(session: AsyncSession) -> User:
+        db_user = User(
+            email=user_in.email,
+            hashed_password=hashed_password,
+        )
+        session.add(db_user)
+        await session.flush()
+        return db_user
+
+    return await run_write(db, _insert)
+
+async def deactivate_user(db: AsyncSession, user_id: int) -> User | None:
+    """Деактивирует пользователя и сбрасывает его запись в кэше."""
+    async def _deactivate(session: AsyncSession) -> User | None:
+        user = await session.get(User, user_id)
+        if user is not None:
+            user.is_active = False
+            await session.flush()
+        return user
+
+    user = await run_write(db, _deactivate)
+    if user is not None:
+        principal_cache.invalidate(user.email)
+    return user
@@ -0,0 +1,240 @@
+"""Инструментирование запросов: SQL-статистика, N+1 и латентность по роутерам.
+
+ASGI-middleware заводит на каждый HTTP-запрос объект RequestStats в
+contextvar, а обработчики событий движков SQLAlchemy записывают в него
+каждый выполненный SQL-запрос. По завершении ответа статистика попадает
+в метрики Prometheus и в сводку по маршрутам для /metrics/sql.
+"""
+
+import contextvars
+import logging
+import re
+import time
+from collections import Counter as StatementCounter
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Сколько символов SQL хранить в сводке
+STATEMENT_PREVIEW_LENGTH = 200
+
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by router and route.",
+    ("router", "route", "method"),
+)
+requests_total = registry.counter(
+    "http_requests_total",
+    "HTTP requests by router, route and status code.",
+    ("router", "route", "method", "status"),
+)
+request_sql_queries = registry.histogram(
+    "http_request_sql_queries",
+    "SQL statements executed per HTTP request.",
+    ("router", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+request_sql_duration = registry.histogram(
+    "http_request_sql_duration_seconds",
+    "Total SQL execution time per HTTP request.",
+    ("router", "route"),
+)
+repeated_statement_requests = registry.counter(
+    "http_request_repeated_sql_total",
+    "Requests that repeated one SQL statement at least SQL_N_PLUS_ONE_THRESHOLD times.",
+    ("router", "route"),
+)
+
+
+def normalize_statement(statement: str) -> str:
+    """Приводит SQL к шаблону: IN-списки разной длины считаются одним запросом."""
+    statement = _WHITESPACE_RE.sub(" ", statement).strip()
+    return _IN_LIST_RE.sub("(?)", statement)
+
+
+class RequestStats:
+    """SQL-статистика одного HTTP-запроса."""
+
+    __slots__ = ("query_count", "sql_time", "slowest_time", "slowest_statement", "statements")
+
+    def __init__(self):
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: str | None = None
+        self.statements: StatementCounter = StatementCounter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.query_count += 1
+        self.sql_time += duration
+        self.statements[statement] += 1
+        if duration >= self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """Шаблоны SQL, выполненные не меньше threshold раз (признак N+1)."""
+        patterns: StatementCounter = StatementCounter()
+        for statement, count in self.statements.items():
+            patterns[normalize_statement(statement)] += count
+        return [(pattern, count) for pattern, count in patterns.most_common() if count >= threshold]
+
+
+current_request_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "current_request_stats", default=None
+)
+
+
+class RouteSummary:
+    """Накопленная SQL-статистика маршрута для /metrics/sql."""
+
+    __slots__ = ("requests", "queries", "sql_time", "slowest_time", "slowest_statement", "repeated")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: str | None = None
+        self.repeated: Dict[str, int] = {} # шаблон SQL -> максимум повторов за запрос
+
+    def add(self, stats: RequestStats, repeated: List[Tuple[str, int]]) -> None:
+        self.requests += 1
+        self.queries += stats.query_count
+        self.sql_time += stats.sql_time
+        if stats.slowest_statement is not None and stats.slowest_time >= self.slowest_time:
+            self.slowest_time = stats.slowest_time
+            self.slowest_statement = stats.slowest_statement[:STATEMENT_PREVIEW_LENGTH]
+        for statement, count in repeated:
+            preview = statement[:STATEMENT_PREVIEW_LENGTH]
+            self.repeated[preview] = max(count, self.repeated.get(preview, 0))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "queries": self.queries,
+            "avg_queries": round(self.queries / self.requests, 2) if self.requests else 0,
+            "sql_time_seconds": round(self.sql_time, 6),
+            "slowest_statement_seconds": round(self.slowest_time, 6),
+            "slowest_statement": self.slowest_statement,
+            "repeated_statements": self.repeated,
+        }
+
+
+route_summaries: Dict[Tuple[str, str], RouteSummary] = {}
+
+
+def sql_summary() -> List[Dict[str, Any]]:
+    """Сводка SQL по маршрутам, начиная с самых "разговорчивых"."""
+    rows = [
+        {"route": route, "method": method, **summary.as_dict()}
+        for (method, route), summary in route_summaries.items()
+    ]
+    return sorted(rows, key=lambda row: row["queries"], reverse=True)
+
+
+# Время начала хранится в контексте выполнения, а не в conn.info: у упавшего
+# запроса after_cursor_execute не вызывается, и контекст уходит вместе с ним
+_START_TIME_ATTRIBUTE = "_request_stats_started"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_request_stats.get() is not None:
+        setattr(context, _START_TIME_ATTRIBUTE, time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request_stats.get()
+    started = getattr(context, _START_TIME_ATTRIBUTE, None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+_installed = False
+
+
+def install_sql_instrumentation() -> None:
+    """Подписывается на выполнение SQL во всех движках (включая тестовые)."""
+    global _installed # pylint: disable=global-statement
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
+
+
+def _route_labels(scope: Dict[str, Any]) -> Tuple[str, str]:
+    """Роутер (тег из app/main.py) и шаблон пути маршрута; без шаблона - unmatched."""
+    route = scope.get("route")
+    if route is None:
+        return "none", "unmatched"
+    tags = getattr(route, "tags", None)
+    return (str(tags[0]) if tags else "root"), route.path
+
+
+class RequestMetricsMiddleware:
+    """ASGI-middleware: латентность, статус и SQL-статистика каждого HTTP-запроса."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            self._observe(scope, stats, time.perf_counter() - start, status_code)
+
+    @staticmethod
+    def _observe(scope, stats: RequestStats, duration: float, status_code: int) -> None:
+        router, route = _route_labels(scope)
+        method = scope["method"]
+        request_duration.observe(duration, router, route, method)
+        requests_total.inc(router, route, method, str(status_code))
+        request_sql_queries.observe(stats.query_count, router, route)
+        request_sql_duration.observe(stats.sql_time, router, route)
+
+        repeated = stats.repeated_statements(settings.SQL_N_PLUS_ONE_THRESHOLD)
+        if repeated:
+            repeated_statement_requests.inc(router, route)
+            logger.warning(
+                "Possible N+1 in %s %s: %s", method, route,
+                "; ".join(f"{count}x {statement[:STATEMENT_PREVIEW_LENGTH]}" for statement, count in repeated),
+            )
+        summary = route_summaries.get((method, route))
+        if summary is None:
+            summary = route_summaries[(method, route)] = RouteSummary()
+        summary.add(stats, repeated)
+
+        threshold_ms = settings.SLOW_REQUEST_THRESHOLD_MS
+        if threshold_ms and duration * 1000 >= threshold_ms:
+            logger.warning(
+                "Slow request %s %s: %.1f ms, %d SQL queries (%.1f ms), slowest %.1f ms: %s",
+                method, route, duration * 1000, stats.query_count, stats.sql_time * 1000,
+                stats.slowest_time * 1000,
+                (stats.slowest_statement or "")[:STATEMENT_PREVIEW_LENGTH],
+            )
@@ -0,0 +1,26 @@
+"""Нормализация пользовательского ввода для индексов и поиска."""
+
+import unicodedata
+
+# Верхняя граница диапазона строк с общим префиксом: prefix <= key < prefix + PREFIX_UPPER_BOUND
+PREFIX_UPPER_BOUND = "\U0010ffff"
+
+
+def normalize_city(city: str | None) -> str | None:
+    """Приводит название города к ключу поиска.
+
+    Unicode NFKC, сворачивание регистра, "ё" как "е", одиночные пробелы
+    без пробелов по краям. Пустое название - None.
+    """
+    if city is None:
+        return None
+    normalized = unicodedata.normalize("NFKC", city).casefold().replace("ё", "е")
+    normalized = " ".join(normalized.split())
+    return normalized or None
+
+
+def display_city(city: str | None) -> str | None:
+    """Название города для показа: как ввел пользователь, но без лишних пробелов."""
+    if city is None:
+        return None
+    return " ".join(city.split()) or None
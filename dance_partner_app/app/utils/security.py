@@ -1,13 +1,18 @@
 """Утилиты для безопасности: хеширование паролей, работа с JWT."""
 
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from typing import Any, Callable, Dict, List, Sequence, TypeVar, Union
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
 from app.schemas.token import TokenData
+from app.utils.cache import TTLCache
 
 # Контекст для хеширования паролей (используем bcrypt)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -24,6 +29,122 @@ def get_password_hash(password: str) -> str:
     """Возвращает хеш пароля."""
     return pwd_context.hash(password)
 
+def get_password_hashes(passwords: Sequence[str]) -> List[str]:
+    """Хеши нескольких паролей за один вызов (одна задача пула процессов на пачку)."""
+    return [pwd_context.hash(password) for password in passwords]
+
+T = TypeVar("T")
+
+class PasswordHashingBusyError(RuntimeError):
+    """Очередь пула хеширования паролей заполнена."""
+
+class PasswordHashingPool:
+    """Ограниченный пул потоков для bcrypt.
+
+    bcrypt отпускает GIL на время вычисления хеша, поэтому потоков
+    достаточно, чтобы логины и регистрации не блокировали event loop.
+    Одновременно выполняется не больше workers задач, еще queue_size ждут;
+    остальные сразу отклоняются с PasswordHashingBusyError.
+
+    Счетчики ведут сами задачи в потоках пула: задача занимает место, пока
+    выполняется ее функция, даже если ожидавший ее запрос уже отменен, а
+    время работы не включает ожидание в очереди.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: ThreadPoolExecutor | None = None
+        # Счетчики меняются и в event loop, и в потоках пула
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Выполняет func(*args) в пуле или отклоняет задачу при переполнении."""
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_size:
+                self._rejected += 1
+                raise PasswordHashingBusyError("Password hashing capacity exhausted")
+            self._in_flight += 1
+        try:
+            future = self._get_executor().submit(self._call, func, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # Место освобождается, когда функция завершилась или снята из очереди до старта
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _call(self, func: Callable[..., T], *args: Any) -> T:
+        # Выполняется в потоке пула: время считается с начала работы, а не постановки в очередь
+        with self._lock:
+            self._running += 1
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = func(*args)
+            failed = False
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._busy_seconds += time.perf_counter() - started
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    def _release(self, future: Future | None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self) -> Dict[str, float]:
+        """Снимок состояния пула для метрик."""
+        with self._lock:
+            in_flight, running = self._in_flight, self._running
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "running": running,
+                "queued": max(in_flight - running, 0),
+                "utilization": running / self.workers if self.workers else 0.0,
+                "completed_total": self._completed,
+                "failed_total": self._failed,
+                "rejected_total": self._rejected,
+                "busy_seconds_total": round(self._busy_seconds, 6),
+            }
+
+    def shutdown(self) -> None:
+        """Останавливает потоки пула (при завершении приложения)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hashing_pool = PasswordHashingPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверяет пароль в пуле хеширования, не блокируя event loop."""
+    return await password_hashing_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Вычисляет хеш пароля в пуле хеширования, не блокируя event loop."""
+    return await password_hashing_pool.run(get_password_hash, password)
+
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta | None = None
 ) -> str:
@@ -38,8 +159,17 @@ def create_access_token(
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Уже проверенные токены: запись живет не дольше срока действия токена
+# и не дольше TOKEN_CACHE_MAX_TTL_SECONDS (токен без exp тоже не вечен)
+token_cache: TTLCache[str, TokenData] = TTLCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_MAX_TTL_SECONDS
+)
+
 def decode_token(token: str) -> TokenData | None:
     """Декодирует токен и возвращает объект TokenData или None при ошибке."""
+    token_data = token_cache.get(token)
+    if token_data is not None:
+        return token_data
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str | None = payload.get("sub")
@@ -48,4 +178,9 @@ def decode_token(token: str) -> TokenData | None:
         token_data = TokenData(email=email)
     except JWTError:
         return None
+    expires_at = payload.get("exp")
+    ttl = token_cache.ttl
+    if expires_at is not None:
+        ttl = min(expires_at - time.time(), ttl)
+    token_cache.set(token, token_data, ttl=ttl)
     return token_data
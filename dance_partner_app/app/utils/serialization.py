@@ -0,0 +1,56 @@
+"""Быстрая сериализация профилей из кортежей строк БД, без валидации Pydantic.
+
+Набор и порядок колонок вычисляются один раз при импорте из схем
+ProfileRead и DanceStyleRead, поэтому словари получаются такими же, как
+model_dump(mode="json") этих схем, но без построения моделей. Подходит
+только для доверенных данных из БД.
+"""
+
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from app.db.models import DanceStyle, Profile
+from app.schemas.dance_style import DanceStyleRead
+from app.schemas.profile import ProfileRead
+
+# Вложенный список стилей заполняется отдельно
+PROFILE_STYLES_FIELD = "dance_styles"
+
+PROFILE_FIELDS: Tuple[str, ...] = tuple(
+    name for name in ProfileRead.model_fields if name != PROFILE_STYLES_FIELD
+)
+STYLE_FIELDS: Tuple[str, ...] = tuple(DanceStyleRead.model_fields)
+
+# Колонки в порядке полей схем: dict(zip(FIELDS, row)) дает готовый словарь
+PROFILE_COLUMNS = tuple(getattr(Profile, name) for name in PROFILE_FIELDS)
+STYLE_COLUMNS = tuple(getattr(DanceStyle, name) for name in STYLE_FIELDS)
+STYLE_ID_POSITION = STYLE_FIELDS.index("id")
+
+
+def style_row_to_dict(row: Sequence[Any]) -> Dict[str, Any]:
+    """Словарь стиля в формате DanceStyleRead из строки STYLE_COLUMNS."""
+    return dict(zip(STYLE_FIELDS, row))
+
+
+def profile_rows_to_dicts(
+    rows: Iterable[Sequence[Any]], styles_by_profile: Dict[int, List[Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """Словари профилей в формате ProfileRead из строк PROFILE_COLUMNS.
+
+    styles_by_profile - списки словарей стилей по id профиля; один и тот же
+    словарь стиля может разделяться многими профилями.
+    """
+    profiles = []
+    for row in rows:
+        profile = dict(zip(PROFILE_FIELDS, row))
+        profile[PROFILE_STYLES_FIELD] = styles_by_profile.get(profile["id"], [])
+        profiles.append(profile)
+    return profiles
+
+
+def profile_to_dict(profile: Profile) -> Dict[str, Any]:
+    """Словарь в формате ProfileRead из уже загруженного ORM-профиля."""
+    data = {name: getattr(profile, name) for name in PROFILE_FIELDS}
+    data[PROFILE_STYLES_FIELD] = [
+        {name: getattr(style, name) for name in STYLE_FIELDS} for style in profile.dance_styles
+    ]
+    return data
@@ -0,0 +1,62 @@
+"""Полный прогон бенчмарков: генерация данных, микробенчмарки и нагрузка.
+
+Запуск из папки dance_partner_app:
+
+    python -m benchmarks --profiles 100000 --output report.json
+    python -m benchmarks.report baseline.json report.json
+
+Без --db база создается во временном файле и удаляется после прогона.
+"""
+
+import argparse
+import asyncio
+import tempfile
+from pathlib import Path
+
+from benchmarks.data_generator import GeneratorConfig, create_database
+from benchmarks.load import run_load
+from benchmarks.micro import run_micro
+from benchmarks.report import build_report, format_summary, write_report
+
+
+async def main(args: argparse.Namespace) -> None:
+    config = GeneratorConfig(profiles=args.profiles, styles=args.styles, seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(args.db) if args.db else Path(tmp_dir) / "bench.sqlite"
+        if db_path.exists():
+            raise SystemExit(f"{db_path} already exists, the generator needs an empty database")
+        engine, session_factory, generation_seconds = await create_database(
+            f"sqlite+aiosqlite:///{db_path}", config
+        )
+        try:
+            micro = await run_micro(session_factory, repeat=args.repeat) if not args.skip_micro else {}
+            load = (
+                await run_load(session_factory, requests=args.requests, concurrency=args.concurrency, seed=args.seed)
+                if not args.skip_load else {}
+            )
+        finally:
+            await engine.dispose()
+
+    dataset = {**config.as_dict(), "generation_seconds": round(generation_seconds, 2)}
+    report = build_report(dataset, micro, load)
+    write_report(args.output, report)
+    print(f"dataset: {dataset}")
+    for section in ("micro", "load"):
+        if report[section]:
+            print(f"{section}:\n{format_summary(report[section])}")
+    print(f"report written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=10_000)
+    parser.add_argument("--styles", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=20, help="Замеров на микробенчмарк")
+    parser.add_argument("--requests", type=int, default=500, help="Запросов на маршрут")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--db", help="Новый файл БД, который нужно сохранить после прогона")
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    asyncio.run(main(parser.parse_args()))
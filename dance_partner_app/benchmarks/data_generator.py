@@ -0,0 +1,234 @@
+"""Воспроизводимый генератор синтетических данных для бенчмарков.
+
+Один и тот же seed дает одинаковые данные (кроме соли хеша пароля): все
+значения берутся из одного random.Random в порядке id профилей, размер
+пачки вставки на результат не влияет. Распределения приближены к реальным: города и стили
+по закону Ципфа (несколько крупных и длинный хвост), у профиля 1-4 стиля,
+новичков больше, чем профессионалов, у части профилей есть координаты и
+недельное расписание.
+
+Запуск из папки dance_partner_app (создает файл БД):
+
+    python -m benchmarks.data_generator --profiles 100000 --db bench.sqlite
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.models import (
+    Base, DanceRole, DanceStyle, Profile, ProfileAvailability, User,
+    profile_dance_style_association,
+)
+from app.db.session import create_sqlite_engine
+from app.services.availability import SLOTS_PER_DAY, mask_to_bytes
+from app.utils.normalization import normalize_city
+from app.utils.security import get_password_hash
+
+# Пароль всех сгенерированных пользователей (хеш bcrypt считается один раз)
+PASSWORD = "benchmark-password"
+
+# Город и координаты центра; порядок задает популярность
+CITIES: List[Tuple[str, float, float]] = [
+    ("Moscow", 55.7558, 37.6173), ("Berlin", 52.5200, 13.4050), ("Paris", 48.8566, 2.3522),
+    ("London", 51.5074, -0.1278), ("Saint Petersburg", 59.9343, 30.3351),
+    ("Madrid", 40.4168, -3.7038), ("Rome", 41.9028, 12.4964), ("Barcelona", 41.3874, 2.1686),
+    ("Warsaw", 52.2297, 21.0122), ("Vienna", 48.2082, 16.3738), ("Prague", 50.0755, 14.4378),
+    ("Amsterdam", 52.3676, 4.9041), ("Munich", 48.1351, 11.5820), ("Milan", 45.4642, 9.1900),
+    ("Kazan", 55.7961, 49.1064), ("Lisbon", 38.7223, -9.1393), ("Budapest", 47.4979, 19.0402),
+    ("Hamburg", 53.5511, 9.9937), ("Novosibirsk", 55.0084, 82.9357), ("Yekaterinburg", 56.8389, 60.6057),
+    ("Brussels", 50.8503, 4.3517), ("Copenhagen", 55.6761, 12.5683), ("Stockholm", 59.3293, 18.0686),
+    ("Helsinki", 60.1699, 24.9384), ("Riga", 56.9496, 24.1052), ("Vilnius", 54.6872, 25.2797),
+    ("Tallinn", 59.4370, 24.7536), ("Krakow", 50.0647, 19.9450), ("Porto", 41.1579, -8.6291),
+    ("Sochi", 43.6028, 39.7342),
+]
+
+STYLE_NAMES = [
+    "Salsa", "Bachata", "Kizomba", "Argentine Tango", "West Coast Swing", "Lindy Hop",
+    "Brazilian Zouk", "Hustle", "Waltz", "Foxtrot", "Cha-cha-cha", "Rumba", "Samba",
+    "Jive", "Quickstep", "Forro", "Blues", "Balboa", "Paso Doble", "Viennese Waltz",
+    "Boogie-woogie", "Rock'n'Roll", "Merengue", "Semba",
+]
+
+ADJECTIVES = ["Passionate", "Friendly", "Curious", "Energetic", "Relaxed", "Social", "Competitive"]
+
+# Доли уровней от новичка до профессионала и число стилей у профиля
+SKILL_LEVEL_WEIGHTS = [0.40, 0.32, 0.20, 0.08]
+STYLE_COUNT_WEIGHTS = [0.40, 0.30, 0.20, 0.10]
+ROLES = [DanceRole.LEADER.value, DanceRole.FOLLOWER.value, None]
+ROLE_WEIGHTS = [0.45, 0.45, 0.10]
+
+# Доли профилей без города, с координатами и с расписанием
+NO_CITY_SHARE = 0.05
+LOCATION_SHARE = 0.8
+AVAILABILITY_SHARE = 0.6
+
+BASE_CREATED_AT = datetime.datetime(2024, 1, 1)
+CREATED_SPAN = datetime.timedelta(days=730)
+
+
+class GeneratorConfig:
+    """Параметры генерации: размер базы, число стилей и seed."""
+
+    def __init__(self, profiles: int = 10_000, styles: int = 20, seed: int = 42, batch_size: int = 5_000):
+        if profiles < 1 or styles < 1:
+            raise ValueError("profiles and styles must be positive")
+        self.profiles = profiles
+        self.styles = styles
+        self.seed = seed
+        self.batch_size = batch_size
+
+    def as_dict(self) -> Dict[str, int]:
+        """Параметры для отчета бенчмарка."""
+        return {"profiles": self.profiles, "styles": self.styles, "seed": self.seed}
+
+
+def email_for(user_id: int) -> str:
+    """Email сгенерированного пользователя (пароль у всех - PASSWORD)."""
+    return f"dancer{user_id}@example.com"
+
+
+def zipf_weights(count: int, exponent: float = 1.0) -> List[float]:
+    """Веса рангов 1..count по закону Ципфа."""
+    return [1.0 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def style_name(style_id: int) -> str:
+    """Название стиля: сначала реальные, затем нумерованные."""
+    return STYLE_NAMES[style_id - 1] if style_id <= len(STYLE_NAMES) else f"Style {style_id}"
+
+
+def style_rows(config: GeneratorConfig) -> List[Dict[str, object]]:
+    """Строки dance_styles."""
+    return [
+        {"id": style_id, "name": style_name(style_id), "description": "Generated benchmark style"}
+        for style_id in range(1, config.styles + 1)
+    ]
+
+
+def _availability_mask(rng: random.Random) -> int:
+    """Несколько вечеров в будни и, иногда, день в выходные."""
+    mask = 0
+    for day in rng.sample(range(5), rng.randint(1, 4)):
+        first = day * SLOTS_PER_DAY + rng.randint(34, 40) # 17:00-20:00
+        mask |= ((1 << rng.randint(4, 8)) - 1) << first
+    if rng.random() < 0.5:
+        first = rng.randint(5, 6) * SLOTS_PER_DAY + rng.randint(24, 32) # 12:00-16:00
+        mask |= ((1 << rng.randint(4, 12)) - 1) << first
+    return mask
+
+
+def generate_rows(config: GeneratorConfig) -> Iterator[Dict[str, List[Dict[str, object]]]]:
+    """Пачки строк users, profiles, стилей профилей и расписаний в порядке id."""
+    rng = random.Random(config.seed)
+    city_weights = zipf_weights(len(CITIES), 1.1)
+    style_ids = list(range(1, config.styles + 1))
+    style_weights = zipf_weights(config.styles, 0.9)
+    hashed_password = get_password_hash(PASSWORD)
+    step = CREATED_SPAN / config.profiles
+
+    batch: Dict[str, List[Dict[str, object]]] = {"users": [], "profiles": [], "styles": [], "availability": []}
+    for profile_id in range(1, config.profiles + 1):
+        batch["users"].append({
+            "id": profile_id, "email": email_for(profile_id),
+            "hashed_password": hashed_password, "is_active": True,
+        })
+
+        city = latitude = longitude = None
+        if rng.random() >= NO_CITY_SHARE:
+            city, center_lat, center_lon = rng.choices(CITIES, weights=city_weights)[0]
+            if rng.random() < LOCATION_SHARE:
+                # Разброс ~10 км вокруг центра города
+                latitude = round(center_lat + rng.gauss(0, 0.08), 5)
+                longitude = round(center_lon + rng.gauss(0, 0.12), 5)
+
+        # Стили без повторов с учетом популярности
+        chosen: Dict[int, int] = {}
+        wanted = min(rng.choices(range(1, 5), weights=STYLE_COUNT_WEIGHTS)[0], config.styles)
+        while len(chosen) < wanted:
+            style_id = rng.choices(style_ids, weights=style_weights)[0]
+            chosen.setdefault(style_id, rng.choices(range(1, 5), weights=SKILL_LEVEL_WEIGHTS)[0])
+        batch["styles"].extend(
+            {"profile_id": profile_id, "dance_style_id": style_id, "skill_level": level}
+            for style_id, level in chosen.items()
+        )
+
+        created_at = BASE_CREATED_AT + step * profile_id
+        main_style = style_name(next(iter(chosen)))
+        batch["profiles"].append({
+            "id": profile_id, "user_id": profile_id,
+            "first_name": f"Name{profile_id}", "last_name": f"Dancer{rng.randrange(1000)}",
+            "city": city, "city_key": normalize_city(city),
+            "bio": f"{rng.choice(ADJECTIVES)} {main_style} dancer" + (f" from {city}" if city else ""),
+            "dance_role": rng.choices(ROLES, weights=ROLE_WEIGHTS)[0],
+            "latitude": latitude, "longitude": longitude,
+            "created_at": created_at,
+            "updated_at": created_at + datetime.timedelta(minutes=rng.randrange(60 * 24 * 30)),
+        })
+
+        if rng.random() < AVAILABILITY_SHARE:
+            batch["availability"].append(
+                {"profile_id": profile_id, "slots": mask_to_bytes(_availability_mask(rng))}
+            )
+
+        if len(batch["profiles"]) >= config.batch_size:
+            yield batch
+            batch = {"users": [], "profiles": [], "styles": [], "availability": []}
+    if batch["profiles"]:
+        yield batch
+
+
+async def populate(session_factory: async_sessionmaker, config: GeneratorConfig) -> float:
+    """Заполняет пустую БД сгенерированными данными; возвращает время в секундах."""
+    start = time.perf_counter()
+    tables = {
+        "users": User.__table__,
+        "profiles": Profile.__table__,
+        "styles": profile_dance_style_association,
+        "availability": ProfileAvailability.__table__,
+    }
+    async with session_factory() as session:
+        await session.execute(insert(DanceStyle.__table__), style_rows(config))
+        await session.commit()
+        for batch in generate_rows(config):
+            for name, table in tables.items():
+                if batch[name]:
+                    await session.execute(insert(table), batch[name])
+            # Коммит на пачку: журнал WAL не разрастается на всю базу
+            await session.commit()
+        # Статистика для планировщика, как у долго живущей базы
+        await session.execute(text("ANALYZE"))
+        await session.commit()
+    return time.perf_counter() - start
+
+
+async def create_database(url: str, config: GeneratorConfig):
+    """Создает схему в БД по url, заполняет ее и возвращает (движок, фабрику, время)."""
+    engine = create_sqlite_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    elapsed = await populate(session_factory, config)
+    return engine, session_factory, elapsed
+
+
+async def main(args: argparse.Namespace) -> None:
+    config = GeneratorConfig(profiles=args.profiles, styles=args.styles, seed=args.seed)
+    engine, _, elapsed = await create_database(f"sqlite+aiosqlite:///{args.db}", config)
+    await engine.dispose()
+    print(f"{config.profiles} profiles, {config.styles} styles -> {args.db} in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=10_000)
+    parser.add_argument("--styles", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default="bench.sqlite", help="Путь к новому файлу БД")
+    asyncio.run(main(parser.parse_args()))
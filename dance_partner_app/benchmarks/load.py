@@ -0,0 +1,137 @@
+"""Нагрузочный прогон API в процессе через httpx.ASGITransport.
+
+Запросы идут через весь стек FastAPI (middleware, зависимости,
+валидация, сериализация) без сети: concurrency корутин-клиентов
+выполняют requests запросов к каждому маршруту. Для маршрута считаются
+перцентили латентности, пропускная способность и число ответов >= 400.
+Зависимости сессий БД временно переключаются на БД бенчмарка.
+"""
+
+import asyncio
+import itertools
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.future import select
+
+from app.db.models import User
+from app.db.session import get_db_session, get_read_db_session
+from app.main import app
+from app.services.matching_index import matching_index
+from app.services.percolator import percolator
+from app.services.style_catalog import style_catalog
+from app.utils.instrumentation import route_summaries
+from app.utils.security import create_access_token
+
+from benchmarks.data_generator import PASSWORD
+from benchmarks.micro import SEARCH_CRITERIA, reset_app_state
+from benchmarks.report import summarize
+
+# Запрос маршрута по номеру: (метод, путь, аргументы httpx)
+RequestFactory = Callable[[int], Tuple[str, str, Dict[str, Any]]]
+
+# Сколько разных пользователей шлет запросы
+CLIENT_USERS = 50
+# Доля логинов от числа запросов: bcrypt ограничивает их пулом хеширования
+LOGIN_SHARE = 0.1
+
+
+async def drive(
+    client: AsyncClient, build: RequestFactory, requests: int, concurrency: int
+) -> Dict[str, float]:
+    """Выполняет requests запросов concurrency клиентами и возвращает статистику."""
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while (number := next(counter)) < requests:
+            method, url, kwargs = build(number)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stats = summarize(latencies)
+    stats["throughput_rps"] = round(requests / elapsed, 1)
+    stats["errors"] = errors
+    stats["concurrency"] = concurrency
+    return stats
+
+
+def build_scenarios(
+    emails: List[str], profile_ids: List[int], seed: int
+) -> Dict[str, Tuple[RequestFactory, float]]:
+    """Маршруты и доли от числа запросов; номер запроса задает пользователя и профиль."""
+    rng = random.Random(seed)
+    headers = [{"Authorization": f"Bearer {create_access_token(subject=email)}"} for email in emails]
+    targets = [rng.choice(profile_ids) for _ in range(1000)]
+
+    def auth(number: int) -> Dict[str, str]:
+        return headers[number % len(headers)]
+
+    return {
+        "POST /auth/token": (lambda n: ("POST", "/auth/token", {
+            "data": {"username": emails[n % len(emails)], "password": PASSWORD},
+        }), LOGIN_SHARE),
+        "POST /matching/find-partners": (lambda n: ("POST", "/matching/find-partners", {
+            "json": SEARCH_CRITERIA, "headers": auth(n),
+        }), 1.0),
+        "POST /matching/find-partners/page": (lambda n: ("POST", "/matching/find-partners/page", {
+            "json": SEARCH_CRITERIA, "headers": auth(n),
+        }), 1.0),
+        "POST /matching/ranked": (lambda n: ("POST", "/matching/ranked", {
+            "json": SEARCH_CRITERIA, "headers": auth(n),
+        }), 1.0),
+        "GET /profiles/{profile_id}": (lambda n: (
+            "GET", f"/profiles/{targets[n % len(targets)]}", {},
+        ), 1.0),
+        "GET /styles/": (lambda n: ("GET", "/styles/", {}), 1.0),
+    }
+
+
+async def run_load(
+    session_factory: async_sessionmaker, requests: int, concurrency: int, seed: int = 42
+) -> Dict[str, Dict[str, float]]:
+    """Прогоняет маршруты API по очереди и возвращает статистику по каждому."""
+    async def override_session():
+        async with session_factory() as session:
+            yield session
+
+    saved_overrides = dict(app.dependency_overrides)
+    app.dependency_overrides[get_db_session] = override_session
+    app.dependency_overrides[get_read_db_session] = override_session
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        # ASGITransport не вызывает startup - загружаем индексы как при старте
+        async with session_factory() as session:
+            await matching_index.load(session)
+            await percolator.ensure_loaded(session)
+            await style_catalog.load(session)
+            emails = list((await session.execute(
+                select(User.email).order_by(User.id).limit(CLIENT_USERS)
+            )).scalars())
+        profile_ids = matching_index.candidate_array().tolist()
+
+        scenarios = build_scenarios(emails, profile_ids, seed)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            for name, (build, share) in scenarios.items():
+                count = max(int(requests * share), concurrency)
+                # Прогрев: первые запросы маршрута строят кэши и планы запросов
+                await drive(client, build, concurrency, concurrency)
+                results[name] = await drive(client, build, count, concurrency)
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(saved_overrides)
+        reset_app_state()
+        # SQL-сводка /metrics/sql относится к БД бенчмарка, а не к рабочей
+        route_summaries.clear()
+    return results
@@ -0,0 +1,122 @@
+"""Микробенчмарки сервисных функций горячих путей API.
+
+Каждая функция вызывается repeat раз после одного прогревочного вызова;
+в отчет идут перцентили отдельных замеров (см. report.summarize).
+Индекс и кэши процесса (matching_index, match_cache и др.) глобальные,
+поэтому бенчмарк загружает их из своей БД и сбрасывает по окончании.
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.future import select
+
+from app.db.models import Profile, User
+from app.schemas.matching import PartnerSearchCriteria, PartnerSearchPageRequest, RankedSearchRequest
+from app.services import auth as auth_service
+from app.services import matching as matching_service
+from app.services import profiles as profiles_service
+from app.services.match_cache import match_cache
+from app.services.matching_index import matching_index
+from app.services.percolator import percolator
+from app.services.style_catalog import style_catalog
+from app.services.users import Principal, principal_cache
+from app.utils.security import token_cache
+
+from benchmarks.data_generator import CITIES, PASSWORD
+from benchmarks.report import summarize
+
+# Критерии поиска, общие для микробенчмарков и нагрузки: самый популярный
+# город и стили, уровень не ниже среднего
+SEARCH_CRITERIA: Dict[str, Any] = {"city": CITIES[0][0], "dance_style_ids": [1, 2], "min_skill_level": 2}
+RADIUS_CRITERIA: Dict[str, Any] = {"dance_style_ids": [1], "radius_km": 10}
+
+# bcrypt намеренно медленный, много замеров логина не нужно
+MAX_LOGIN_REPEAT = 5
+
+
+def reset_app_state() -> None:
+    """Сбрасывает индексы и кэши процесса, заполненные из БД бенчмарка."""
+    matching_index.clear()
+    match_cache.clear()
+    percolator.clear()
+    style_catalog.clear()
+    principal_cache.clear()
+    token_cache.clear()
+
+
+async def pick_searcher(session_factory: async_sessionmaker) -> Principal:
+    """Пользователь, от имени которого идут поиски: первый профиль с координатами."""
+    async with session_factory() as session:
+        user = (await session.execute(
+            select(User).join(Profile, Profile.user_id == User.id)
+            .filter(Profile.latitude.is_not(None))
+            .order_by(Profile.id).limit(1)
+        )).scalars().first()
+    if user is None:
+        raise ValueError("Benchmark database has no profiles with coordinates")
+    return Principal.from_user(user)
+
+
+async def measure(repeat: int, func: Callable[[], Awaitable[object]], warmup: bool = True) -> List[float]:
+    """Времена repeat вызовов в секундах."""
+    if warmup:
+        await func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def run_micro(session_factory: async_sessionmaker, repeat: int) -> Dict[str, Dict[str, float]]:
+    """Замеряет сервисные функции и возвращает статистику по именам."""
+    searcher = await pick_searcher(session_factory)
+    criteria = PartnerSearchCriteria(**SEARCH_CRITERIA)
+    radius_criteria = PartnerSearchCriteria(**RADIUS_CRITERIA)
+    page_criteria = PartnerSearchPageRequest(**SEARCH_CRITERIA)
+    ranked_criteria = RankedSearchRequest(**SEARCH_CRITERIA)
+    results: Dict[str, Dict[str, float]] = {}
+
+    try:
+        async with session_factory() as db:
+            results["matching_index.load"] = summarize(
+                await measure(min(repeat, 3), lambda: matching_index.load(db), warmup=False)
+            )
+            sample_ids = matching_index.candidate_array()[:100].tolist()
+
+            async def search_cold():
+                match_cache.clear()
+                return await matching_service.find_dance_partner_ids(db, criteria, searcher)
+
+            cases: Dict[str, Callable[[], Awaitable[object]]] = {
+                "find_dance_partner_ids[cold]": search_cold,
+                "find_dance_partner_ids[cached]":
+                    lambda: matching_service.find_dance_partner_ids(db, criteria, searcher),
+                "find_dance_partner_ids[radius]":
+                    lambda: matching_service.find_dance_partner_ids(db, radius_criteria, searcher),
+                "find_dance_partner_dicts":
+                    lambda: matching_service.find_dance_partner_dicts(db, criteria, searcher),
+                "find_dance_partners_page":
+                    lambda: matching_service.find_dance_partners_page(db, page_criteria, searcher),
+                "rank_dance_partners":
+                    lambda: matching_service.rank_dance_partners(db, ranked_criteria, searcher),
+                "get_profile_dicts[1]":
+                    lambda: profiles_service.get_profile_dicts(db, sample_ids[:1]),
+                "get_profile_dicts[100]":
+                    lambda: profiles_service.get_profile_dicts(db, sample_ids),
+            }
+            for name, func in cases.items():
+                results[name] = summarize(await measure(repeat, func))
+                # Сессия не копит объекты между случаями
+                db.expunge_all()
+
+            results["authenticate_user"] = summarize(await measure(
+                min(repeat, MAX_LOGIN_REPEAT),
+                lambda: auth_service.authenticate_user(db, searcher.email, PASSWORD),
+            ))
+    finally:
+        reset_app_state()
+    return results
@@ -0,0 +1,153 @@
+"""JSON-отчет бенчмарков и сравнение двух отчетов.
+
+Отчет - словарь с окружением (коммит, версии, платформа), параметрами
+данных и разделами micro/load: для каждого имени - число замеров,
+среднее, p50/p95/p99 и максимум в миллисекундах, для нагрузки еще
+пропускная способность и число ошибок. Сравнение:
+
+    python -m benchmarks.report old.json new.json --threshold 0.15
+
+выводит изменение p50/p95 по каждому имени и завершается с кодом 1, если
+хотя бы одна метрика ухудшилась больше чем на threshold.
+"""
+
+import argparse
+import datetime
+import platform
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import orjson
+
+REPORT_VERSION = 1
+
+# Метрики, по которым сравниваются отчеты
+COMPARED_METRICS = ("p50_ms", "p95_ms")
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Статистика замеров (в секундах) в миллисекундах."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(values.max()), 4),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def environment() -> Dict[str, Any]:
+    """Окружение прогона: без него отчеты разных машин сравнивать нельзя."""
+    return {
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def build_report(dataset: Dict[str, Any], micro: Dict[str, Any], load: Dict[str, Any]) -> Dict[str, Any]:
+    """Собирает отчет из результатов прогона."""
+    return {
+        "version": REPORT_VERSION,
+        "environment": environment(),
+        "dataset": dataset,
+        "micro": micro,
+        "load": load,
+    }
+
+
+def write_report(path: str | Path, report: Dict[str, Any]) -> None:
+    """Пишет отчет в JSON с отсортированными ключами (удобно для diff)."""
+    Path(path).write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+
+
+def read_report(path: str | Path) -> Dict[str, Any]:
+    """Читает отчет из JSON."""
+    return orjson.loads(Path(path).read_bytes())
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Изменения метрик по именам, присутствующим в обоих отчетах.
+
+    change - относительное изменение (0.2 - на 20% медленнее),
+    regression - ухудшение больше threshold.
+    """
+    rows = []
+    for section in ("micro", "load"):
+        old_section, new_section = old.get(section, {}), new.get(section, {})
+        for name in sorted(old_section.keys() & new_section.keys()):
+            for metric in COMPARED_METRICS:
+                before = old_section[name].get(metric)
+                after = new_section[name].get(metric)
+                if not before or after is None:
+                    continue
+                change = after / before - 1
+                rows.append({
+                    "section": section, "name": name, "metric": metric,
+                    "old": before, "new": after, "change": change,
+                    "regression": change > threshold,
+                })
+    return rows
+
+
+def format_summary(section: Dict[str, Dict[str, float]]) -> str:
+    """Таблица p50/p95/p99 (и rps для нагрузки) для вывода в консоль."""
+    lines = []
+    for name, stats in section.items():
+        line = (
+            f"{name:>40}: p50 {stats.get('p50_ms', 0):9.3f} ms, p95 {stats.get('p95_ms', 0):9.3f} ms, "
+            f"p99 {stats.get('p99_ms', 0):9.3f} ms"
+        )
+        if "throughput_rps" in stats:
+            line += f", {stats['throughput_rps']:8.1f} req/s, errors {stats['errors']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Допустимое ухудшение (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    old, new = read_report(args.old), read_report(args.new)
+    for label, report in (("old", old), ("new", new)):
+        env = report.get("environment", {})
+        print(f"{label}: commit {env.get('git_commit')}, dataset {report.get('dataset')}")
+    rows = compare(old, new, args.threshold)
+    for row in rows:
+        marker = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['section']:>5} {row['name']:>40} {row['metric']}: "
+            f"{row['old']:9.3f} -> {row['new']:9.3f} ms ({row['change']:+.1%}) {marker}"
+        )
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Сравнение стоимости ответа find-partners на один профиль: до и после.
+
+"До" - ORM-профили со стилями, валидация List[ProfileRead] через
+from_attributes и стандартный json, как в JSONResponse FastAPI.
+"После" - плоские строки БД, словари из utils/serialization и orjson.
+
+Запуск из папки dance_partner_app:
+
+    python -m benchmarks.serialization_benchmark --profiles 2000
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import time
+from typing import Callable, List
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.models import Base, DanceStyle, Profile, User, profile_dance_style_association
+from app.schemas.profile import ProfileRead
+from app.services.matching import hydrate_profiles
+from app.services.profiles import get_profile_dicts
+
+PROFILE_LIST_ADAPTER = TypeAdapter(List[ProfileRead])
+
+
+def serialize_with_pydantic(profiles: List[Profile]) -> bytes:
+    """Путь FastAPI по умолчанию: валидация response_model и json.dumps."""
+    validated = PROFILE_LIST_ADAPTER.validate_python(profiles, from_attributes=True)
+    content = PROFILE_LIST_ADAPTER.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """Лучшее время из repeat прогонов в секундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+async def best_of_async(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+async def seed(session_factory, profile_count: int, style_count: int) -> List[int]:
+    """Заполняет БД профилями с 1-4 стилями и возвращает их id."""
+    rng = random.Random(42)
+    created_at = datetime.datetime(2024, 1, 1)
+    async with session_factory() as session:
+        await session.execute(insert(DanceStyle), [
+            {"id": style_id, "name": f"Style {style_id}", "description": "Benchmark style"}
+            for style_id in range(1, style_count + 1)
+        ])
+        await session.execute(insert(User), [
+            {"id": user_id, "email": f"bench{user_id}@example.com", "hashed_password": "x"}
+            for user_id in range(1, profile_count + 1)
+        ])
+        await session.execute(insert(Profile), [
+            {
+                "id": profile_id, "user_id": profile_id,
+                "first_name": f"Name{profile_id}", "last_name": "Dancer",
+                "city": rng.choice(["Moscow", "Berlin", "Paris"]),
+                "bio": "Loves social dancing " * 3,
+                "created_at": created_at + datetime.timedelta(minutes=profile_id),
+            }
+            for profile_id in range(1, profile_count + 1)
+        ])
+        await session.execute(insert(profile_dance_style_association), [
+            {"profile_id": profile_id, "dance_style_id": style_id, "skill_level": rng.randint(1, 4)}
+            for profile_id in range(1, profile_count + 1)
+            for style_id in rng.sample(range(1, style_count + 1), rng.randint(1, 4))
+        ])
+        await session.commit()
+    return list(range(profile_count, 0, -1))
+
+
+async def main(profile_count: int, repeat: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    profile_ids = await seed(session_factory, profile_count, style_count=20)
+
+    async with session_factory() as session:
+        orm_profiles = await hydrate_profiles(session, profile_ids)
+        profile_dicts = await get_profile_dicts(session, profile_ids)
+        assert orjson.loads(orjson.dumps(profile_dicts)) == json.loads(serialize_with_pydantic(orm_profiles))
+
+        serialize_before = best_of(repeat, lambda: serialize_with_pydantic(orm_profiles))
+        serialize_after = best_of(repeat, lambda: orjson.dumps(profile_dicts))
+
+        async def full_before():
+            session.expunge_all()
+            serialize_with_pydantic(await hydrate_profiles(session, profile_ids))
+
+        async def full_after():
+            orjson.dumps(await get_profile_dicts(session, profile_ids))
+
+        full_before_time = await best_of_async(repeat, full_before)
+        full_after_time = await best_of_async(repeat, full_after)
+    await engine.dispose()
+
+    print(f"profiles: {profile_count}, best of {repeat}")
+    for stage, before, after in (
+        ("serialize only", serialize_before, serialize_after),
+        ("load + serialize", full_before_time, full_after_time),
+    ):
+        print(
+            f"{stage:>17}: before {before / profile_count * 1e6:7.2f} us/profile, "
+            f"after {after / profile_count * 1e6:7.2f} us/profile, x{before / after:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.profiles, args.repeat))
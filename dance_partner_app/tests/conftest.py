@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 
 # Импортируем наше FastAPI приложение и базовый класс моделей
 from app.main import app
-from app.db.session import Base, get_db_session
+from app.db.session import Base, get_db_session, get_read_db_session, get_read_session_factory
 from app.core.config import settings
 
 # Используем отдельную БД в памяти для тестов
@@ -40,6 +40,8 @@ async def override_get_db_session() -> AsyncGenerator[AsyncSession, None]:
 
 # Переопределяем зависимость get_db_session в приложении на время тестов
 app.dependency_overrides[get_db_session] = override_get_db_session
+app.dependency_overrides[get_read_db_session] = override_get_db_session
+app.dependency_overrides[get_read_session_factory] = lambda: TestingSessionLocal
 
 @pytest.fixture(scope="module")
 async def client() -> AsyncGenerator[AsyncClient, None]:
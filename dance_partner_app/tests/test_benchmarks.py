@@ -0,0 +1,65 @@
+from benchmarks.data_generator import GeneratorConfig, create_database, generate_rows
+from benchmarks.load import run_load
+from benchmarks.micro import run_micro
+from benchmarks.report import build_report, compare, read_report, summarize, write_report
+
+
+def _rows_without_hashes(config: GeneratorConfig):
+    batches = list(generate_rows(config))
+    for batch in batches:
+        for user in batch["users"]:
+            user.pop("hashed_password")
+    return batches
+
+
+def test_generator_is_reproducible():
+    """Один seed - одинаковые данные при любом размере пачки, другой seed - другие."""
+    rows = _rows_without_hashes(GeneratorConfig(profiles=50, seed=7, batch_size=50))
+    rebatched = _rows_without_hashes(GeneratorConfig(profiles=50, seed=7, batch_size=20))
+    assert [row for batch in rebatched for row in batch["profiles"]] == rows[0]["profiles"]
+    assert [row for batch in rebatched for row in batch["styles"]] == rows[0]["styles"]
+    other = _rows_without_hashes(GeneratorConfig(profiles=50, seed=8, batch_size=50))
+    assert other[0]["profiles"] != rows[0]["profiles"]
+
+    styles_per_profile = {}
+    for row in rows[0]["styles"]:
+        styles_per_profile[row["profile_id"]] = styles_per_profile.get(row["profile_id"], 0) + 1
+        assert 1 <= row["skill_level"] <= 4
+    assert set(styles_per_profile) == set(range(1, 51))
+    assert all(1 <= count <= 4 for count in styles_per_profile.values())
+
+
+def test_summarize_and_compare():
+    """Перцентили в миллисекундах; регрессия - ухудшение больше порога."""
+    stats = summarize([0.001] * 98 + [0.01, 0.1])
+    assert stats["count"] == 100
+    assert stats["p50_ms"] == 1.0
+    assert stats["max_ms"] == 100.0
+
+    old = build_report({}, {"search": {"p50_ms": 1.0, "p95_ms": 2.0}}, {})
+    new = build_report({}, {"search": {"p50_ms": 1.05, "p95_ms": 3.0}}, {})
+    rows = {row["metric"]: row for row in compare(old, new, threshold=0.1)}
+    assert not rows["p50_ms"]["regression"]
+    assert rows["p95_ms"]["regression"]
+
+
+async def test_benchmark_suite_smoke(tmp_path):
+    """Сквозной прогон на маленькой базе: все замеры есть, ошибок нагрузки нет."""
+    engine, session_factory, _ = await create_database(
+        f"sqlite+aiosqlite:///{tmp_path / 'bench.sqlite'}", GeneratorConfig(profiles=200, styles=8)
+    )
+    try:
+        micro = await run_micro(session_factory, repeat=2)
+        load = await run_load(session_factory, requests=4, concurrency=2)
+    finally:
+        await engine.dispose()
+
+    assert micro["find_dance_partner_ids[cached]"]["count"] == 2
+    assert "POST /matching/find-partners" in load
+    assert all(stats["errors"] == 0 for stats in load.values())
+
+    path = tmp_path / "report.json"
+    write_report(path, build_report({"profiles": 200}, micro, load))
+    report = read_report(path)
+    assert report["environment"]["python"]
+    assert report["load"]["GET /styles/"]["count"] >= 2
@@ -0,0 +1,247 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.db.session import create_sqlite_engine
+from app.db.write_queue import WriteBatcher
+
+@pytest.mark.asyncio
+async def test_sqlite_engines_apply_pragmas(tmp_path):
+    """Тестирует PRAGMA писателя (WAL) и запрет записи для читателя."""
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pragmas.sqlite'}"
+    writer = create_sqlite_engine(url, pool_size=1, max_overflow=0)
+    reader = create_sqlite_engine(url, read_only=True)
+    try:
+        async with writer.begin() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+            await conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+            await conn.execute(text("INSERT INTO items (id) VALUES (1)"))
+
+        async with reader.connect() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM items"))).scalar() == 1
+            with pytest.raises(OperationalError):
+                await conn.execute(text("INSERT INTO items (id) VALUES (2)"))
+    finally:
+        await writer.dispose()
+        await reader.dispose()
+
+@pytest.mark.asyncio
+async def test_write_batcher_groups_operations(tmp_path):
+    """Тестирует групповой коммит: ошибка одной операции не затрагивает остальные."""
+    url = f"sqlite+aiosqlite:///{tmp_path / 'batch.sqlite'}"
+    writer = create_sqlite_engine(url, pool_size=1, max_overflow=0)
+    batcher = WriteBatcher(writer, max_delay=0.01, max_batch=100)
+    try:
+        async with writer.begin() as conn:
+            await conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+
+        def insert(item_id: int):
+            async def _op(session):
+                await session.execute(text("INSERT INTO items (id) VALUES (:id)"), {"id": item_id})
+                return item_id
+            return _op
+
+        results = await asyncio.gather(
+            *(batcher.submit(insert(item_id)) for item_id in (1, 2, 1, 3)),
+            return_exceptions=True,
+        )
+        assert results[:2] == [1, 2] and results[3] == 3
+        assert isinstance(results[2], IntegrityError)
+        assert batcher.stats()["batches_total"] == 1
+
+        async with writer.connect() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM items"))).scalar() == 3
+    finally:
+        await writer.dispose()
+
+@pytest.mark.asyncio
+async def test_init_db_migrates_string_skill_levels(tmp_path):
+    """Тестирует перевод строковых уровней старой схемы в SkillLevel при создании таблиц."""
+    from app.db.models import SkillLevel
+    from app.db.session import Base
+
+    url = f"sqlite+aiosqlite:///{tmp_path / 'legacy.sqlite'}"
+    engine = create_sqlite_engine(url, pool_size=1, max_overflow=0)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE profile_dance_style_association ("
+                "profile_id INTEGER NOT NULL, dance_style_id INTEGER NOT NULL, "
+                "skill_level VARCHAR, PRIMARY KEY (profile_id, dance_style_id))"
+            ))
+            await conn.execute(text(
+                "INSERT INTO profile_dance_style_association VALUES "
+                "(1, 1, 'Beginner'), (1, 2, 'advanced'), (2, 1, 'Professional'), (2, 2, NULL)"
+            ))
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        # Повторное создание уже переведенной схемы ничего не меняет
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        async with engine.connect() as conn:
+            rows = (await conn.execute(text(
+                "SELECT profile_id, dance_style_id, skill_level, typeof(skill_level) "
+                "FROM profile_dance_style_association ORDER BY profile_id, dance_style_id"
+            ))).all()
+            assert [tuple(row) for row in rows] == [
+                (1, 1, SkillLevel.BEGINNER, "integer"),
+                (1, 2, SkillLevel.ADVANCED, "integer"),
+                (2, 1, SkillLevel.PROFESSIONAL, "integer"),
+                (2, 2, SkillLevel.BEGINNER, "integer"),
+            ]
+            indexes = (await conn.execute(text("PRAGMA index_list(profile_dance_style_association)"))).all()
+            assert "ix_profile_style_level" in {row[1] for row in indexes}
+    finally:
+        await engine.dispose()
+
+# Схема БД до изменений: таблицы и индексы в том виде, в каком их создавал create_all
+PRE_SERIES_SCHEMA = (
+    "CREATE TABLE users (id INTEGER NOT NULL, email VARCHAR NOT NULL, "
+    "hashed_password VARCHAR NOT NULL, is_active BOOLEAN, PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE TABLE dance_styles (id INTEGER NOT NULL, name VARCHAR NOT NULL, "
+    "description TEXT, PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_dance_styles_name ON dance_styles (name)",
+    "CREATE INDEX ix_dance_styles_id ON dance_styles (id)",
+    "CREATE TABLE profiles (id INTEGER NOT NULL, user_id INTEGER NOT NULL, first_name VARCHAR, "
+    "last_name VARCHAR, city VARCHAR, bio TEXT, preferred_contact VARCHAR, created_at DATETIME, "
+    "PRIMARY KEY (id), UNIQUE (user_id), FOREIGN KEY(user_id) REFERENCES users (id))",
+    "CREATE INDEX ix_profiles_id ON profiles (id)",
+    "CREATE INDEX ix_profiles_first_name ON profiles (first_name)",
+    "CREATE INDEX ix_profiles_last_name ON profiles (last_name)",
+    "CREATE INDEX ix_profiles_city ON profiles (city)",
+    "CREATE TABLE profile_dance_style_association (profile_id INTEGER NOT NULL, "
+    "dance_style_id INTEGER NOT NULL, skill_level VARCHAR, PRIMARY KEY (profile_id, dance_style_id), "
+    "FOREIGN KEY(profile_id) REFERENCES profiles (id), "
+    "FOREIGN KEY(dance_style_id) REFERENCES dance_styles (id))",
+    "INSERT INTO users VALUES (1, 'old_one@example.com', 'x', 1), (2, 'old_two@example.com', 'x', 1)",
+    "INSERT INTO dance_styles VALUES (1, 'Legacy Tango', NULL)",
+    "INSERT INTO profiles VALUES "
+    "(1, 1, 'Old', 'One', '  Санкт-Петербург ', NULL, NULL, '2024-01-02 03:04:05.000000'), "
+    "(2, 2, 'Old', 'Two', NULL, NULL, NULL, '2024-02-03 04:05:06.000000')",
+    "INSERT INTO profile_dance_style_association VALUES (1, 1, 'Advanced')",
+)
+
+@pytest.mark.asyncio
+async def test_init_db_migrates_pre_series_profiles(tmp_path):
+    """Тестирует добавление новых столбцов и индексов profiles в БД старой схемы."""
+    from app.db.session import Base
+
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pre_series.sqlite'}"
+    engine = create_sqlite_engine(url, pool_size=1, max_overflow=0)
+    try:
+        async with engine.begin() as conn:
+            for statement in PRE_SERIES_SCHEMA:
+                await conn.execute(text(statement))
+        for _ in range(2): # Повторный запуск на уже обновленной схеме ничего не меняет
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+        async with engine.connect() as conn:
+            rows = (await conn.execute(text("SELECT id, city_key FROM profiles ORDER BY id"))).all()
+            assert [tuple(row) for row in rows] == [(1, "санкт-петербург"), (2, None)]
+            indexes = {row[1] for row in (await conn.execute(text("PRAGMA index_list(profiles)"))).all()}
+            assert {"ix_profiles_city_key", "ix_profiles_created_at", "ix_profiles_updated_at"} <= indexes
+            columns = {row[1]: row[2] for row in (await conn.execute(text("PRAGMA table_info(profiles)"))).all()}
+            assert columns["dance_role"] == "VARCHAR(16)"
+            rows = (await conn.execute(text("SELECT updated_at FROM profiles ORDER BY id"))).all()
+            assert [row[0] for row in rows] == ["2024-01-02 03:04:05.000000", "2024-02-03 04:05:06.000000"]
+    finally:
+        await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_app_starts_on_pre_series_db(tmp_path, monkeypatch):
+    """Тестирует старт приложения (создание таблиц и загрузку индексов) на БД старой схемы."""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+    from sqlalchemy.future import select
+
+    import app.main as main_module
+    from app.db import session as session_module
+    from app.db.models import Profile
+    from app.services.matching_index import MatchingIndex
+    from app.services.percolator import SearchPercolator
+    from app.services.style_catalog import StyleCatalog
+
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pre_series_app.sqlite'}"
+    engine = create_sqlite_engine(url, pool_size=1, max_overflow=0)
+    try:
+        async with engine.begin() as conn:
+            for statement in PRE_SERIES_SCHEMA:
+                await conn.execute(text(statement))
+
+        # Старт на временной БД со своими синглтонами, чтобы не задеть общие
+        index, catalog = MatchingIndex(), StyleCatalog()
+        sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        monkeypatch.setattr(session_module, "async_engine", engine)
+        monkeypatch.setattr(main_module, "read_session_factory", sessions)
+        monkeypatch.setattr(main_module, "matching_index", index)
+        monkeypatch.setattr(main_module, "percolator", SearchPercolator())
+        monkeypatch.setattr(main_module, "style_catalog", catalog)
+        await main_module.on_startup()
+
+        assert len(index) == 2 and len(catalog) == 1
+        assert index.search(city="санкт", style_ids=[1]) == [1]
+        async with sessions() as db:
+            profiles = (await db.execute(select(Profile).order_by(Profile.id))).scalars().all()
+            assert [(profile.latitude, profile.dance_role) for profile in profiles] == [(None, None)] * 2
+    finally:
+        await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_sqlite_writer_and_reader_sessions(tmp_path):
+    """Тестирует движки приложения на файле: очередь записей к писателю, запрет записи читателю."""
+    import sqlite3
+
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    path = tmp_path / "engines.sqlite"
+    url = f"sqlite+aiosqlite:///{path}"
+    writer = create_sqlite_engine(url, pool_size=1, max_overflow=0)
+    reader = create_sqlite_engine(url, read_only=True, pool_size=4, max_overflow=0)
+    write_sessions = async_sessionmaker(bind=writer, class_=AsyncSession, expire_on_commit=False)
+    read_sessions = async_sessionmaker(bind=reader, class_=AsyncSession, expire_on_commit=False)
+    try:
+        async with writer.begin() as conn:
+            await conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER)"))
+            raw = await conn.get_raw_connection()
+            # Неявные транзакции драйвера отключены, BEGIN выдает обработчик движка
+            assert raw.driver_connection.isolation_level is None
+
+        async def write(item_id: int) -> None:
+            async with write_sessions() as session:
+                await session.execute(text("SELECT count(*) FROM items"))
+                await asyncio.sleep(0.005) # Держим транзакцию, пока ждут остальные
+                await session.execute(
+                    text("INSERT INTO items (id, value) VALUES (:id, :id)"), {"id": item_id}
+                )
+                await session.commit()
+
+        # Конкурентные записи ждут единственное соединение, а не "database is locked"
+        await asyncio.gather(*(write(item_id) for item_id in range(20)))
+
+        async with write_sessions() as session:
+            await session.execute(text("SELECT 1"))
+            # BEGIN IMMEDIATE: блокировка записи взята уже на первом чтении транзакции
+            other = sqlite3.connect(path, timeout=0)
+            try:
+                with pytest.raises(sqlite3.OperationalError, match="locked"):
+                    other.execute("BEGIN IMMEDIATE")
+            finally:
+                other.close()
+            # Читатель в WAL не ждет писателя и видит только зафиксированные строки
+            async with read_sessions() as read_session:
+                assert (await read_session.execute(text("SELECT count(*) FROM items"))).scalar() == 20
+            await session.rollback()
+
+        async with read_sessions() as read_session:
+            with pytest.raises(OperationalError, match="readonly|read-only|query_only"):
+                await read_session.execute(text("INSERT INTO items (id, value) VALUES (100, 100)"))
+    finally:
+        await writer.dispose()
+        await reader.dispose()
@@ -0,0 +1,844 @@
+import asyncio
+import datetime
+import itertools
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+
+from app.schemas.availability import AvailabilityInterval
+from app.services.availability import (
+    TOTAL_SLOTS, bytes_to_mask, intervals_to_mask, mask_to_bytes, mask_to_words, overlap_slots
+)
+from app.services.geo import cell_filter, cell_of, cells_within, haversine_km
+from app.services.matching_index import MatchingIndex, matching_index
+from app.services.notifications import notification_hub
+from app.services.percolator import percolator
+from app.services.pairing import pairing_scores, solve_pairing, split_roles
+from app.services import text_search
+from app.services import match_cache as match_cache_module
+from app.services.match_cache import MatchResultCache, match_cache
+from app.services.scoring import top_k
+from tests.conftest import TestingSessionLocal
+
+async def create_dancer(client: AsyncClient, email: str, profile: dict, password: str = "testpassword") -> dict:
+    """Регистрирует пользователя, создает профиль и возвращает заголовки и профиль."""
+    await client.post("/users/", json={"email": email, "password": password})
+    login_response = await client.post("/auth/token", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    style_ids = profile.pop("dance_style_ids", None)
+    response = await client.put("/profiles/me", json=profile, headers=headers)
+    if style_ids is not None:
+        response = await client.put("/profiles/me", json={"dance_style_ids": style_ids}, headers=headers)
+    return {"headers": headers, "profile": response.json()}
+
+async def create_style(client: AsyncClient, name: str) -> int:
+    response = await client.post("/styles/", json={"name": name})
+    return response.json()["id"]
+
+@pytest.mark.asyncio
+async def test_find_partners_by_city_and_style(client: AsyncClient):
+    """Тестирует поиск по подстроке города и стилю, исключая свой профиль."""
+    tango_id = await create_style(client, "Matching Tango")
+    waltz_id = await create_style(client, "Matching Waltz")
+
+    me = await create_dancer(
+        client, "matcher_me@example.com",
+        {"city": "Matchville", "dance_style_ids": [tango_id]}
+    )
+    older = await create_dancer(
+        client, "matcher_older@example.com",
+        {"city": "Matchville", "dance_style_ids": [tango_id, waltz_id]}
+    )
+    newer = await create_dancer(
+        client, "matcher_newer@example.com",
+        {"city": "  MATCHVILLE ", "dance_style_ids": [tango_id]}
+    )
+    await create_dancer(
+        client, "matcher_waltz@example.com",
+        {"city": "Matchville", "dance_style_ids": [waltz_id]}
+    )
+    await create_dancer(
+        client, "matcher_far@example.com",
+        {"city": "Elsewhere", "dance_style_ids": [tango_id]}
+    )
+
+    response = await client.post(
+        "/matching/find-partners",
+        json={"city": "matchv", "dance_style_ids": [tango_id]},
+        headers=me["headers"],
+    )
+    assert response.status_code == status.HTTP_200_OK
+    found_ids = [profile["id"] for profile in response.json()]
+    # Новые профили идут первыми, свой профиль исключен
+    assert found_ids == [newer["profile"]["id"], older["profile"]["id"]]
+
+@pytest.mark.asyncio
+async def test_find_partners_sees_profile_updates(client: AsyncClient):
+    """Тестирует, что изменения профиля сразу видны в поиске."""
+    style_id = await create_style(client, "Matching Update Style")
+    me = await create_dancer(client, "matcher_upd_me@example.com", {"city": "Updateton"})
+    other = await create_dancer(client, "matcher_upd_other@example.com", {"city": "Updateton"})
+    criteria = {"city": "Updateton", "dance_style_ids": [style_id]}
+
+    response = await client.post("/matching/find-partners", json=criteria, headers=me["headers"])
+    assert response.json() == []
+
+    await client.put("/profiles/me", json={"dance_style_ids": [style_id]}, headers=other["headers"])
+    response = await client.post("/matching/find-partners", json=criteria, headers=me["headers"])
+    assert [profile["id"] for profile in response.json()] == [other["profile"]["id"]]
+
+    await client.put("/profiles/me", json={"city": "Movedtown"}, headers=other["headers"])
+    response = await client.post("/matching/find-partners", json=criteria, headers=me["headers"])
+    assert response.json() == []
+
+@pytest.mark.asyncio
+async def test_find_partners_unauthorized(client: AsyncClient):
+    """Тестирует доступ к поиску без авторизации."""
+    response = await client.post("/matching/find-partners", json={})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.asyncio
+async def test_find_partners_page_cursor(client: AsyncClient):
+    """Тестирует keyset-пагинацию: страницы не пересекаются и идут от новых к старым."""
+    style_id = await create_style(client, "Matching Page Style")
+    me = await create_dancer(client, "pager_me@example.com", {"city": "Pagetown"})
+    created = []
+    for number in range(5):
+        dancer = await create_dancer(
+            client, f"pager_{number}@example.com",
+            {"city": "Pagetown", "dance_style_ids": [style_id]}
+        )
+        created.append(dancer["profile"]["id"])
+
+    criteria = {"city": "Pagetown", "dance_style_ids": [style_id], "limit": 2}
+    seen = []
+    cursor = None
+    while True:
+        response = await client.post(
+            "/matching/find-partners/page",
+            json={**criteria, "cursor": cursor},
+            headers=me["headers"],
+        )
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        assert len(page["items"]) <= 2
+        seen.extend(profile["id"] for profile in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == list(reversed(created))
+
+@pytest.mark.asyncio
+async def test_find_partners_page_invalid_cursor(client: AsyncClient):
+    """Тестирует ответ на поврежденный курсор."""
+    me = await create_dancer(client, "pager_bad@example.com", {"city": "Pagetown"})
+    response = await client.post(
+        "/matching/find-partners/page",
+        json={"cursor": "not-a-cursor"},
+        headers=me["headers"],
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.asyncio
+async def test_ranked_partners(client: AsyncClient):
+    """Тестирует ранжирование по пересечению стилей, уровням и городу."""
+    style_a = await create_style(client, "Ranked Style A")
+    style_b = await create_style(client, "Ranked Style B")
+    me = await create_dancer(
+        client, "ranked_me@example.com",
+        {"city": "Rankburg", "dance_style_ids": [style_a, style_b]}
+    )
+    partial = await create_dancer(
+        client, "ranked_partial@example.com",
+        {"city": "Otherburg", "dance_style_ids": [style_a]}
+    )
+    best = await create_dancer(
+        client, "ranked_best@example.com",
+        {"city": "Rankburg", "dance_style_ids": [style_a, style_b]}
+    )
+
+    response = await client.post(
+        "/matching/ranked",
+        json={"dance_style_ids": [style_a, style_b], "top_k": 5},
+        headers=me["headers"],
+    )
+    assert response.status_code == status.HTTP_200_OK
+    ranked = response.json()
+    assert [item["profile"]["id"] for item in ranked] == [
+        best["profile"]["id"], partial["profile"]["id"]
+    ]
+    assert ranked[0]["score"] == pytest.approx(1.0)
+    assert ranked[0]["score"] > ranked[1]["score"]
+
+    # Все профили созданы с уровнем по умолчанию (Beginner)
+    response = await client.post(
+        "/matching/ranked",
+        json={"dance_style_ids": [style_a], "min_skill_level": "Advanced"},
+        headers=me["headers"],
+    )
+    assert response.json() == []
+
+    response = await client.post(
+        "/matching/ranked",
+        json={"min_skill_level": "Grandmaster"},
+        headers=me["headers"],
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+@pytest.mark.asyncio
+async def test_find_partners_min_skill_level(client: AsyncClient):
+    """Тестирует установку уровней по стилям и фильтр по минимальному уровню."""
+    style_id = await create_style(client, "Level Filter Style")
+    me = await create_dancer(client, "level_me@example.com", {"city": "Levelton"})
+    beginner = await create_dancer(
+        client, "level_beginner@example.com",
+        {"city": "Levelton", "dance_style_ids": [style_id]}
+    )
+    advanced = await create_dancer(client, "level_advanced@example.com", {"city": "Levelton"})
+    response = await client.put(
+        "/profiles/me",
+        json={"dance_styles": [{"dance_style_id": style_id, "skill_level": "advanced"}]},
+        headers=advanced["headers"],
+    )
+    assert [style["id"] for style in response.json()["dance_styles"]] == [style_id]
+
+    for criteria, expected in (
+        ({}, [advanced, beginner]),
+        ({"min_skill_level": "Intermediate"}, [advanced]),
+        ({"min_skill_level": 4}, []),
+    ):
+        criteria = {"city": "Levelton", "dance_style_ids": [style_id], **criteria}
+        expected_ids = [dancer["profile"]["id"] for dancer in expected]
+
+        response = await client.post("/matching/find-partners", json=criteria, headers=me["headers"])
+        assert [profile["id"] for profile in response.json()] == expected_ids
+
+        response = await client.post("/matching/find-partners/page", json=criteria, headers=me["headers"])
+        assert [profile["id"] for profile in response.json()["items"]] == expected_ids
+
+def test_top_k_selects_best_scores():
+    """Тестирует выбор k лучших без полной сортировки и порядок при равенстве."""
+    scores = np.array([0.1, 0.9, 0.5, 0.9, 0.3])
+    ids = np.array([10, 11, 12, 13, 14])
+    assert ids[top_k(scores, ids, 3)].tolist() == [13, 11, 12]
+    assert len(top_k(scores, ids, 10)) == 5
+    # Равные оценки на границе k: выбираются большие tie_breaker, а не случайные
+    assert top_k(np.ones(8), np.arange(8), 2).tolist() == [7, 6]
+    assert top_k(np.array([2.0, 1.0, 1.0, 1.0]), np.array([0, 5, 9, 7]), 2).tolist() == [0, 2]
+
+@pytest.mark.asyncio
+async def test_find_partners_cache_shared_between_users(client: AsyncClient):
+    """Тестирует, что кэшированный результат не содержит собственный профиль читателя."""
+    style_id = await create_style(client, "Cached Style")
+    first = await create_dancer(
+        client, "cache_first@example.com", {"city": "Cachetown", "dance_style_ids": [style_id]}
+    )
+    second = await create_dancer(
+        client, "cache_second@example.com", {"city": "Cachetown", "dance_style_ids": [style_id]}
+    )
+    criteria = {"city": "Cachetown", "dance_style_ids": [style_id]}
+
+    hits_before = match_cache.hits
+    response = await client.post("/matching/find-partners", json=criteria, headers=first["headers"])
+    assert [profile["id"] for profile in response.json()] == [second["profile"]["id"]]
+    # Тот же запрос в другом регистре и от другого пользователя - попадание в кэш
+    response = await client.post(
+        "/matching/find-partners", json={**criteria, "city": " CACHETOWN"}, headers=second["headers"]
+    )
+    assert [profile["id"] for profile in response.json()] == [first["profile"]["id"]]
+    assert match_cache.hits == hits_before + 1
+
+def test_match_cache_invalidates_only_affected_entries(monkeypatch):
+    """Тестирует точную инвалидацию по городам и стилям и вытеснение по памяти."""
+    cache = MatchResultCache(max_entries=10, max_bytes=10_000)
+    town_tango = cache.make_key("Town", [1], None)
+    town_waltz = cache.make_key("Town", [2], None)
+    city_tango = cache.make_key("City", [1], None)
+    for key in (town_tango, town_waltz, city_tango):
+        cache.set(key, np.array([1, 2, 3]), generation=0)
+
+    # Профиль в Town сменил стиль 1 на 3: затронут только поиск Town + стиль 1
+    cache.record_write(["town"], [1, 3])
+    assert cache.get(town_tango, generation=0) is None
+    assert cache.get(town_waltz, generation=0).tolist() == [1, 2, 3]
+    assert cache.get(city_tango, generation=0).tolist() == [1, 2, 3]
+    # Перестройка индекса сбрасывает все записи
+    assert cache.get(town_waltz, generation=1) is None
+
+    # Поиск по префиксу города устаревает от записи в любом городе с этим префиксом
+    prefix_tango = cache.make_key("Tow", [1], None)
+    cache.set(prefix_tango, np.array([1]), generation=0)
+    cache.record_write(["city"], [1])
+    assert cache.get(prefix_tango, generation=0).tolist() == [1]
+    cache.record_write(["townsville"], [1])
+    assert cache.get(prefix_tango, generation=0) is None
+
+    # Счетчики не новее самой старой записи удаляются, сверх предела - вместе с кэшем
+    monkeypatch.setattr(match_cache_module, "MAX_VERSION_KEYS", 8)
+    pruned = MatchResultCache(max_entries=10, max_bytes=10_000)
+    pruned.record_write(["abcdefgh"], [1])
+    assert len(pruned._city_versions) + len(pruned._style_versions) == 0
+    pruned.set(pruned.make_key("Ab", [1], None), np.array([1]), generation=0)
+    pruned.record_write(["abcdefgh"], [1])
+    assert len(pruned) == 0 and len(pruned._city_versions) == 0
+
+    small = MatchResultCache(max_entries=10, max_bytes=2 * 8 * 100)
+    for number in range(3):
+        small.set(small.make_key(None, [number], None), np.arange(100), generation=0)
+    assert len(small) == 2 and small.evictions == 1
+
+@pytest.mark.asyncio
+async def test_find_partners_fast_path_matches_profile_schema(client: AsyncClient):
+    """Тестирует, что словари из строк БД совпадают с сериализацией ProfileRead."""
+    style_id = await create_style(client, "Serialized Style")
+    me = await create_dancer(client, "serial_me@example.com", {"city": "Serialton"})
+    other = await create_dancer(
+        client, "serial_other@example.com",
+        {"city": "Serialton", "first_name": "Ann", "bio": "Tango", "dance_style_ids": [style_id]}
+    )
+
+    response = await client.post(
+        "/matching/find-partners",
+        json={"city": "Serialton", "dance_style_ids": [style_id]},
+        headers=me["headers"],
+    )
+    assert response.headers["content-type"] == "application/json"
+    profile_response = await client.get(f"/profiles/{other['profile']['id']}")
+    assert response.json() == [profile_response.json()]
+
+@pytest.mark.asyncio
+async def test_ranked_partners_by_text_beyond_top_matches(client: AsyncClient):
+    """Тестирует, что ранжированный поиск видит совпадения за пределами MAX_TEXT_MATCHES лучших."""
+    from sqlalchemy import delete, insert
+
+    from app.db.models import Profile, User, profile_dance_style_association
+
+    style_id = await create_style(client, "Ranked Text Style")
+    me = await create_dancer(client, "ranked_text_me@example.com", {"city": "Rankville"})
+    # Единственный кандидат со стилем: длинное описание - самый низкий BM25 среди совпадений
+    target = await create_dancer(
+        client, "ranked_text_target@example.com",
+        {"bio": "zumbathon " + "filler " * 60, "dance_style_ids": [style_id]},
+    )
+    count = text_search.MAX_TEXT_MATCHES + 200
+    emails = [f"ranked_text_{number}@example.com" for number in range(count)]
+    async with TestingSessionLocal() as db:
+        user_ids = (await db.execute(
+            insert(User).returning(User.id),
+            [{"email": email, "hashed_password": "x", "is_active": True} for email in emails],
+        )).scalars().all()
+        await db.execute(insert(Profile), [
+            {"user_id": user_id, "bio": "zumbathon", "created_at": datetime.datetime(2020, 1, 1),
+             "updated_at": datetime.datetime(2020, 1, 1)}
+            for user_id in user_ids
+        ])
+        await db.commit()
+        await matching_index.load(db)
+    try:
+        response = await client.post(
+            "/matching/ranked",
+            json={"dance_style_ids": [style_id], "text": "zumbathon", "top_k": 5},
+            headers=me["headers"],
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["profile"]["id"] for item in response.json()] == [target["profile"]["id"]]
+    finally:
+        async with TestingSessionLocal() as db:
+            await db.execute(delete(Profile).where(Profile.user_id.in_(user_ids)))
+            await db.execute(delete(User).where(User.id.in_(user_ids)))
+            await db.commit()
+            await matching_index.load(db)
+
+@pytest.mark.asyncio
+async def test_find_partners_by_text(client: AsyncClient, monkeypatch):
+    """Тестирует полнотекстовый критерий: ранжирование BM25 и сочетание со стилем."""
+    style_id = await create_style(client, "Text Search Style")
+    me = await create_dancer(client, "text_me@example.com", {"city": "Textville"})
+    in_bio = await create_dancer(
+        client, "text_bio@example.com",
+        {"city": "Textville", "bio": "Looking for a partner for milonga nights",
+         "dance_style_ids": [style_id]}
+    )
+    in_name = await create_dancer(
+        client, "text_name@example.com",
+        {"city": "Textville", "first_name": "Milonguero", "dance_style_ids": [style_id]}
+    )
+    await create_dancer(
+        client, "text_other_style@example.com",
+        {"city": "Textville", "bio": "Milonga every week"}
+    )
+
+    criteria = {"text": "milong", "dance_style_ids": [style_id]}
+    response = await client.post("/matching/find-partners", json=criteria, headers=me["headers"])
+    # Совпадение в имени весит больше, чем в описании
+    assert [profile["id"] for profile in response.json()] == [
+        in_name["profile"]["id"], in_bio["profile"]["id"]
+    ]
+    # Выдача ограничена самыми релевантными совпадениями
+    monkeypatch.setattr(text_search, "MAX_TEXT_MATCHES", 1)
+    response = await client.post("/matching/find-partners", json=criteria, headers=me["headers"])
+    assert [profile["id"] for profile in response.json()] == [in_name["profile"]["id"]]
+    monkeypatch.undo()
+
+    response = await client.post("/matching/find-partners/page", json=criteria, headers=me["headers"])
+    assert {profile["id"] for profile in response.json()["items"]} == {
+        in_name["profile"]["id"], in_bio["profile"]["id"]
+    }
+
+    # Изменение описания сразу отражается в полнотекстовом индексе
+    await client.put("/profiles/me", json={"bio": "Salsa only"}, headers=in_bio["headers"])
+    response = await client.post(
+        "/matching/find-partners", json={"text": "milonga OR \"nights"}, headers=me["headers"]
+    )
+    assert in_bio["profile"]["id"] not in [profile["id"] for profile in response.json()]
+
+@pytest.mark.asyncio
+async def test_city_autocomplete_and_prefix_search(client: AsyncClient):
+    """Тестирует нормализацию городов, поиск по префиксу и подсказки с числом профилей."""
+    me = await create_dancer(client, "city_me@example.com", {"city": "Elsewhere"})
+    first = await create_dancer(client, "city_first@example.com", {"city": "Королёв"})
+    second = await create_dancer(client, "city_second@example.com", {"city": "  КОРОЛЕВ "})
+    third = await create_dancer(client, "city_third@example.com", {"city": "Кореновск"})
+
+    response = await client.get("/matching/cities", params={"prefix": "кор"})
+    assert response.json() == [
+        {"city": "Королёв", "profiles": 2},
+        {"city": "Кореновск", "profiles": 1},
+    ]
+    response = await client.get("/matching/cities", params={"prefix": "КОРОЛЁ", "limit": 1})
+    assert response.json() == [{"city": "Королёв", "profiles": 2}]
+
+    # Переезд обновляет подсказки инкрементально
+    await client.put("/profiles/me", json={"city": "Elsewhere"}, headers=third["headers"])
+    response = await client.get("/matching/cities", params={"prefix": "кор"})
+    assert [suggestion["city"] for suggestion in response.json()] == ["Королёв"]
+
+    # Подстрока не в начале названия больше не совпадает
+    for path in ("/matching/find-partners", "/matching/find-partners/page"):
+        response = await client.post(path, json={"city": "королев"}, headers=me["headers"])
+        profiles = response.json() if isinstance(response.json(), list) else response.json()["items"]
+        assert [profile["id"] for profile in profiles] == [
+            second["profile"]["id"], first["profile"]["id"]
+        ]
+        response = await client.post(path, json={"city": "ролев"}, headers=me["headers"])
+        profiles = response.json() if isinstance(response.json(), list) else response.json()["items"]
+        assert profiles == []
+
+@pytest.mark.asyncio
+async def test_find_partners_within_radius(client: AsyncClient):
+    """Тестирует поиск по радиусу: соседний город найден, порядок - по расстоянию."""
+    style_id = await create_style(client, "Radius Style")
+    me = await create_dancer(
+        client, "radius_me@example.com",
+        {"city": "Moscow", "latitude": 55.7558, "longitude": 37.6173}
+    )
+    near = await create_dancer(
+        client, "radius_near@example.com",
+        {"city": "Khimki", "latitude": 55.8970, "longitude": 37.4297, "dance_style_ids": [style_id]}
+    )
+    nearest = await create_dancer(
+        client, "radius_nearest@example.com",
+        {"city": "Moscow", "latitude": 55.7600, "longitude": 37.6200, "dance_style_ids": [style_id]}
+    )
+    await create_dancer(
+        client, "radius_far@example.com",
+        {"city": "Tver", "latitude": 56.8587, "longitude": 35.9176, "dance_style_ids": [style_id]}
+    )
+    await create_dancer(client, "radius_nowhere@example.com", {"dance_style_ids": [style_id]})
+
+    criteria = {"dance_style_ids": [style_id], "radius_km": 50}
+    response = await client.post("/matching/find-partners", json=criteria, headers=me["headers"])
+    assert [profile["id"] for profile in response.json()] == [
+        nearest["profile"]["id"], near["profile"]["id"]
+    ]
+    response = await client.post("/matching/find-partners/page", json=criteria, headers=me["headers"])
+    assert {profile["id"] for profile in response.json()["items"]} == {
+        nearest["profile"]["id"], near["profile"]["id"]
+    }
+
+    response = await client.post(
+        "/matching/find-partners", json={**criteria, "radius_km": 200}, headers=me["headers"]
+    )
+    assert len(response.json()) == 3
+
+    response = await client.put("/profiles/me", json={"latitude": 10.0}, headers=me["headers"])
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    other = await create_dancer(client, "radius_unlocated@example.com", {"city": "Moscow"})
+    response = await client.post("/matching/find-partners", json=criteria, headers=other["headers"])
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_geo_cells_cover_radius_across_antimeridian():
+    """Тестирует отбор ячеек сетки у линии перемены дат и haversine."""
+    cells = set(cells_within(0.0, 179.9, 50))
+    assert cell_of(0.1, -179.9) in cells
+    assert cell_of(0.0, 179.9) in cells
+    distance = haversine_km(0.0, 179.9, np.array([0.0]), np.array([-179.9]))
+    assert distance[0] == pytest.approx(22.24, abs=0.01)
+
+    # Проверка занятых ячеек совпадает с перечислением ячеек круга
+    probe = [cell_of(lat, lon) for lat in np.arange(-89.5, 90, 0.7) for lon in np.arange(-179.9, 180, 0.7)]
+    for center in ((0.0, 179.9, 50), (55.75, 37.62, 120), (89.9, 10.0, 30), (-60.0, -170.0, 400)):
+        contains = cell_filter(*center)
+        assert {cell for cell in probe if contains(cell)} == set(cells_within(*center)) & set(probe)
+
+def test_index_newest_window_walks_order_in_blocks():
+    """Тестирует окна индекса: порядок (created_at, id) по убыванию, фильтры и продолжение."""
+    index = MatchingIndex()
+    base = datetime.datetime(2024, 1, 1)
+    index._bulk_add([
+        index._make_record(profile_id, profile_id, "City", base + datetime.timedelta(minutes=profile_id % 7), {})
+        for profile_id in range(1, 1001)
+    ])
+    expected = sorted(
+        (profile_id for profile_id in range(1, 1001) if profile_id % 3 and profile_id != 500),
+        key=lambda profile_id: (profile_id % 7, profile_id),
+        reverse=True,
+    )
+    bitmap = index.filter_bitmap(exclude_user_id=500)
+
+    seen, position = [], None
+    while True:
+        window, position = index.newest_window(bitmap, position, 100, lambda ids: ids % 3 != 0)
+        assert len(window) <= 100
+        seen.extend(window)
+        if position is None:
+            break
+    assert seen == expected
+
+    index.remove(expected[0])
+    window, _ = index.newest_window(index.filter_bitmap(), None, 2)
+    assert expected[0] not in window
+
+@pytest.mark.asyncio
+async def test_find_partners_by_availability_overlap(client: AsyncClient):
+    """Тестирует недельное расписание: фильтр по общим часам и порядок по пересечению."""
+    style_id = await create_style(client, "Overlap Style")
+    me = await create_dancer(client, "overlap_me@example.com", {"dance_style_ids": [style_id]})
+    partial = await create_dancer(client, "overlap_partial@example.com", {"dance_style_ids": [style_id]})
+    full = await create_dancer(client, "overlap_full@example.com", {"dance_style_ids": [style_id]})
+    other_day = await create_dancer(client, "overlap_other@example.com", {"dance_style_ids": [style_id]})
+
+    schedules = [
+        (me, [{"day": 0, "start": "18:00", "end": "21:00"}, {"day": 0, "start": "20:00", "end": "22:00"}]),
+        (partial, [{"day": 0, "start": "19:30", "end": "20:30"}]),
+        (full, [{"day": 0, "start": "17:00", "end": "23:00"}]),
+        (other_day, [{"day": 3, "start": "18:00", "end": "22:00"}]),
+    ]
+    for dancer, intervals in schedules:
+        response = await client.put(
+            "/profiles/me/availability", json={"intervals": intervals}, headers=dancer["headers"]
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    response = await client.get("/profiles/me/availability", headers=me["headers"])
+    assert response.json() == {
+        "intervals": [{"day": 0, "start": "18:00", "end": "22:00"}], "hours_per_week": 4.0
+    }
+
+    criteria = {"dance_style_ids": [style_id], "min_overlap_hours": 1}
+    response = await client.post("/matching/find-partners", json=criteria, headers=me["headers"])
+    assert [profile["id"] for profile in response.json()] == [
+        full["profile"]["id"], partial["profile"]["id"]
+    ]
+    response = await client.post(
+        "/matching/find-partners/page", json={**criteria, "min_overlap_hours": 2}, headers=me["headers"]
+    )
+    assert [profile["id"] for profile in response.json()["items"]] == [full["profile"]["id"]]
+    # Страницы по одному профилю: окна из индекса, порядок keyset (новые первыми)
+    seen, cursor = [], None
+    while True:
+        response = await client.post(
+            "/matching/find-partners/page", json={**criteria, "limit": 1, "cursor": cursor}, headers=me["headers"]
+        )
+        seen.extend(profile["id"] for profile in response.json()["items"])
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [full["profile"]["id"], partial["profile"]["id"]]
+    response = await client.post("/matching/ranked", json=criteria, headers=me["headers"])
+    assert {item["profile"]["id"] for item in response.json()} == {
+        full["profile"]["id"], partial["profile"]["id"]
+    }
+
+    response = await client.put(
+        "/profiles/me/availability",
+        json={"intervals": [{"day": 1, "start": "20:00", "end": "19:00"}]},
+        headers=me["headers"],
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    nobody = await create_dancer(client, "overlap_nobody@example.com", {})
+    response = await client.post("/matching/find-partners", json=criteria, headers=nobody["headers"])
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_availability_overlap_counts_common_slots():
+    """Тестирует упаковку маски в слова uint64 и popcount пересечения."""
+    first = intervals_to_mask([AvailabilityInterval(day=6, start="23:00", end="24:00")])
+    second = intervals_to_mask([AvailabilityInterval(day=6, start="23:30", end="24:00")])
+    assert first.bit_length() == TOTAL_SLOTS
+    assert bytes_to_mask(mask_to_bytes(first)) == first
+    words = np.stack([mask_to_words(first), mask_to_words(second), mask_to_words(0)])
+    assert overlap_slots(words, mask_to_words(first)).tolist() == [2, 1, 0]
+
+@pytest.mark.asyncio
+async def test_pairing_job_pairs_participants(client: AsyncClient):
+    """Тестирует подбор пар: задача в пуле процессов, опрос результата, роли."""
+    salsa = await create_style(client, "Pairing Salsa")
+    tango = await create_style(client, "Pairing Tango")
+    leader = await create_dancer(
+        client, "pair_leader@example.com", {"dance_role": "leader", "dance_style_ids": [salsa]}
+    )
+    follower = await create_dancer(
+        client, "pair_follower@example.com", {"dance_role": "follower", "dance_style_ids": [salsa]}
+    )
+    tango_leader = await create_dancer(
+        client, "pair_tango_leader@example.com", {"dance_role": "leader", "dance_style_ids": [tango]}
+    )
+    flexible = await create_dancer(client, "pair_flexible@example.com", {"dance_style_ids": [tango]})
+    assert leader["profile"]["dance_role"] == "leader"
+
+    profile_ids = [
+        dancer["profile"]["id"] for dancer in (leader, follower, tango_leader, flexible)
+    ]
+    response = await client.post(
+        "/matching/pairings", json={"profile_ids": profile_ids}, headers=leader["headers"]
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["job_id"]
+
+    for _ in range(600):
+        response = await client.get(f"/matching/pairings/{job_id}", headers=leader["headers"])
+        if response.json()["status"] != "running":
+            break
+        await asyncio.sleep(0.1)
+    job = response.json()
+    assert job["status"] == "done", job
+    # Профиль без роли встает ведомым: ведущих больше
+    assert {(pair["leader_id"], pair["follower_id"]) for pair in job["pairs"]} == {
+        (leader["profile"]["id"], follower["profile"]["id"]),
+        (tango_leader["profile"]["id"], flexible["profile"]["id"]),
+    }
+    assert job["unpaired_ids"] == []
+
+    response = await client.post(
+        "/matching/pairings", json={"profile_ids": profile_ids[:1] * 2}, headers=leader["headers"]
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = await client.get("/matching/pairings/unknown", headers=leader["headers"])
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_solve_pairing_maximizes_total_score():
+    """Тестирует оптимальность назначения полным перебором на малом наборе."""
+    rng = np.random.default_rng(7)
+    leader_levels = rng.integers(0, 5, size=(5, 4)).astype(np.int8)
+    follower_levels = rng.integers(0, 5, size=(5, 4)).astype(np.int8)
+    leader_availability = rng.integers(0, 2**63, size=(5, 6), dtype=np.uint64)
+    follower_availability = rng.integers(0, 2**63, size=(5, 6), dtype=np.uint64)
+    arrays = (leader_levels, follower_levels, leader_availability, follower_availability)
+
+    scores = pairing_scores(*arrays)
+    best = max(
+        sum(scores[row, column] for row, column in enumerate(permutation))
+        for permutation in itertools.permutations(range(5))
+    )
+    rows, columns, pair_scores = solve_pairing(*arrays)
+    assert pair_scores.sum() == pytest.approx(best)
+    assert (pair_scores > 0).all() and len(set(columns.tolist())) == len(columns)
+
+    assert split_roles([1, 2, 3, 4], {1: "leader", 2: "leader", 3: None}) == ([1, 2], [3, 4])
+
+@pytest.mark.asyncio
+async def test_like_mutual_match_and_search_exclusion(client: AsyncClient):
+    """Тестирует лайки: взаимное совпадение и исключение лайкнутых из поиска."""
+    style_id = await create_style(client, "Like Style")
+    first = await create_dancer(client, "like_first@example.com", {"dance_style_ids": [style_id]})
+    second = await create_dancer(client, "like_second@example.com", {"dance_style_ids": [style_id]})
+    third = await create_dancer(client, "like_third@example.com", {"dance_style_ids": [style_id]})
+    second_id, third_id = second["profile"]["id"], third["profile"]["id"]
+
+    response = await client.post(f"/matching/like/{second_id}", headers=first["headers"])
+    assert response.json() == {"profile_id": second_id, "created": True, "mutual": False}
+    response = await client.post(f"/matching/like/{second_id}", headers=first["headers"])
+    assert response.json()["created"] is False
+
+    response = await client.post(f"/matching/like/{first['profile']['id']}", headers=second["headers"])
+    assert response.json()["mutual"] is True
+    response = await client.get("/matching/matches", headers=first["headers"])
+    assert [profile["id"] for profile in response.json()] == [second_id]
+
+    criteria = {"dance_style_ids": [style_id]}
+    response = await client.post("/matching/find-partners", json=criteria, headers=first["headers"])
+    assert [profile["id"] for profile in response.json()] == [third_id]
+    response = await client.post("/matching/find-partners/page", json=criteria, headers=first["headers"])
+    assert [profile["id"] for profile in response.json()["items"]] == [third_id]
+    response = await client.post("/matching/ranked", json=criteria, headers=first["headers"])
+    assert [item["profile"]["id"] for item in response.json()] == [third_id]
+    response = await client.post(
+        "/matching/find-partners", json={**criteria, "include_liked": True}, headers=first["headers"]
+    )
+    assert {profile["id"] for profile in response.json()} == {second_id, third_id}
+
+    response = await client.post(f"/matching/like/{first['profile']['id']}", headers=first["headers"])
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = await client.post("/matching/like/999999", headers=first["headers"])
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.asyncio
+async def test_saved_search_returns_only_new_changes(client: AsyncClient):
+    """Тестирует сохраненный поиск: проверка возвращает только изменения после прошлой."""
+    style_id = await create_style(client, "Saved Style")
+    me = await create_dancer(client, "saved_me@example.com", {})
+    await create_dancer(client, "saved_old@example.com", {"city": "Saved City", "dance_style_ids": [style_id]})
+
+    response = await client.post(
+        "/saved-searches/",
+        json={"name": "Local", "criteria": {"city": "saved city", "dance_style_ids": [style_id]}},
+        headers=me["headers"],
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    search_id = response.json()["id"]
+    assert response.json()["criteria"]["dance_style_ids"] == [style_id]
+
+    check_url = f"/saved-searches/{search_id}/check"
+    response = await client.post(check_url, headers=me["headers"])
+    assert response.json() == {"items": [], "has_more": False}
+
+    new = await create_dancer(client, "saved_new@example.com", {"city": "Saved City", "dance_style_ids": [style_id]})
+    await create_dancer(client, "saved_other@example.com", {"city": "Elsewhere", "dance_style_ids": [style_id]})
+    moved = await create_dancer(client, "saved_moved@example.com", {"city": "Elsewhere", "dance_style_ids": [style_id]})
+    await client.put("/profiles/me", json={"city": "Saved City"}, headers=moved["headers"])
+
+    response = await client.post(check_url, params={"limit": 1}, headers=me["headers"])
+    assert [profile["id"] for profile in response.json()["items"]] == [new["profile"]["id"]]
+    assert response.json()["has_more"] is True
+    response = await client.post(check_url, headers=me["headers"])
+    assert [profile["id"] for profile in response.json()["items"]] == [moved["profile"]["id"]]
+    response = await client.post(check_url, headers=me["headers"])
+    assert response.json()["items"] == []
+
+    response = await client.get("/saved-searches/", headers=me["headers"])
+    assert response.json()[0]["last_checked_at"] is not None
+    response = await client.delete(f"/saved-searches/{search_id}", headers=me["headers"])
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = await client.post(check_url, headers=me["headers"])
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.asyncio
+async def test_profile_write_notifies_matching_saved_searches(client: AsyncClient):
+    """Тестирует перколятор: запись профиля уведомляет только владельцев подходящих поисков."""
+    style_id = await create_style(client, "Notify Style")
+    other_style_id = await create_style(client, "Notify Other Style")
+    watcher = await create_dancer(client, "notify_watcher@example.com", {})
+    bystander = await create_dancer(client, "notify_bystander@example.com", {})
+    async with TestingSessionLocal() as session:
+        # Уведомления сверяют профиль с записью индекса: индекс должен быть построен
+        await matching_index.ensure_loaded(session)
+        await percolator.ensure_loaded(session)
+
+    await client.post(
+        "/saved-searches/",
+        json={"name": "Notify", "criteria": {"city": "notify", "dance_style_ids": [style_id]}},
+        headers=watcher["headers"],
+    )
+    await client.post(
+        "/saved-searches/",
+        json={"name": "Other", "criteria": {"dance_style_ids": [other_style_id]}},
+        headers=bystander["headers"],
+    )
+    watcher_queue = notification_hub.subscribe(watcher["profile"]["user_id"])
+    bystander_queue = notification_hub.subscribe(bystander["profile"]["user_id"])
+    checked_before = percolator.candidates_checked
+    try:
+        dancer = await create_dancer(client, "notify_dancer@example.com", {"city": "Notify Town"})
+        assert watcher_queue.empty()
+        await client.put("/profiles/me", json={"dance_style_ids": [style_id]}, headers=dancer["headers"])
+
+        message = watcher_queue.get_nowait()
+        assert message["search_name"] == "Notify"
+        assert message["profile"]["id"] == dancer["profile"]["id"]
+        assert bystander_queue.empty()
+        # Поиск с другим стилем не проверялся вовсе
+        assert percolator.candidates_checked - checked_before == 1
+    finally:
+        notification_hub.unsubscribe(watcher["profile"]["user_id"], watcher_queue)
+        notification_hub.unsubscribe(bystander["profile"]["user_id"], bystander_queue)
+
+
+@pytest.mark.asyncio
+async def test_availability_write_notifies_overlap_searches(client: AsyncClient):
+    """Тестирует уведомление по поиску с min_overlap_hours после смены расписания."""
+    style_id = await create_style(client, "Notify Overlap Style")
+    evening = [{"day": 2, "start": "18:00", "end": "21:00"}]
+    watcher = await create_dancer(client, "overlap_watcher@example.com", {"dance_style_ids": [style_id]})
+    await client.put("/profiles/me/availability", json={"intervals": evening}, headers=watcher["headers"])
+    dancer = await create_dancer(client, "overlap_dancer@example.com", {"dance_style_ids": [style_id]})
+    async with TestingSessionLocal() as session:
+        # Уведомления сверяют профиль с записью индекса: индекс должен быть построен
+        await matching_index.ensure_loaded(session)
+        await percolator.ensure_loaded(session)
+    await client.post(
+        "/saved-searches/",
+        json={"name": "Evenings", "criteria": {"dance_style_ids": [style_id], "min_overlap_hours": 2}},
+        headers=watcher["headers"],
+    )
+    watcher_queue = notification_hub.subscribe(watcher["profile"]["user_id"])
+    try:
+        await client.put("/profiles/me/availability", json={"intervals": evening}, headers=dancer["headers"])
+        message = watcher_queue.get_nowait()
+        assert message["search_name"] == "Evenings"
+        assert message["profile"]["id"] == dancer["profile"]["id"]
+    finally:
+        notification_hub.unsubscribe(watcher["profile"]["user_id"], watcher_queue)
+
+@pytest.mark.asyncio
+async def test_find_partners_streams_ndjson(client: AsyncClient, monkeypatch):
+    """Тестирует потоковый NDJSON: те же профили и порядок, что и в JSON, ошибки - до начала потока."""
+    import orjson
+    from app.db.session import get_read_session_factory
+    from app.main import app
+    from app.services import matching as matching_service
+    from tests.conftest import TestingSessionLocal
+
+    style_id = await create_style(client, "Stream Kizomba")
+    me = await create_dancer(client, "stream_me@example.com", {"city": "Streamville"})
+    for number in range(5):
+        await create_dancer(
+            client, f"stream_{number}@example.com",
+            {"city": "Streamville", "dance_style_ids": [style_id]},
+        )
+    # Первая пачка из двух профилей: поток состоит из нескольких пачек
+    monkeypatch.setattr(matching_service, "STREAM_FIRST_CHUNK_SIZE", 2)
+
+    criteria = {"city": "Streamville", "dance_style_ids": [style_id]}
+    expected = (await client.post("/matching/find-partners", json=criteria, headers=me["headers"])).json()
+    assert len(expected) == 5
+
+    # Тело ответа читается в собственной сессии потока и закрывает ее в конце
+    opened, closed = [], []
+    def tracking_factory():
+        session = TestingSessionLocal()
+        close = session.close
+        async def tracked_close():
+            closed.append(session)
+            await close()
+        session.close = tracked_close
+        opened.append(session)
+        return session
+    monkeypatch.setitem(app.dependency_overrides, get_read_session_factory, lambda: tracking_factory)
+
+    headers = {**me["headers"], "Accept": "application/x-ndjson"}
+    response = await client.post("/matching/find-partners", json=criteria, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [orjson.loads(line) for line in response.text.splitlines()] == expected
+    assert len(opened) == 1 and closed == opened
+
+    response = await client.post(
+        "/matching/find-partners", json={**criteria, "radius_km": 5}, headers=headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
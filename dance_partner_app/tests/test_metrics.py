@@ -0,0 +1,110 @@
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+
+from app.services.style_catalog import style_catalog
+from app.utils.instrumentation import RequestStats, current_request_stats
+from tests.conftest import TestingSessionLocal
+
+async def admin_headers(client: AsyncClient, monkeypatch, email: str) -> dict:
+    """Регистрирует пользователя из ADMIN_EMAILS и возвращает заголовки с его токеном."""
+    from app.core.config import settings
+
+    await client.post("/users/", json={"email": email, "password": "testpassword"})
+    login = await client.post("/auth/token", data={"username": email, "password": "testpassword"})
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", email)
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+@pytest.mark.asyncio
+async def test_prometheus_metrics_per_router(client: AsyncClient, monkeypatch):
+    """Тестирует гистограммы латентности по роутерам и счетчики SQL на запрос."""
+    # Стили отдаются из справочника в памяти; сброшенный справочник загрузится запросом к БД
+    style_catalog.clear()
+    await client.get("/styles/")
+    response = await client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_duration_seconds_count{router="Dance Styles",route="/styles/",method="GET"}' in body
+    assert 'http_requests_total{router="Dance Styles",route="/styles/",method="GET",status="200"}' in body
+    assert "password_hashing_workers" in body
+    assert "style_catalog_loaded 1" in body
+
+    # JSON-сводки закрыты: без токена - 401, не администратору - 403
+    assert (await client.get("/metrics/sql")).status_code == status.HTTP_401_UNAUTHORIZED
+    email = "metrics_reader@example.com"
+    await client.post("/users/", json={"email": email, "password": "testpassword"})
+    login = await client.post("/auth/token", data={"username": email, "password": "testpassword"})
+    user_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert (await client.get("/metrics/sql", headers=user_headers)).status_code == status.HTTP_403_FORBIDDEN
+
+    headers = await admin_headers(client, monkeypatch, "metrics_admin@example.com")
+    response = await client.get("/metrics/sql", headers=headers)
+    styles = next(
+        row for row in response.json() if row["route"] == "/styles/" and row["method"] == "GET"
+    )
+    assert styles["requests"] >= 1
+    assert styles["queries"] >= 1
+    assert styles["slowest_statement"].startswith("SELECT")
+
+@pytest.mark.asyncio
+async def test_write_queue_sql_attributed_to_request(tmp_path):
+    """Тестирует, что SQL операций из очереди записей попадает в статистику поставившего их запроса."""
+    from sqlalchemy import text
+
+    from app.db.session import create_sqlite_engine
+    from app.db.write_queue import WriteBatcher
+
+    engine = create_sqlite_engine(f"sqlite+aiosqlite:///{tmp_path / 'metered.sqlite'}", pool_size=1, max_overflow=0)
+    batcher = WriteBatcher(engine, max_delay=0.01, max_batch=10)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+
+        async def insert(session):
+            await session.execute(text("INSERT INTO items (id) VALUES (1)"))
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        try:
+            await batcher.submit(insert)
+        finally:
+            current_request_stats.reset(token)
+        assert stats.statements["INSERT INTO items (id) VALUES (1)"] == 1
+        # COMMIT пачки общий для нескольких запросов и никому не приписывается
+        assert "COMMIT" not in stats.statements
+    finally:
+        await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_failed_statement_does_not_skew_timings():
+    """Тестирует, что упавший запрос не оставляет время начала на соединении."""
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    stats = RequestStats()
+    token = current_request_stats.set(stats)
+    try:
+        async with TestingSessionLocal() as db:
+            with pytest.raises(OperationalError):
+                await db.execute(text("SELECT * FROM no_such_table"))
+            await db.rollback()
+            await db.execute(text("SELECT 1"))
+            connection = await db.connection()
+            assert "query_start_time" not in connection.info
+    finally:
+        current_request_stats.reset(token)
+    assert stats.statements["SELECT 1"] == 1
+
+def test_repeated_statements_detect_n_plus_one():
+    """Тестирует поиск повторяющихся запросов с IN-списками разной длины."""
+    stats = RequestStats()
+    for _ in range(3):
+        stats.record("SELECT * FROM profiles WHERE id = ?", 0.001)
+    stats.record("SELECT * FROM dance_styles WHERE id IN (?, ?)", 0.001)
+    stats.record("SELECT * FROM dance_styles WHERE id IN (?,  ?, ?)", 0.002)
+
+    assert stats.query_count == 5
+    assert stats.repeated_statements(3) == [("SELECT * FROM profiles WHERE id = ?", 3)]
+    assert ("SELECT * FROM dance_styles WHERE id IN (?)", 2) in stats.repeated_statements(2)
@@ -4,6 +4,8 @@ from fastapi import status
 import random
 import string
 
+import msgpack
+
 async def get_auth_headers(client: AsyncClient, email: str = None, password: str = "testpassword") -> dict:
     if email is None:
         random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
@@ -76,6 +78,41 @@ async def test_get_nonexistent_dance_style(client: AsyncClient):
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json()["detail"] == "Dance style not found"
 
+@pytest.mark.asyncio
+async def test_dance_styles_etag(client: AsyncClient):
+    """Стили отдаются с ETag: совпавший If-None-Match дает 304, создание стиля меняет тег."""
+    style_id = (await client.post("/styles/", json={"name": "ETag Test Style"})).json()["id"]
+
+    response = await client.get("/styles/")
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+
+    not_modified = await client.get("/styles/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    # У другого формата свой тег
+    packed = await client.get(
+        "/styles/", headers={"Accept": "application/msgpack", "If-None-Match": etag}
+    )
+    assert packed.status_code == status.HTTP_200_OK
+    assert packed.headers["etag"] != etag
+
+    single = await client.get(f"/styles/{style_id}")
+    assert single.json()["name"] == "ETag Test Style"
+    single_etag = single.headers["etag"]
+    assert (await client.get(
+        f"/styles/{style_id}", headers={"If-None-Match": single_etag}
+    )).status_code == status.HTTP_304_NOT_MODIFIED
+
+    await client.post("/styles/", json={"name": "ETag Test Style 2"})
+    changed = await client.get("/styles/", headers={"If-None-Match": etag})
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.headers["etag"] != etag
+    assert "ETag Test Style 2" in [style["name"] for style in changed.json()]
+
 # --- Profile Tests --- #
 
 @pytest.mark.asyncio
@@ -120,6 +157,50 @@ async def test_update_my_profile(client: AsyncClient):
     assert data["city"] == "Old City"      # Город остался прежним (не передавали в update_data)
     assert data["bio"] == "New Bio"        # Bio добавилось
 
+@pytest.mark.asyncio
+async def test_update_profile_style_ids_keep_levels(client: AsyncClient):
+    """dance_style_ids сохраняют уровни оставшихся стилей, новым ставят Beginner, неизвестные пропускают."""
+    from tests.conftest import TestingSessionLocal
+    from app.services.matching_index import load_style_levels
+
+    headers = await get_auth_headers(client, email="styleidsprofile@example.com")
+    kept, dropped, added = [
+        (await client.post("/styles/", json={"name": f"Style Ids Test {n}"})).json()["id"] for n in range(3)
+    ]
+    profile_id = (await client.put("/profiles/me", json={"first_name": "Ids"}, headers=headers)).json()["id"]
+    await client.put("/profiles/me", json={"dance_styles": [
+        {"dance_style_id": kept, "skill_level": "Advanced"},
+        {"dance_style_id": dropped, "skill_level": "Intermediate"},
+    ]}, headers=headers)
+
+    response = await client.put(
+        "/profiles/me", json={"dance_style_ids": [kept, added, 999999]}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(style["id"] for style in response.json()["dance_styles"]) == [kept, added]
+    async with TestingSessionLocal() as db:
+        assert await load_style_levels(db, profile_id) == {kept: 3, added: 1}
+
+@pytest.mark.asyncio
+async def test_update_profile_style_created_by_other_worker(client: AsyncClient):
+    """Стиль, которого нет в справочнике процесса, но есть в БД, не теряется."""
+    from tests.conftest import TestingSessionLocal
+    from app.db.models import DanceStyle
+
+    headers = await get_auth_headers(client, email="otherworkerstyle@example.com")
+    await client.put("/profiles/me", json={"first_name": "Worker"}, headers=headers)
+    await client.get("/styles/") # справочник загружен
+    # Стиль создан мимо справочника этого процесса, как в другом воркере
+    async with TestingSessionLocal() as db:
+        style = DanceStyle(name="Other Worker Style")
+        db.add(style)
+        await db.commit()
+        style_id = style.id
+
+    response = await client.put("/profiles/me", json={"dance_style_ids": [style_id]}, headers=headers)
+    assert [item["id"] for item in response.json()["dance_styles"]] == [style_id]
+    assert (await client.get(f"/styles/{style_id}")).json()["name"] == "Other Worker Style"
+
 @pytest.mark.asyncio
 async def test_get_my_profile_exists(client: AsyncClient):
     """Тестирует получение существующего профиля."""
@@ -157,3 +238,93 @@ async def test_get_nonexistent_profile_by_id(client: AsyncClient):
     response = await client.get("/profiles/99999")
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json()["detail"] == "Profile not found" 
+
+# --- Response Format Tests --- #
+
+@pytest.mark.asyncio
+async def test_get_profiles_compact_formats(client: AsyncClient):
+    """Тестирует колоночный JSON и MessagePack: стили перечислены один раз."""
+    style_response = await client.post("/styles/", json={"name": "Columnar Style"})
+    style_id = style_response.json()["id"]
+    profile_ids = []
+    for number in range(3):
+        headers = await get_auth_headers(client, email=f"columnar_{number}@example.com")
+        await client.put("/profiles/me", json={"city": "Column City"}, headers=headers)
+        response = await client.put("/profiles/me", json={"dance_style_ids": [style_id]}, headers=headers)
+        profile_ids.append(response.json()["id"])
+    query = "&".join(f"ids={profile_id}" for profile_id in profile_ids + [99999])
+
+    response = await client.get(f"/profiles/?{query}")
+    assert [profile["id"] for profile in response.json()] == profile_ids
+
+    response = await client.get(
+        f"/profiles/?{query}",
+        headers={"Accept": "application/vnd.dancepartner.columnar+json"},
+    )
+    assert response.headers["content-type"] == "application/vnd.dancepartner.columnar+json"
+    document = response.json()
+    assert document["count"] == 3
+    assert document["profiles"]["id"] == profile_ids
+    assert document["profiles"]["dance_style_ids"] == [[style_id]] * 3
+    assert document["styles"] == {"name": ["Columnar Style"], "description": [None], "id": [style_id]}
+
+    response = await client.get(
+        f"/profiles/{profile_ids[0]}",
+        headers={"Accept": "application/json;q=0.5, application/msgpack"},
+    )
+    assert response.headers["content-type"] == "application/msgpack"
+    unpacked = msgpack.unpackb(response.content)
+    assert unpacked["profiles"]["city"] == ["Column City"]
+
+    # Неподдерживаемый Accept - обычный JSON, а не 406
+    for accept in ("text/html", "text/plain"):
+        response = await client.get("/styles/", headers={"Accept": accept})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/json"
+
+
+@pytest.mark.asyncio
+async def test_admin_export_profiles(client: AsyncClient, monkeypatch):
+    """Тестирует потоковую выгрузку всех профилей со стилями в NDJSON и CSV."""
+    import csv
+    import io
+    import orjson
+    from app.core.config import settings
+    from app.services import export as export_service
+    from tests.conftest import TestingSessionLocal
+
+    email = "export_admin@example.com"
+    headers = await get_auth_headers(client, email=email)
+    style_id = (await client.post("/styles/", json={"name": "Export Rumba"})).json()["id"]
+    await client.put("/profiles/me", json={"first_name": "Exporter"}, headers=headers)
+    profile = (await client.put("/profiles/me", json={
+        "dance_styles": [{"dance_style_id": style_id, "skill_level": "Advanced"}],
+    }, headers=headers)).json()
+
+    response = await client.get("/admin/export", headers=headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", email)
+    response = await client.get("/admin/export", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    response_ndjson = response.text
+    rows = [orjson.loads(line) for line in response_ndjson.splitlines()]
+    ids = [row["id"] for row in rows]
+    assert ids == sorted(ids) and len(ids) == len(set(ids))
+    exported = next(row for row in rows if row["id"] == profile["id"])
+    assert exported["first_name"] == "Exporter"
+    assert exported["dance_styles"] == [{"id": style_id, "name": "Export Rumba", "skill_level": "Advanced"}]
+
+    response = await client.get("/admin/export?format=csv", headers=headers)
+    assert response.headers["content-type"].startswith("text/csv")
+    csv_rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(csv_rows) == len(rows)
+    exported = next(row for row in csv_rows if row["id"] == str(profile["id"]))
+    assert exported["dance_styles"] == "Export Rumba:Advanced"
+
+    # Маленькие пачки склеиваются в ту же выгрузку
+    async with TestingSessionLocal() as db:
+        chunks = [chunk async for chunk in export_service.export_profiles(db, "ndjson", chunk_size=2)]
+    assert len(chunks) > 1
+    assert b"".join(chunks).decode() == response_ndjson
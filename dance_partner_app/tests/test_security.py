@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+import pytest
+from jose import jwt
+from httpx import AsyncClient
+from fastapi import status
+
+from app.services import users as users_service
+from app.utils.cache import TTLCache
+from app.utils.security import (
+    ALGORITHM, SECRET_KEY, PasswordHashingBusyError, PasswordHashingPool, decode_token,
+    get_password_hash_async, token_cache, verify_password_async
+)
+
+@pytest.mark.asyncio
+async def test_password_hash_roundtrip_in_pool():
+    """Тестирует хеширование и проверку пароля через пул потоков."""
+    hashed = await get_password_hash_async("secret-password")
+    assert await verify_password_async("secret-password", hashed) is True
+    assert await verify_password_async("wrong-password", hashed) is False
+
+@pytest.mark.asyncio
+async def test_password_hashing_pool_rejects_when_full():
+    """Тестирует отказ при заполненной очереди и счетчики пула."""
+    pool = PasswordHashingPool(workers=1, queue_size=0)
+    release = threading.Event()
+    running = asyncio.create_task(pool.run(release.wait, 5))
+    await asyncio.sleep(0.05)
+
+    assert pool.stats()["running"] == 1
+    assert pool.stats()["utilization"] == 1.0
+    with pytest.raises(PasswordHashingBusyError):
+        await pool.run(release.wait, 5)
+
+    release.set()
+    assert await running is True
+    stats = pool.stats()
+    assert stats["rejected_total"] == 1
+    assert stats["completed_total"] == 1
+    assert stats["running"] == 0
+    pool.shutdown()
+
+@pytest.mark.asyncio
+async def test_password_hashing_pool_counts_failures_and_cancelled_waiters():
+    """Тестирует раздельный учет ошибок и занятость места до конца работы потока."""
+    pool = PasswordHashingPool(workers=1, queue_size=0)
+    with pytest.raises(ZeroDivisionError):
+        await pool.run(lambda: 1 / 0)
+    assert pool.stats()["failed_total"] == 1 and pool.stats()["completed_total"] == 0
+
+    # Отмененный запрос не освобождает место, пока поток еще выполняет функцию
+    release = threading.Event()
+    waiter = asyncio.create_task(pool.run(release.wait, 5))
+    await asyncio.sleep(0.05)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert pool.stats()["running"] == 1
+    with pytest.raises(PasswordHashingBusyError):
+        await pool.run(release.wait, 5)
+
+    release.set()
+    for _ in range(100):
+        if pool.stats()["running"] == 0 and pool.stats()["queued"] == 0:
+            break
+        await asyncio.sleep(0.01)
+    stats = pool.stats()
+    assert stats["running"] == 0 and stats["completed_total"] == 1
+    assert await pool.run(int, "7") == 7
+    pool.shutdown()
+
+@pytest.mark.asyncio
+async def test_registration_returns_503_when_hashing_busy(client: AsyncClient, monkeypatch):
+    """Тестирует ответ 503 с Retry-After при переполненном пуле хеширования."""
+    async def busy(password: str) -> str:
+        raise PasswordHashingBusyError("busy")
+
+    monkeypatch.setattr(users_service, "get_password_hash_async", busy)
+    response = await client.post(
+        "/users/", json={"email": "busy_pool@example.com", "password": "password123"}
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+@pytest.mark.asyncio
+async def test_password_hashing_metrics(client: AsyncClient, monkeypatch):
+    """Тестирует эндпоинт с метриками пула хеширования."""
+    from tests.test_metrics import admin_headers
+
+    headers = await admin_headers(client, monkeypatch, "hashing_metrics_admin@example.com")
+    response = await client.get("/metrics/password-hashing", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["workers"] >= 1
+    assert {"running", "queued", "utilization", "rejected_total"} <= data.keys()
+
+def test_ttl_cache_evicts_least_recently_used_and_expired():
+    """Тестирует LRU-вытеснение и истечение срока жизни записей кэша."""
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1 # "a" становится самой свежей записью
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+    cache.set("expired", 4, ttl=0)
+    assert cache.get("expired") is None
+
+def test_token_cache_bounds_tokens_without_expiry(monkeypatch):
+    """Тестирует, что токен без exp хранится в кэше не дольше предельного срока."""
+    token = jwt.encode({"sub": "no_exp@example.com"}, SECRET_KEY, algorithm=ALGORITHM)
+    monkeypatch.setattr(token_cache, "ttl", 0)
+    assert decode_token(token).email == "no_exp@example.com"
+    misses = token_cache.misses
+    assert decode_token(token).email == "no_exp@example.com"
+    assert token_cache.misses == misses + 1
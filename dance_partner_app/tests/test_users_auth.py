@@ -98,3 +98,76 @@ async def test_read_users_me_authorized(client: AsyncClient):
     assert data["email"] == email
     assert data["id"] == user_id
     assert data["is_active"] is True 
+
+
+@pytest.mark.asyncio
+async def test_deactivated_user_loses_access(client: AsyncClient):
+    """Тестирует, что деактивация сбрасывает кэш и сразу закрывает доступ."""
+    email = "deactivate_me@example.com"
+    password = "deactivate_pass"
+    await client.post("/users/", json={"email": email, "password": password})
+    login_response = await client.post("/auth/token", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    # Первый запрос кладет пользователя в кэш
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await client.delete("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["is_active"] is False
+
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Inactive user"
+
+
+@pytest.mark.asyncio
+async def test_admin_bulk_import(client: AsyncClient, monkeypatch):
+    """Тестирует массовый импорт CSV: ошибки строк в отчете не мешают остальным строкам."""
+    from app.core.config import settings
+
+    admin_email = "import_admin@example.com"
+    await client.post("/users/", json={"email": admin_email, "password": "admin_pass"})
+    login_response = await client.post("/auth/token", data={"username": admin_email, "password": "admin_pass"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}", "Content-Type": "text/csv"}
+    await client.post("/styles/", json={"name": "Import Tango"})
+
+    body = (
+        "email,password,first_name,city,bio,dance_styles\n"
+        "imported1@example.com,pass1,Anna,Berlin,Likes milonga,import tango:Advanced\n"
+        'imported2@example.com,pass2,Boris,Paris,"Two\nlines, quoted",\n'
+        "imported1@example.com,pass3,Dup,,,\n"
+        "imported3@example.com,pass4,Vera,,,Unknown Style\n"
+        "not-an-email,pass5,,,,\n"
+        f"{admin_email},pass6,,,,\n"
+    )
+    response = await client.post("/admin/import", content=body, headers=headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", f"other@example.com, {admin_email.upper()}")
+    response = await client.post("/admin/import", content=body, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    report = response.json()
+    assert report["total"] == 6
+    assert report["imported"] == 2
+    assert report["failed"] == 4
+    errors = {error["line"]: error["error"] for error in report["errors"]}
+    assert errors[5] == "Duplicate email in input"
+    assert errors[6].startswith("Unknown dance style")
+    assert errors[7].startswith("email:")
+    assert errors[8] == "Email already registered"
+
+    login_response = await client.post("/auth/token", data={"username": "imported1@example.com", "password": "pass1"})
+    assert login_response.status_code == status.HTTP_200_OK
+    token = login_response.json()["access_token"]
+    profile = (await client.get("/profiles/me", headers={"Authorization": f"Bearer {token}"})).json()
+    assert profile["first_name"] == "Anna"
+    assert [style["name"] for style in profile["dance_styles"]] == ["Import Tango"]
+
+    response = await client.post(
+        "/admin/import?format=jsonl",
+        content=b'{"email": "imported2@example.com", "password": "x"}\n[1]\n',
+        headers=headers,
+    )
+    assert response.json()["failed"] == 2